@@ -18,6 +18,21 @@ import { BASE_URL } from "../config";
 
 const API_BASE_URL = BASE_URL;
 
+// Format d'enregistrement selon le mode de capture de l'offre : en mode
+// "audio", seule la piste Opus est enregistrée et envoyée (champ `audio`)
+const RECORDING_FORMATS = {
+  video: {
+    mimeType: "video/webm;codecs=vp8,opus",
+    field: "video",
+    extension: "webm",
+  },
+  audio: {
+    mimeType: "audio/webm;codecs=opus",
+    field: "audio",
+    extension: "weba",
+  },
+};
+
 // Fonction pour initialiser la reconnaissance vocale
 const initializeSpeechRecognition = () => {
   if ("webkitSpeechRecognition" in window) {
@@ -45,7 +60,10 @@ const Interview = () => {
     savingInterview,
     showConfirmModal,
     isProcessing,
+    captureMode,
   } = useSelector((state) => state.interview);
+  const audioOnly = captureMode === "audio";
+  const recordingFormat = RECORDING_FORMATS[audioOnly ? "audio" : "video"];
 
   const localRef = useRef(null);
   const mediaRecorderRef = useRef(null);
@@ -248,14 +266,19 @@ const Interview = () => {
         )
       );
 
-      // Ajouter la vidéo avec un nom de fichier unique
+      // Ajouter l'enregistrement (vidéo, ou audio seul) avec un nom de fichier unique
       const timestamp = new Date().toISOString().replace(/[:.]/g, "-");
-      const videoFileName = `interview_${interviewId}_${timestamp}.webm`;
-      console.log("Appending video to FormData:", {
+      const videoFileName = `interview_${interviewId}_${timestamp}.${recordingFormat.extension}`;
+      console.log("Appending recording to FormData:", {
+        field: recordingFormat.field,
         fileName: videoFileName,
         size: localState.recordedBlob.size,
       });
-      formData.append("video", localState.recordedBlob, videoFileName);
+      formData.append(
+        recordingFormat.field,
+        localState.recordedBlob,
+        videoFileName
+      );
 
       const token = localStorage.getItem("token");
       if (!token) {
@@ -386,10 +409,10 @@ const Interview = () => {
 
   const setupSources = async () => {
     try {
-      const constraints = { video: true, audio: true };
+      const constraints = { video: !audioOnly, audio: true };
       const stream = await navigator.mediaDevices.getUserMedia(constraints);
 
-      if (stream.getVideoTracks().length === 0) {
+      if (!audioOnly && stream.getVideoTracks().length === 0) {
         throw new Error("No video track available");
       }
 
@@ -424,7 +447,7 @@ const Interview = () => {
 
       // Initialiser le MediaRecorder
       const mediaRecorder = new MediaRecorder(stream, {
-        mimeType: "video/webm;codecs=vp8,opus",
+        mimeType: recordingFormat.mimeType,
       });
 
       mediaRecorderRef.current = mediaRecorder;
@@ -437,7 +460,7 @@ const Interview = () => {
 
           // Mettre à jour le blob à chaque nouveau chunk
           const blob = new Blob(recordedChunksRef.current, {
-            type: "video/webm;codecs=vp8,opus",
+            type: recordingFormat.mimeType,
           });
           console.log("Updated blob size:", blob.size, "bytes");
 
@@ -452,7 +475,7 @@ const Interview = () => {
       mediaRecorder.onstop = () => {
         console.log("Recording stopped, creating final blob...");
         const blob = new Blob(recordedChunksRef.current, {
-          type: "video/webm;codecs=vp8,opus",
+          type: recordingFormat.mimeType,
         });
         console.log("Final blob created:", blob.size, "bytes");
 
@@ -617,7 +640,7 @@ const Interview = () => {
 
       console.log("Starting recording...");
       const mediaRecorder = new MediaRecorder(localState.localStream, {
-        mimeType: "video/webm;codecs=vp8,opus",
+        mimeType: recordingFormat.mimeType,
       });
 
       mediaRecorderRef.current = mediaRecorder;
@@ -630,7 +653,7 @@ const Interview = () => {
 
           // Mettre à jour le blob à chaque nouveau chunk
           const blob = new Blob(recordedChunksRef.current, {
-            type: "video/webm;codecs=vp8,opus",
+            type: recordingFormat.mimeType,
           });
           console.log("Updated blob size:", blob.size, "bytes");
 
@@ -645,7 +668,7 @@ const Interview = () => {
       mediaRecorder.onstop = () => {
         console.log("Recording stopped, creating final blob...");
         const blob = new Blob(recordedChunksRef.current, {
-          type: "video/webm;codecs=vp8,opus",
+          type: recordingFormat.mimeType,
         });
         console.log("Final blob created:", blob.size, "bytes");
 
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useDispatch, useSelector } from "react-redux";
 import {
   fetchRecruiterInterviews,
@@ -64,6 +64,7 @@ const InterviewSection = () => {
   const [activeTab, setActiveTab] = useState(0);
   const [rapport, setRapport] = useState(null);
   const [loadingRapport, setLoadingRapport] = useState(false);
+  const rapportSourceRef = useRef(null);
   const [openMessageDialog, setOpenMessageDialog] = useState(false);
   const [message, setMessage] = useState("");
   const [selectedInterviewForMessage, setSelectedInterviewForMessage] =
@@ -88,9 +89,72 @@ const InterviewSection = () => {
     return () => {
       dispatch(clearError());
       dispatch(clearSelectedInterview());
+      closeRapportStream();
     };
   }, [dispatch, navigate]);
 
+  const closeRapportStream = () => {
+    if (rapportSourceRef.current) {
+      rapportSourceRef.current.close();
+      rapportSourceRef.current = null;
+    }
+  };
+
+  // Suivre la génération du rapport en flux (Server-Sent Events) : les
+  // analyses s'affichent au fur et à mesure, puis le rapport final
+  const streamRapport = (streamUrl) => {
+    closeRapportStream();
+    const source = new EventSource(
+      `${process.env.REACT_APP_API_URL || "http://localhost:5000"}${streamUrl}`
+    );
+    rapportSourceRef.current = source;
+
+    const updateQuestion = (index, changes) =>
+      setRapport((current) => {
+        const questions = [...(current?.questions_analysees || [])];
+        questions[index] = { ...(questions[index] || {}), ...changes(questions[index] || {}) };
+        return { ...current, questions_analysees: questions };
+      });
+
+    setRapport({
+      enCours: true,
+      score_global: null,
+      questions_analysees: [],
+      points_forts: [],
+      conclusion: "",
+    });
+    source.addEventListener("question", (e) => {
+      const data = JSON.parse(e.data);
+      updateQuestion(data.index, () => ({ question: data.question }));
+    });
+    source.addEventListener("analyse", (e) => {
+      const data = JSON.parse(e.data);
+      updateQuestion(data.index, (qa) => ({ analyse: (qa.analyse || "") + data.delta }));
+    });
+    source.addEventListener("score", (e) => {
+      const data = JSON.parse(e.data);
+      updateQuestion(data.index, () => ({
+        question: data.question,
+        analyse: data.analyse,
+        score: data.score,
+      }));
+    });
+    source.addEventListener("synthese", (e) => {
+      const data = JSON.parse(e.data);
+      setRapport((current) => ({ ...current, ...data }));
+    });
+    source.addEventListener("rapport", (e) => {
+      setRapport(JSON.parse(e.data).rapport);
+      closeRapportStream();
+    });
+    source.addEventListener("erreur", (e) => {
+      console.error("Erreur lors de la génération du rapport:", e.data);
+      closeRapportStream();
+      setRapport((current) => (current?.score_global != null ? current : null));
+    });
+    source.onerror = () => closeRapportStream();
+  };
+
   const handleViewDetails = async (interviewId) => {
     try {
       console.log("Fetching details for interview:", interviewId);
@@ -116,6 +180,11 @@ const InterviewSection = () => {
           }
         );
 
+        if (response.status === 404 && result.signed_rapport_stream_url) {
+          // Rapport pas encore disponible : suivre sa génération
+          streamRapport(result.signed_rapport_stream_url);
+          return;
+        }
         if (!response.ok) {
           throw new Error("Erreur lors de la récupération du rapport");
         }
@@ -137,6 +206,7 @@ const InterviewSection = () => {
   const handleCloseDialog = () => {
     setOpenDialog(false);
     dispatch(clearSelectedInterview());
+    closeRapportStream();
     setRapport(null);
   };
 
@@ -378,14 +448,21 @@ const InterviewSection = () => {
                                   backgroundColor: "#000",
                                 }}
                                 className="rounded-lg"
-                                src={`${
-                                  process.env.REACT_APP_API_URL ||
-                                  "http://localhost:5000"
-                                }/api/recruteur/entretiens/videos/${
-                                  selectedInterview._id
-                                }?token=${encodeURIComponent(
-                                  localStorage.getItem("token")
-                                )}`}
+                                src={
+                                  selectedInterview.signed_video_url
+                                    ? `${
+                                        process.env.REACT_APP_API_URL ||
+                                        "http://localhost:5000"
+                                      }${selectedInterview.signed_video_url}`
+                                    : `${
+                                        process.env.REACT_APP_API_URL ||
+                                        "http://localhost:5000"
+                                      }/api/recruteur/entretiens/videos/${
+                                        selectedInterview._id
+                                      }?token=${encodeURIComponent(
+                                        localStorage.getItem("token")
+                                      )}`
+                                }
                               />
                             </Box>
                           </CardContent>
@@ -545,7 +622,7 @@ const InterviewSection = () => {
                                     color="primary"
                                     className="font-bold text-2xl"
                                   >
-                                    Score global: {rapport.score_global}/10
+                                    Score global: {rapport.score_global ?? "…"}/10
                                   </Typography>
                                 </Box>
 
@@ -558,7 +635,7 @@ const InterviewSection = () => {
                                     Analyse des questions
                                   </Typography>
                                   {rapport.questions_analysees.map(
-                                    (qa, index) => (
+                                    (qa, index) => qa && (
                                       <Box
                                         key={index}
                                         className="bg-gray-50 p-6 rounded-xl shadow-sm"
@@ -592,7 +669,7 @@ const InterviewSection = () => {
                                           color="primary"
                                           className="font-bold text-lg mt-4"
                                         >
-                                          Score: {qa.score}/10
+                                          Score: {qa.score ?? "…"}/10
                                         </Typography>
                                       </Box>
                                     )
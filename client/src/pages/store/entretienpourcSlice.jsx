@@ -64,6 +64,7 @@ export const fetchInterviewDetails = createAsyncThunk(
         entretien: data.entretien,
         questions: data.questions,
         video: data.video,
+        captureMode: data.captureMode || "video",
       };
     } catch (error) {
       console.error("Erreur lors de la récupération:", error);
@@ -207,6 +208,8 @@ const initialState = {
   savingInterview: false,
   error: null,
   interviewDetails: null,
+  // "audio" : l'offre n'enregistre que la piste Opus du candidat
+  captureMode: "video",
   showConfirmModal: false,
   isProcessing: false,
   videoUrl: null,
@@ -322,6 +325,7 @@ const interviewSlice = createSlice({
         console.log("Questions reçues:", action.payload.questions);
         state.loading = false;
         state.interviewDetails = action.payload.entretien;
+        state.captureMode = action.payload.captureMode;
         state.questions = Array.isArray(action.payload.questions)
           ? action.payload.questions
           : [];
@@ -9,11 +9,19 @@ from routes.recruteurSection.dashboard_recruteur import Dashboard_recruteur_bp
 from routes.recruteurSection import recruteurv1_bp
 from routes.postuler import candidatures_bp
 from routes.entretiens import entretiens_bp
+from routes.monitoring import monitoring_bp
 from server.app.routes.recruteurSection.entretiensSection import entretiensection_bp
 from pymongo import MongoClient
 import logging
 from datetime import datetime, timezone
 from config.config import MONGO_URI
+from resumable_upload import ensure_indexes as ensure_upload_indexes
+from jobs import ensure_indexes as ensure_jobs_indexes
+from llm_cache import ensure_indexes as ensure_llm_cache_indexes
+from single_flight import ensure_indexes as ensure_single_flight_indexes
+from routes.recruteurv1.entretiens_questions import ensure_questions_indexes
+from video_store import ensure_indexes as ensure_video_indexes
+from transcription_cache import ensure_indexes as ensure_transcription_cache_indexes
 import os
 
 def create_app():
@@ -31,8 +39,8 @@ def create_app():
     # Configure CORS
     CORS(app, resources={r"/api/*": {
         "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
+        "methods": ["GET", "POST", "PUT", "PATCH", "HEAD", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization", "Range", "Upload-Length", "Upload-Offset", "Tus-Resumable", "X-LLM-Cache"],
         "supports_credentials": True
     }})
     
@@ -49,6 +57,20 @@ def create_app():
         # Vérification des collections
         collections = app.mongo.list_collection_names()
         logger.info(f"Collections disponibles: {collections}")
+
+        # Index des uploads résumables (recherche par entretien, expiration)
+        ensure_upload_indexes(app.mongo)
+        # Index de la file de jobs (prise de jobs, déduplication)
+        ensure_jobs_indexes(app.mongo)
+        # Expiration du cache des réponses LLM
+        ensure_llm_cache_indexes(app.mongo)
+        # Génération unique des questions par candidature (baux, index unique)
+        ensure_single_flight_indexes(app.mongo)
+        ensure_questions_indexes(app.mongo)
+        # Métadonnées des vidéos (recherche par entretien)
+        ensure_video_indexes(app.mongo)
+        # Expiration du cache des transcriptions
+        ensure_transcription_cache_indexes(app.mongo)
         
        
         
@@ -82,6 +104,9 @@ def create_app():
     app.register_blueprint(candidates_bp, url_prefix='/api/candidates')
     app.register_blueprint(entretiens_bp,url_prefix='/api/candidates/entretiens')
     app.register_blueprint(entretiensection_bp,url_prefix='/api/recruteur/entretiens')
+
+    # Supervision (métriques du client et du cache LLM)
+    app.register_blueprint(monitoring_bp, url_prefix='/api/monitoring')
     
     # Log des routes enregistrées
     logger.info("Routes enregistrées:")
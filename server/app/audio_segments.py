@@ -0,0 +1,188 @@
+import logging
+import os
+import subprocess
+import wave
+
+import numpy as np
+
+from config.config import TRANSCRIPTION_VAD_MARGIN_DB, TRANSCRIPTION_MAX_SEGMENT_SECONDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Format attendu par Whisper : 16 kHz mono
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+FRAME_SAMPLES = int(SAMPLE_RATE * FRAME_SECONDS)
+
+# Détection de parole par énergie
+NOISE_PERCENTILE = 10       # trames les plus calmes : bruit de fond
+LOUD_PERCENTILE = 90        # trames les plus fortes : parole
+MIN_THRESHOLD_DB = -50      # en dessous, silence quel que soit le bruit de fond
+MIN_SILENCE_SECONDS = 0.5   # pauses plus courtes fusionnées dans la parole
+MIN_SPEECH_SECONDS = 0.25   # bruits plus courts ignorés
+PADDING_SECONDS = 0.2       # marge conservée autour de chaque segment
+SPLIT_SEARCH_SECONDS = 5    # recherche d'une pause avant la limite de durée
+
+
+def ffmpeg_binary():
+    """Exécutable ffmpeg fourni avec moviepy (imageio-ffmpeg par défaut)."""
+    import moviepy.config as moviepy_config
+    if hasattr(moviepy_config, "FFMPEG_BINARY"):
+        return moviepy_config.FFMPEG_BINARY
+    return moviepy_config.get_setting("FFMPEG_BINARY")
+
+
+def extract_audio(media_path, audio_path):
+    """Extrait une seule fois la piste audio en WAV 16 kHz mono (sans décoder la vidéo)."""
+    if os.path.isfile(audio_path) and os.path.getmtime(audio_path) >= os.path.getmtime(media_path):
+        return audio_path
+    temp_path = f"{audio_path}.part.wav"
+    command = [
+        ffmpeg_binary(), "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", media_path, "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-c:a", "pcm_s16le",
+        temp_path
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Extraction audio impossible: {e.stderr.decode(errors='replace').strip()}")
+    os.replace(temp_path, audio_path)
+    logger.info(f"Audio extrait: {audio_path}")
+    return audio_path
+
+
+def read_audio(audio_path, start=0.0, end=None):
+    """Lit [start, end[ (secondes) d'un WAV 16 bits en float32 dans [-1, 1]."""
+    with wave.open(audio_path, "rb") as f:
+        total = f.getnframes()
+        first = min(total, int(start * SAMPLE_RATE))
+        last = total if end is None else min(total, int(end * SAMPLE_RATE))
+        f.setpos(first)
+        frames = f.readframes(max(0, last - first))
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def read_pcm(audio_path, start=0.0, end=None):
+    """Lit [start, end[ (secondes) d'un fichier PCM 16 bits 16 kHz mono brut
+    (audio reçu en direct, sans en-tête WAV)."""
+    first = int(start * SAMPLE_RATE)
+    count = -1 if end is None else max(0, int(end * SAMPLE_RATE) - first) * 2
+    with open(audio_path, "rb") as f:
+        f.seek(first * 2)
+        frames = f.read(count)
+    frames = frames[:len(frames) - len(frames) % 2]
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def frame_energy_db(audio):
+    """Énergie (dB) de chaque trame de FRAME_SECONDS."""
+    count = len(audio) // FRAME_SAMPLES
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def detect_speech(audio, margin_db=TRANSCRIPTION_VAD_MARGIN_DB):
+    """Segments de parole [(début, fin)] en secondes, silences retirés."""
+    energy = frame_energy_db(audio)
+    if len(energy) == 0:
+        return []
+    # Sans silence (parole continue), le bruit de fond estimé est la parole
+    # elle-même : le seuil reste alors sous les trames les plus fortes
+    noise, loud = np.percentile(energy, [NOISE_PERCENTILE, LOUD_PERCENTILE])
+    threshold = max(min(noise + margin_db, loud - margin_db), MIN_THRESHOLD_DB)
+    voiced = np.concatenate(([False], energy > threshold, [False]))
+    changes = np.flatnonzero(np.diff(voiced.astype(np.int8)))
+    runs = list(zip(changes[::2] * FRAME_SECONDS, changes[1::2] * FRAME_SECONDS))
+
+    regions = []
+    for start, end in runs:
+        if regions and start - regions[-1][1] < MIN_SILENCE_SECONDS:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    duration = len(audio) / SAMPLE_RATE
+    return [
+        (round(max(0.0, float(start) - PADDING_SECONDS), 2), round(min(duration, float(end) + PADDING_SECONDS), 2))
+        for start, end in regions
+        if end - start >= MIN_SPEECH_SECONDS
+    ]
+
+
+def split_long_regions(regions, energy, max_seconds=TRANSCRIPTION_MAX_SEGMENT_SECONDS):
+    """Coupe les segments plus longs que `max_seconds` sur la trame la plus
+    calme des SPLIT_SEARCH_SECONDS précédant la limite."""
+    result = []
+    for start, end in regions:
+        while end - start > max_seconds:
+            window_end = int((start + max_seconds) / FRAME_SECONDS)
+            window_start = max(int(start / FRAME_SECONDS) + 1, window_end - int(SPLIT_SEARCH_SECONDS / FRAME_SECONDS))
+            window = energy[window_start:window_end]
+            cut = (window_start + int(np.argmin(window))) * FRAME_SECONDS if len(window) else start + max_seconds
+            result.append((start, round(float(cut), 2)))
+            start = round(float(cut), 2)
+        result.append((start, end))
+    return result
+
+
+def clip_regions(regions, start, end):
+    """Parties des segments comprises dans [start, end] (les fragments trop
+    courts laissés par la coupure sont ignorés)."""
+    clipped = [(max(s, start), min(e, end)) for s, e in regions if e > start and s < end]
+    return [(s, e) for s, e in clipped if e - s >= MIN_SPEECH_SECONDS]
+
+
+def question_windows(recordings, duration):
+    """Fenêtres [(position, questionIndex, début, fin)] des réponses dont les
+    positions `startOffset` / `endOffset` (ms) sont connues."""
+    windows = []
+    for position, recording in enumerate(recordings or []):
+        if not isinstance(recording, dict):
+            continue
+        start, end = recording.get("startOffset"), recording.get("endOffset")
+        if start is None:
+            continue
+        start = start / 1000
+        end = end / 1000 if end is not None else duration
+        if end > start:
+            windows.append((position, recording.get("questionIndex"), start, min(end, duration)))
+    return windows
+
+
+def plan_parts(audio, recordings=None, part_seconds=120):
+    """Découpe un entretien en parties transcrites indépendamment.
+
+    Une partie par réponse délimitée (mise en correspondance avec
+    recordings[questionIndex]) ; sans positions, la parole est regroupée en
+    parties d'environ `part_seconds` secondes. Retourne (parties, secondes de
+    parole).
+    """
+    duration = len(audio) / SAMPLE_RATE
+    regions = split_long_regions(detect_speech(audio), frame_energy_db(audio))
+    speech_seconds = round(float(sum(end - start for start, end in regions)), 2)
+
+    parts = []
+    windows = question_windows(recordings, duration)
+    if windows:
+        for position, question_index, start, end in windows:
+            clipped = clip_regions(regions, start, end)
+            if clipped:
+                parts.append({"position": position, "questionIndex": question_index, "regions": clipped})
+    else:
+        current, length = [], 0.0
+        for start, end in regions:
+            current.append((start, end))
+            length += end - start
+            if length >= part_seconds:
+                parts.append({"regions": current})
+                current, length = [], 0.0
+        if current:
+            parts.append({"regions": current})
+
+    for index, part in enumerate(parts):
+        part["index"] = index
+        part["regions"] = [[round(start, 2), round(end, 2)] for start, end in part["regions"]]
+    return parts, speech_seconds
@@ -6,4 +6,126 @@ MONGO_URI = "mongodb://localhost:27017/Entretien_ai"
 # JWT configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 
+# URLs signées pour les médias (vidéos d'entretien, CV)
+MEDIA_URL_SECRET = os.getenv("MEDIA_URL_SECRET", JWT_SECRET_KEY)
+MEDIA_URL_TTL = int(os.getenv("MEDIA_URL_TTL", "3600"))
+# Préfixe interne du proxy frontal (ex: /protected/) pour servir les fichiers via X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "")
 
+# Upload résumable des vidéos d'entretien (protocole inspiré de tus)
+MAX_INTERVIEW_UPLOAD_SIZE = int(os.getenv("MAX_INTERVIEW_UPLOAD_SIZE", str(2 * 1024 * 1024 * 1024)))
+UPLOAD_EXPIRATION_HOURS = int(os.getenv("UPLOAD_EXPIRATION_HOURS", "24"))
+# Intervalle de la purge des fichiers d'uploads abandonnés
+UPLOAD_PURGE_INTERVAL_SECONDS = int(os.getenv("UPLOAD_PURGE_INTERVAL_SECONDS", "3600"))
+# Mode de capture par défaut des entretiens d'une offre : "video" (webm) ou
+# "audio" (piste Opus seule)
+INTERVIEW_CAPTURE_MODE = os.getenv("INTERVIEW_CAPTURE_MODE", "video")
+
+# Évaluation des réponses d'entretien (une requête LLM par question)
+SCORING_CONCURRENCY = int(os.getenv("SCORING_CONCURRENCY", "4"))
+SCORING_MAX_ATTEMPTS = int(os.getenv("SCORING_MAX_ATTEMPTS", "3"))
+
+# API LLM (Groq ou tout serveur compatible OpenAI, ex: bench/llm_stub_server.py)
+# Aucune clé par défaut : sans GROQ_API_KEY, les appels LLM échouent (LLM_NOT_CONFIGURED)
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3-8b-8192")
+
+# Pool de connexions HTTP partagé pour les appels LLM
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1"
+
+# Jeton requis pour les routes de supervision (vide : accès refusé, sauf en mode debug)
+MONITORING_TOKEN = os.getenv("MONITORING_TOKEN", "")
+
+# Cache des réponses LLM (clé : modèle, prompt système, prompt normalisé, température)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_LRU_SIZE = int(os.getenv("LLM_CACHE_LRU_SIZE", "256"))
+
+# Résilience des appels LLM : limites de concurrence, nouvelles tentatives, disjoncteur
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Rapports générés en même temps pour un même recruteur : chacun envoie
+# jusqu'à SCORING_CONCURRENCY requêtes simultanées
+LLM_TENANT_CONCURRENT_REPORTS = int(os.getenv("LLM_TENANT_CONCURRENT_REPORTS", "3"))
+LLM_TENANT_MAX_CONCURRENCY = int(os.getenv(
+    "LLM_TENANT_MAX_CONCURRENCY", str(SCORING_CONCURRENCY * LLM_TENANT_CONCURRENT_REPORTS)
+))
+LLM_ACQUIRE_TIMEOUT = float(os.getenv("LLM_ACQUIRE_TIMEOUT", "10"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "45"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Pré-génération des questions d'entretien au dépôt d'une candidature
+# Politique par défaut d'une offre : toujours, top_n (les N candidatures les
+# plus adéquates) ou jamais
+QUESTIONS_PREGEN_POLICY = os.getenv("QUESTIONS_PREGEN_POLICY", "top_n")
+QUESTIONS_PREGEN_TOP_N = int(os.getenv("QUESTIONS_PREGEN_TOP_N", "20"))
+# Nombre maximal de pré-générations simultanées, tous workers confondus
+QUESTIONS_PREGEN_CONCURRENCY = int(os.getenv("QUESTIONS_PREGEN_CONCURRENCY", "2"))
+
+# Génération unique par clé (single-flight) : durée du bail entre processus et
+# attente maximale du résultat d'une génération menée par un autre processus
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "120"))
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "90"))
+
+# Construction des prompts : budgets en tokens du CV et de l'offre, encodage
+# tiktoken utilisé pour les compter (estimation par caractères s'il est absent)
+PROMPT_CV_TOKEN_BUDGET = int(os.getenv("PROMPT_CV_TOKEN_BUDGET", "1500"))
+PROMPT_OFFER_TOKEN_BUDGET = int(os.getenv("PROMPT_OFFER_TOKEN_BUDGET", "400"))
+PROMPT_TOKENIZER_ENCODING = os.getenv("PROMPT_TOKENIZER_ENCODING", "cl100k_base")
+
+# Transcription Whisper : modèle par défaut, modèles chargés au démarrage des
+# workers (séparés par des virgules), threads torch par processus (0 : défaut)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_DOWNLOAD_ROOT = os.getenv("WHISPER_DOWNLOAD_ROOT") or None
+WHISPER_PRELOAD_MODELS = [m.strip() for m in os.getenv("WHISPER_PRELOAD_MODELS", "").split(",") if m.strip()]
+WHISPER_TORCH_THREADS = int(os.getenv("WHISPER_TORCH_THREADS", "0"))
+# Moteur de transcription : "openai-whisper" (torch) ou "faster-whisper"
+# (CTranslate2, pip install faster-whisper), avec sa quantification
+# ("int8" sur CPU, "float16" / "int8_float16" sur GPU)
+WHISPER_ENGINE = os.getenv("WHISPER_ENGINE", "openai-whisper")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+# Transcription des entretiens par les workers (job transcribe_entretien) :
+# langue forcée (vide : détection), secondes de parole par partie transcrite
+# en parallèle quand les réponses ne sont pas délimitées, mise en file
+# automatique à la sauvegarde d'un entretien
+TRANSCRIPTION_LANGUAGE = os.getenv("TRANSCRIPTION_LANGUAGE", "fr") or None
+TRANSCRIPTION_CHUNK_SECONDS = int(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "120"))
+TRANSCRIPTION_ON_SAVE = os.getenv("TRANSCRIPTION_ON_SAVE", "0") == "1"
+# Détection de parole : marge (dB) au-dessus du bruit de fond, durée maximale
+# d'un segment envoyé à Whisper (sa fenêtre est de 30 s)
+TRANSCRIPTION_VAD_MARGIN_DB = float(os.getenv("TRANSCRIPTION_VAD_MARGIN_DB", "12"))
+TRANSCRIPTION_MAX_SEGMENT_SECONDS = float(os.getenv("TRANSCRIPTION_MAX_SEGMENT_SECONDS", "30"))
+# Cache des transcriptions par contenu du média (SHA-256), modèle et options
+TRANSCRIPTION_CACHE_ENABLED = os.getenv("TRANSCRIPTION_CACHE_ENABLED", "1") == "1"
+TRANSCRIPTION_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPTION_CACHE_TTL_SECONDS", str(90 * 24 * 3600)))
+# Transcription en direct pendant l'entretien (désactivée par défaut : elle
+# suppose des workers transcribe_live et un client qui envoie l'audio) :
+# audio reçu (s) avant de mettre en file une nouvelle passe, taille maximale
+# d'un bloc (octets), délai au-delà duquel le rapport est généré sans
+# attendre les dernières passes
+LIVE_TRANSCRIPTION_ENABLED = os.getenv("LIVE_TRANSCRIPTION_ENABLED", "0") == "1"
+LIVE_TRANSCRIPTION_STEP_SECONDS = float(os.getenv("LIVE_TRANSCRIPTION_STEP_SECONDS", "4"))
+LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES = int(os.getenv("LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES", str(1024 * 1024)))
+LIVE_TRANSCRIPTION_RAPPORT_DELAY_SECONDS = int(os.getenv("LIVE_TRANSCRIPTION_RAPPORT_DELAY_SECONDS", "300"))
+# Versions compressées des vidéos d'entretien (job transcode_video) : mise en
+# file à la sauvegarde, format ("mp4" H.264 avec faststart ou "webm" VP9 avec
+# index en tête), hauteur maximale, qualité (CRF), version audio seule Opus,
+# nombre maximal de conversions simultanées
+RENDITIONS_ON_SAVE = os.getenv("RENDITIONS_ON_SAVE", "1") == "1"
+RENDITION_VIDEO_FORMAT = os.getenv("RENDITION_VIDEO_FORMAT", "mp4")
+RENDITION_MAX_HEIGHT = int(os.getenv("RENDITION_MAX_HEIGHT", "720"))
+RENDITION_VIDEO_CRF = int(os.getenv("RENDITION_VIDEO_CRF", "28"))
+RENDITION_AUDIO_ENABLED = os.getenv("RENDITION_AUDIO_ENABLED", "1") == "1"
+RENDITION_AUDIO_BITRATE = os.getenv("RENDITION_AUDIO_BITRATE", "32k")
+RENDITION_CONCURRENCY = int(os.getenv("RENDITION_CONCURRENCY", "2"))
@@ -0,0 +1,137 @@
+import json
+
+# Caractères d'espacement autorisés entre les éléments JSON
+WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """Analyse au fil de l'eau un objet JSON reçu par fragments.
+
+    Seuls les champs de premier niveau sont suivis : `fields` contient les
+    valeurs complètes, `string_delta(key)` le texte d'un champ chaîne reçu
+    depuis le dernier appel, y compris avant la fin de la chaîne. Le texte qui
+    précède la première accolade (préambule du modèle, bloc ```json) est ignoré,
+    comme ce qui suit l'accolade fermante.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        # key : attente d'une clé ; colon : attente de ':' ; value_start :
+        # attente d'une valeur ; value : valeur en cours de lecture
+        self.state = "key"
+        self.key = None
+        self.value_kind = None
+        self.token_start = None
+        self.fields = {}
+        self._emitted = {}
+
+    def feed(self, text):
+        """Ajoute un fragment et retourne les champs complétés par ce fragment."""
+        self.buffer += text
+        completed = {}
+        while self.pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self.pos]
+
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self.depth = 1
+                self.pos += 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == "key":
+                        self.key = json.loads(self.buffer[self.token_start:self.pos + 1])
+                        self.state = "colon"
+                    elif self.depth == 1 and self.state == "value":
+                        self._complete(self.pos + 1, completed)
+                self.pos += 1
+                continue
+
+            if self.state == "key":
+                if ch == '"':
+                    self.in_string = True
+                    self.token_start = self.pos
+                elif ch == "}":
+                    self.done = True
+            elif self.state == "colon":
+                if ch == ":":
+                    self.state = "value_start"
+            elif self.state == "value_start":
+                if ch not in WHITESPACE:
+                    self.token_start = self.pos
+                    self.state = "value"
+                    if ch == '"':
+                        self.value_kind = "string"
+                        self.in_string = True
+                    elif ch in "{[":
+                        self.value_kind = "nested"
+                        self.depth += 1
+                    else:
+                        self.value_kind = "scalar"
+            elif self.value_kind == "nested":
+                if ch == '"':
+                    self.in_string = True
+                elif ch in "{[":
+                    self.depth += 1
+                elif ch in "}]":
+                    self.depth -= 1
+                    if self.depth == 1:
+                        self._complete(self.pos + 1, completed)
+            elif self.value_kind == "scalar" and (ch in ",}" or ch in WHITESPACE):
+                self._complete(self.pos, completed)
+                # Le séparateur est traité dans l'état "key"
+                continue
+            self.pos += 1
+        return completed
+
+    def _complete(self, end, completed):
+        raw = self.buffer[self.token_start:end]
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = None
+        self.fields[self.key] = value
+        completed[self.key] = value
+        self.state = "key"
+        self.key = None
+        self.value_kind = None
+        self.token_start = None
+
+    def partial_string(self, key):
+        """Valeur courante d'un champ chaîne, complète ou en cours de réception."""
+        if key in self.fields:
+            value = self.fields[key]
+            return value if isinstance(value, str) else None
+        if self.key != key or self.value_kind != "string" or not self.in_string:
+            return None
+        raw = self.buffer[self.token_start + 1:self.pos]
+        # Une séquence d'échappement coupée entre deux fragments est ignorée
+        # jusqu'au fragment suivant
+        for cut in range(0, 7):
+            try:
+                return json.loads('"' + raw[:len(raw) - cut] + '"')
+            except json.JSONDecodeError:
+                continue
+        return None
+
+    def string_delta(self, key):
+        """Texte du champ `key` reçu depuis le dernier appel (chaîne vide sinon)."""
+        value = self.partial_string(key)
+        if not value:
+            return ""
+        sent = self._emitted.get(key, 0)
+        self._emitted[key] = len(value)
+        return value[sent:]
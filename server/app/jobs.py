@@ -0,0 +1,316 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = 'jobs'
+
+# Statuts d'un job
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+TERMINE = "termine"
+ECHEC = "echec"
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 30
+POLL_INTERVAL_SECONDS = 1.0
+
+# Registre des handlers : type de job -> fonction(payload, job)
+_handlers = {}
+# Nombre maximal de jobs en cours par type, tous workers confondus
+_limits = {}
+
+
+def job_handler(job_type, max_concurrency=None):
+    """Enregistre la fonction qui exécute les jobs de type `job_type`.
+
+    Le handler reçoit (payload, job) et s'exécute dans un contexte
+    d'application Flask. Une exception déclenche une nouvelle tentative.
+    `max_concurrency` borne le nombre de jobs de ce type exécutés en même
+    temps (limite indicative : deux workers qui réservent au même instant
+    peuvent la dépasser d'une unité).
+    """
+    def decorator(f):
+        _handlers[job_type] = f
+        if max_concurrency:
+            _limits[job_type] = max_concurrency
+        return f
+    return decorator
+
+
+def ensure_indexes(db):
+    """Index utilisés pour la prise de jobs et la déduplication."""
+    db[JOBS_COLLECTION].create_index([
+        ("statut", ASCENDING),
+        ("type", ASCENDING),
+        ("priority", DESCENDING),
+        ("rank", DESCENDING),
+        ("run_at", ASCENDING)
+    ])
+    db[JOBS_COLLECTION].create_index([("lease_expires_at", ASCENDING)])
+    # La clé de déduplication n'est présente que sur les jobs actifs
+    db[JOBS_COLLECTION].create_index(
+        [("dedupe_key", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"dedupe_key": {"$exists": True}}
+    )
+
+
+def enqueue(db, job_type, payload, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS,
+            dedupe_key=None, delay_seconds=0, rank=None):
+    """Ajoute un job à la file. Retourne l'ID du job.
+
+    Si `dedupe_key` est fourni et qu'un job actif porte déjà cette clé,
+    aucun nouveau job n'est créé et l'ID du job existant est retourné.
+    À priorité égale, les jobs de `rank` le plus élevé passent en premier,
+    puis les plus anciens.
+    """
+    now = datetime.now(timezone.utc)
+    job = {
+        "type": job_type,
+        "payload": payload,
+        "statut": EN_ATTENTE,
+        "priority": priority,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": now + timedelta(seconds=delay_seconds),
+        "lease_expires_at": None,
+        "worker_id": None,
+        "last_error": None,
+        "date_creation": now,
+        "date_maj": now
+    }
+    if dedupe_key:
+        job["dedupe_key"] = dedupe_key
+    if rank is not None:
+        job["rank"] = rank
+
+    try:
+        job_id = db[JOBS_COLLECTION].insert_one(job).inserted_id
+        logger.info(f"Job {job_type} ajouté à la file: {job_id}")
+        return job_id
+    except DuplicateKeyError:
+        existing = db[JOBS_COLLECTION].find_one({"dedupe_key": dedupe_key}, {"_id": 1})
+        logger.info(f"Job {job_type} déjà en file pour la clé {dedupe_key}")
+        return existing["_id"] if existing else None
+
+
+def run_now(db, dedupe_key):
+    """Avance à maintenant l'exécution du job en attente portant cette clé."""
+    db[JOBS_COLLECTION].update_one(
+        {"dedupe_key": dedupe_key, "statut": EN_ATTENTE},
+        {"$set": {"run_at": datetime.now(timezone.utc)}}
+    )
+
+
+def _saturated_types(db, now):
+    """Types de jobs ayant atteint leur limite de jobs en cours."""
+    saturated = []
+    for job_type, limit in _limits.items():
+        running = db[JOBS_COLLECTION].count_documents(
+            {"type": job_type, "statut": EN_COURS, "lease_expires_at": {"$gte": now}},
+            limit=limit
+        )
+        if running >= limit:
+            saturated.append(job_type)
+    return saturated
+
+
+def _abandon_expired(db, now):
+    """Abandonne les jobs dont le bail a expiré pendant la dernière tentative
+    (worker arrêté ou tué à chaque exécution)."""
+    result = db[JOBS_COLLECTION].update_many(
+        {
+            "statut": EN_COURS,
+            "lease_expires_at": {"$lt": now},
+            "$expr": {"$gte": ["$attempts", "$max_attempts"]}
+        },
+        {
+            "$set": {
+                "statut": ECHEC,
+                "last_error": "Bail expiré pendant la dernière tentative",
+                "lease_expires_at": None,
+                "date_maj": now
+            },
+            "$unset": {"dedupe_key": ""}
+        }
+    )
+    if result.modified_count:
+        logger.error(f"{result.modified_count} job(s) abandonné(s) : bail expiré pendant la dernière tentative")
+
+
+def lease(db, worker_id, job_types=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Réserve atomiquement le prochain job disponible pour ce worker.
+
+    Un job en cours dont le bail a expiré (worker arrêté) est repris s'il lui
+    reste des tentatives ; sinon il est abandonné.
+    """
+    now = datetime.now(timezone.utc)
+    _abandon_expired(db, now)
+    query = {
+        "$or": [
+            {"statut": EN_ATTENTE, "run_at": {"$lte": now}},
+            {
+                "statut": EN_COURS,
+                "lease_expires_at": {"$lt": now},
+                "$expr": {"$lt": ["$attempts", "$max_attempts"]}
+            }
+        ]
+    }
+    type_filter = {}
+    if job_types:
+        type_filter["$in"] = list(job_types)
+    saturated = _saturated_types(db, now)
+    if saturated:
+        type_filter["$nin"] = saturated
+    if type_filter:
+        query["type"] = type_filter
+
+    return db[JOBS_COLLECTION].find_one_and_update(
+        query,
+        {
+            "$set": {
+                "statut": EN_COURS,
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "date_maj": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("priority", DESCENDING), ("rank", DESCENDING), ("run_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def heartbeat(db, job, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """Prolonge le bail d'un job long."""
+    db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "worker_id": job["worker_id"]},
+        {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)}}
+    )
+
+
+def complete(db, job, result=None):
+    """Marque un job comme terminé."""
+    db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "worker_id": job["worker_id"]},
+        {
+            "$set": {
+                "statut": TERMINE,
+                "result": result,
+                "lease_expires_at": None,
+                "date_maj": datetime.now(timezone.utc)
+            },
+            "$unset": {"dedupe_key": ""}
+        }
+    )
+
+
+def fail(db, job, error):
+    """Replanifie un job en échec avec un délai exponentiel, ou l'abandonne."""
+    now = datetime.now(timezone.utc)
+    if job["attempts"] < job["max_attempts"]:
+        delay = RETRY_BASE_SECONDS * (2 ** (job["attempts"] - 1))
+        update = {"statut": EN_ATTENTE, "run_at": now + timedelta(seconds=delay)}
+        logger.warning(f"Job {job['_id']} en échec (tentative {job['attempts']}), nouvel essai dans {delay}s")
+    else:
+        update = {"statut": ECHEC}
+        logger.error(f"Job {job['_id']} abandonné après {job['attempts']} tentatives")
+
+    update.update({"last_error": error, "lease_expires_at": None, "date_maj": now})
+    operation = {"$set": update}
+    if update["statut"] == ECHEC:
+        operation["$unset"] = {"dedupe_key": ""}
+    db[JOBS_COLLECTION].update_one(
+        {"_id": job["_id"], "worker_id": job["worker_id"]},
+        operation
+    )
+
+
+def is_last_attempt(job):
+    """Indique si l'exécution courante est la dernière tentative du job."""
+    return job["attempts"] >= job["max_attempts"]
+
+
+class Worker:
+    """Boucle de traitement des jobs dans un processus."""
+
+    def __init__(self, app, job_types=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 poll_interval=POLL_INTERVAL_SECONDS):
+        self.app = app
+        self.job_types = job_types
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = True
+
+    def run_once(self):
+        """Traite un job s'il y en a un. Retourne True si un job a été traité."""
+        with self.app.app_context():
+            db = self.app.mongo
+            job = lease(db, self.worker_id, self.job_types, self.lease_seconds)
+            if not job:
+                return False
+
+            handler = _handlers.get(job["type"])
+            if not handler:
+                fail(db, job, f"Aucun handler pour le type {job['type']}")
+                return True
+
+            started = time.monotonic()
+            try:
+                result = handler(job["payload"], job)
+                complete(db, job, result)
+                logger.info(f"Job {job['type']} {job['_id']} terminé en {time.monotonic() - started:.2f}s")
+            except Exception as e:
+                logger.error(f"Erreur dans le job {job['type']} {job['_id']}: {str(e)}")
+                fail(db, job, f"{str(e)}\n{traceback.format_exc(limit=5)}")
+            return True
+
+    def run_forever(self):
+        logger.info(f"Worker {self.worker_id} démarré (types: {self.job_types or 'tous'})")
+        while self.running:
+            try:
+                if not self.run_once():
+                    time.sleep(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Erreur du worker {self.worker_id}: {str(e)}")
+                time.sleep(self.poll_interval)
+
+
+def _worker_main(app_factory, job_types, initializer=None):
+    if initializer:
+        initializer()
+    app = app_factory()
+    Worker(app, job_types).run_forever()
+
+
+def run_workers(app_factory, concurrency=1, job_types=None, preload=None, initializer=None):
+    """Démarre `concurrency` processus workers et attend leur fin.
+
+    `preload` est appelé une fois dans le processus parent avant le fork :
+    ce qu'il charge (modèles) est partagé par les workers en copie à l'écriture.
+    `initializer` est appelé au démarrage de chaque worker.
+    """
+    context = multiprocessing
+    if preload:
+        preload()
+        context = multiprocessing.get_context("fork")
+    processes = []
+    for _ in range(concurrency):
+        process = context.Process(target=_worker_main, args=(app_factory, job_types, initializer))
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
@@ -0,0 +1,260 @@
+import logging
+import os
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+
+from config.config import (
+    LIVE_TRANSCRIPTION_STEP_SECONDS, LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES, TRANSCRIPTION_MAX_SEGMENT_SECONDS
+)
+from audio_segments import SAMPLE_RATE, clip_regions, detect_speech, frame_energy_db, read_pcm, split_long_regions
+from jobs import enqueue
+from resumable_upload import UploadError
+from transcription import ENTRETIENS_COLLECTION, PROMPT_TAIL_CHARS, media_absolute_path, transcribe_regions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# État de la transcription en direct sur l'entretien, par index de question
+LIVE_FIELD = 'transcription_live'
+LIVE_JOB_TYPE = 'transcribe_live'
+LIVE_EN_COURS = 'en_cours'
+LIVE_TERMINE = 'termine'
+LIVE_ECHEC = 'echec'
+
+# Avant la génération du rapport (priorité 10)
+LIVE_JOB_PRIORITY = 20
+# Audio reçu : PCM 16 bits, 16 kHz, mono
+BYTES_PER_SECOND = SAMPLE_RATE * 2
+# Silence observé après un segment de parole pour le considérer terminé
+STABLE_SILENCE_SECONDS = 1.0
+# Audio déjà transcrit relu avec la suite pour estimer le bruit de fond
+CONTEXT_SECONDS = TRANSCRIPTION_MAX_SEGMENT_SECONDS
+
+
+def live_audio_path(entretien_id, question_index):
+    return f"Uploads/audio/live_{entretien_id}_q{question_index}.pcm"
+
+
+def live_state(entretien, question_index):
+    """État de la transcription en direct d'une question, ou None."""
+    return (entretien.get(LIVE_FIELD) or {}).get(str(question_index))
+
+
+def pending_live_questions(entretien):
+    """Index des questions dont la transcription en direct n'est pas terminée."""
+    return sorted(
+        int(index) for index, state in (entretien.get(LIVE_FIELD) or {}).items()
+        if state.get("statut") == LIVE_EN_COURS
+    )
+
+
+def enqueue_live_pass(db, entretien_id, question_index, received, final=False):
+    """Met en file une passe de transcription de l'audio reçu jusqu'à `received` octets."""
+    return enqueue(
+        db,
+        LIVE_JOB_TYPE,
+        {"entretien_id": str(entretien_id), "questionIndex": question_index, "final": final},
+        priority=LIVE_JOB_PRIORITY,
+        dedupe_key=f"live:{entretien_id}:{question_index}:{received}{':fin' if final else ''}"
+    )
+
+
+def append_live_audio(db, entretien, question_index, question, offset, data, final=False):
+    """Ajoute `data` à l'audio de la réponse en cours à partir de `offset` et
+    retourne l'état de la question.
+
+    Comme pour les uploads résumables, l'offset doit correspondre aux octets
+    déjà reçus. Une passe de transcription est mise en file toutes les
+    LIVE_TRANSCRIPTION_STEP_SECONDS d'audio, et pour le dernier bloc (`final`).
+    """
+    if len(data) > LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES:
+        raise UploadError(
+            f"Bloc audio trop volumineux ({LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES} octets maximum)",
+            "CHUNK_TOO_LARGE",
+            413
+        )
+    if len(data) % 2:
+        raise UploadError("Bloc audio incomplet (échantillons 16 bits)", "INVALID_AUDIO_CHUNK", 400)
+
+    entretien_id = entretien["_id"]
+    key = f"{LIVE_FIELD}.{question_index}"
+    now = datetime.now(timezone.utc)
+    state = live_state(entretien, question_index)
+    if state is None:
+        db[ENTRETIENS_COLLECTION].update_one(
+            {"_id": entretien_id, key: {"$exists": False}},
+            {"$set": {key: {
+                "statut": LIVE_EN_COURS,
+                "question": question,
+                "audio_path": live_audio_path(entretien_id, question_index),
+                "recu": 0,
+                "transcrit_jusqu_a": 0.0,
+                "declenche_jusqu_a": 0.0,
+                "texte": "",
+                "segments": [],
+                "date_debut": now
+            }}}
+        )
+        state = live_state(db[ENTRETIENS_COLLECTION].find_one({"_id": entretien_id}, {key: 1}), question_index)
+
+    if state["statut"] != LIVE_EN_COURS:
+        raise UploadError("Transcription en direct terminée pour cette question", "LIVE_COMPLETED", 409)
+    if offset != state["recu"]:
+        raise UploadError(f"Offset invalide (attendu : {state['recu']})", "OFFSET_CONFLICT", 409)
+
+    path = media_absolute_path(state["audio_path"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as f:
+        # Supprimer les octets d'un bloc interrompu non enregistré
+        f.truncate(offset)
+        f.write(data)
+
+    received = offset + len(data)
+    update = {f"{key}.recu": received, f"{key}.date_maj": now}
+    trigger = final or received / BYTES_PER_SECOND - state["declenche_jusqu_a"] >= LIVE_TRANSCRIPTION_STEP_SECONDS
+    if trigger:
+        update[f"{key}.declenche_jusqu_a"] = received / BYTES_PER_SECOND
+    result = db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, f"{key}.recu": offset, f"{key}.statut": LIVE_EN_COURS},
+        {"$set": update}
+    )
+    if result.matched_count == 0:
+        raise UploadError("Bloc reçu en double ou réponse terminée", "OFFSET_CONFLICT", 409)
+    if trigger:
+        enqueue_live_pass(db, entretien_id, question_index, received, final)
+
+    state.update({"recu": received})
+    return state
+
+
+def pending_regions(path, start, received, final):
+    """Segments de parole terminés entre `start` et `received` (secondes) et
+    position jusqu'à laquelle l'audio est alors transcrit.
+
+    Hors dernière passe, un segment n'est transcrit qu'une fois suivi d'un
+    silence (ou coupé à TRANSCRIPTION_MAX_SEGMENT_SECONDS) : la fin d'une
+    phrase en cours n'est jamais découpée.
+    """
+    context_start = max(0.0, start - CONTEXT_SECONDS)
+    audio = read_pcm(path, context_start, received)
+    regions = split_long_regions(detect_speech(audio), frame_energy_db(audio))
+    regions = clip_regions([(context_start + s, context_start + e) for s, e in regions], start, received)
+    if final:
+        return regions, received
+
+    horizon = received - STABLE_SILENCE_SECONDS
+    if regions and regions[-1][1] > horizon:
+        # Dernier segment en cours : transcrit à la passe suivante
+        return regions[:-1], regions[-1][0]
+    return regions, max(start, horizon)
+
+
+def advance_live_transcription(db, entretien_id, question_index, final=False, on_region=None):
+    """Transcrit la parole reçue depuis la passe précédente et retourne l'état
+    de la question, ou None si la passe n'avait rien à faire.
+
+    La progression n'est enregistrée que si aucune autre passe ne l'a
+    avancée entre-temps ; une dernière passe devancée recommence.
+    """
+    key = f"{LIVE_FIELD}.{question_index}"
+    while True:
+        entretien = db[ENTRETIENS_COLLECTION].find_one({"_id": entretien_id}, {key: 1, "statut": 1})
+        state = live_state(entretien, question_index) if entretien else None
+        if not state or state["statut"] != LIVE_EN_COURS:
+            return None
+
+        path = media_absolute_path(state["audio_path"])
+        start = state["transcrit_jusqu_a"]
+        received = state["recu"] / BYTES_PER_SECOND
+        regions, end = pending_regions(path, start, received, final) if os.path.isfile(path) else ([], received)
+        if not final and end <= start:
+            return None
+
+        result = {"text": "", "segments": []}
+        if regions:
+            result = transcribe_regions(
+                path, regions,
+                prompt=state["texte"][-PROMPT_TAIL_CHARS:] or state.get("question"),
+                on_region=on_region,
+                reader=read_pcm
+            )
+        texte = " ".join(text for text in (state["texte"], result["text"]) if text)
+        update = {
+            "$set": {
+                f"{key}.transcrit_jusqu_a": round(end, 2),
+                f"{key}.texte": texte,
+                f"{key}.date_maj": datetime.now(timezone.utc)
+            },
+            "$push": {f"{key}.segments": {"$each": result["segments"]}}
+        }
+        if final:
+            update["$set"][f"{key}.statut"] = LIVE_TERMINE
+        committed = db[ENTRETIENS_COLLECTION].find_one_and_update(
+            {"_id": entretien_id, f"{key}.transcrit_jusqu_a": start, f"{key}.statut": LIVE_EN_COURS},
+            update,
+            projection={key: 1, "statut": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if committed:
+            break
+        if not final:
+            return None
+
+    state = live_state(committed, question_index)
+    logger.info(f"Entretien {entretien_id}, question {question_index}: transcrit jusqu'à {end:.1f}s "
+                f"sur {received:.1f}s ({len(regions)} segment(s))")
+    if final:
+        store_live_recording(db, entretien_id, question_index, state, committed.get("statut"))
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return state
+
+
+def store_live_recording(db, entretien_id, question_index, state, entretien_statut):
+    """Écrit la transcription finale dans la réponse enregistrée de la question."""
+    fields = {
+        "transcript": state["texte"],
+        "transcript_source": "serveur",
+        "transcription_segments": state["segments"]
+    }
+    result = db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "recordings.questionIndex": question_index},
+        {"$set": {f"recordings.$.{field}": value for field, value in fields.items()}}
+    )
+    if result.matched_count:
+        return
+
+    recording = {
+        "questionIndex": question_index,
+        "question": state.get("question"),
+        "timestamp": datetime.now(timezone.utc),
+        **fields
+    }
+    if entretien_statut == "termine":
+        # Réponses regroupées à la sauvegarde de l'entretien
+        db[ENTRETIENS_COLLECTION].update_one({"_id": entretien_id}, {"$push": {"recordings": recording}})
+        return
+    # Pendant l'entretien, recordings est indexé par question (voir save_answer)
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "recordings": {"$exists": False}},
+        {"$set": {"recordings": []}}
+    )
+    result = db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "statut": {"$ne": "termine"}},
+        {"$set": {f"recordings.{question_index}": recording}}
+    )
+    if result.matched_count == 0:
+        # Entretien sauvegardé entre-temps
+        db[ENTRETIENS_COLLECTION].update_one({"_id": entretien_id}, {"$push": {"recordings": recording}})
+
+
+def abandon_live_transcription(db, entretien_id, question_index):
+    """Marque la transcription en direct en échec : la réponse garde la transcription du navigateur."""
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, f"{LIVE_FIELD}.{question_index}.statut": LIVE_EN_COURS},
+        {"$set": {f"{LIVE_FIELD}.{question_index}.statut": LIVE_ECHEC}}
+    )
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import PyMongoError
+
+from cache import TTLCache
+from config.config import LLM_CACHE_ENABLED, LLM_CACHE_TTL_SECONDS, LLM_CACHE_LRU_SIZE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_COLLECTION = 'llm_cache'
+
+# Modes d'utilisation du cache
+CACHE_USE = "use"          # lecture puis écriture
+CACHE_REFRESH = "refresh"  # appel forcé, la nouvelle réponse remplace l'ancienne
+CACHE_BYPASS = "bypass"    # ni lecture ni écriture
+CACHE_MODES = (CACHE_USE, CACHE_REFRESH, CACHE_BYPASS)
+
+# Durée maximale dans le cache mémoire : borne le délai avant qu'un
+# rafraîchissement fait par un autre processus soit vu
+FRONT_TTL_SECONDS = 600
+
+
+def normalize_prompt(text):
+    """Normalise les espaces d'un prompt pour que la mise en forme n'affecte pas la clé."""
+    return " ".join((text or "").split())
+
+
+def cache_mode_from_request(request):
+    """Lit le mode de cache demandé (en-tête X-LLM-Cache ou paramètre llm_cache)."""
+    mode = request.headers.get('X-LLM-Cache') or request.args.get('llm_cache') or CACHE_USE
+    mode = mode.strip().lower()
+    return mode if mode in CACHE_MODES else CACHE_USE
+
+
+class LLMCache:
+    """Cache des réponses LLM adressé par le contenu de la requête.
+
+    La clé est le SHA-256 du modèle, du prompt système, du prompt utilisateur
+    normalisé et de la température. Les réponses sont stockées dans MongoDB
+    (expiration par index TTL) avec un cache LRU en mémoire devant.
+    """
+
+    def __init__(self, ttl_seconds=None, lru_size=None, enabled=None):
+        self.ttl_seconds = ttl_seconds or LLM_CACHE_TTL_SECONDS
+        self.enabled = LLM_CACHE_ENABLED if enabled is None else enabled
+        self.front = TTLCache(maxsize=lru_size or LLM_CACHE_LRU_SIZE,
+                              ttl=min(self.ttl_seconds, FRONT_TTL_SECONDS))
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.db_hits = 0
+
+    @staticmethod
+    def make_key(payload):
+        messages = payload.get("messages", [])
+        system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        user = "\n".join(m.get("content", "") for m in messages if m.get("role") != "system")
+        material = json.dumps({
+            "model": payload.get("model"),
+            "system": normalize_prompt(system),
+            "prompt": normalize_prompt(user),
+            "temperature": payload.get("temperature")
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, db, key):
+        cached = self.front.get(key)
+        if cached is not None or db is None:
+            return cached
+        try:
+            doc = db[LLM_CACHE_COLLECTION].find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"response": 1}
+            )
+        except PyMongoError as e:
+            logger.error(f"Cache LLM indisponible en lecture: {str(e)}")
+            return None
+        if not doc:
+            return None
+        with self._lock:
+            self.db_hits += 1
+        self.front.set(key, doc["response"])
+        return doc["response"]
+
+    def set(self, db, key, payload, response):
+        self.front.set(key, response)
+        with self._lock:
+            self.stored += 1
+        if db is None:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            db[LLM_CACHE_COLLECTION].update_one(
+                {"_id": key},
+                {"$set": {
+                    "model": payload.get("model"),
+                    "response": response,
+                    "date_creation": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                }},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.error(f"Cache LLM indisponible en écriture: {str(e)}")
+
+    def completion(self, db, payload, fetch, mode=CACHE_USE, validate=None):
+        """Retourne la réponse en cache pour `payload`, ou celle de `fetch()`.
+
+        `fetch` retourne la réponse JSON de l'API ou None en cas d'échec. Une
+        réponse n'est conservée que si `validate(response)` est vrai.
+        """
+        if not self.enabled or mode == CACHE_BYPASS:
+            return fetch()
+
+        key = self.make_key(payload)
+        if mode == CACHE_USE:
+            cached = self.get(db, key)
+            if cached is not None:
+                logger.info(f"Réponse LLM servie depuis le cache ({key[:12]})")
+                return cached
+
+        response = fetch()
+        if response is not None and (validate is None or validate(response)):
+            self.set(db, key, payload, response)
+        return response
+
+    async def aget(self, db, key):
+        """Variante asynchrone de get() : MongoDB est interrogé hors de la boucle."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.get, db, key)
+
+    async def aset(self, db, key, payload, response):
+        await asyncio.get_running_loop().run_in_executor(None, self.set, db, key, payload, response)
+
+    async def acompletion(self, db, payload, fetch, mode=CACHE_USE, validate=None):
+        """Variante asynchrone : `fetch` est une coroutine, MongoDB est interrogé hors de la boucle."""
+        if not self.enabled or mode == CACHE_BYPASS:
+            return await fetch()
+
+        key = self.make_key(payload)
+        if mode == CACHE_USE:
+            cached = await self.aget(db, key)
+            if cached is not None:
+                logger.info(f"Réponse LLM servie depuis le cache ({key[:12]})")
+                return cached
+
+        response = await fetch()
+        if response is not None and (validate is None or validate(response)):
+            await self.aset(db, key, payload, response)
+        return response
+
+    def stats(self):
+        front = self.front.stats()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "lru": front,
+                "db_hits": self.db_hits,
+                "stored": self.stored
+            }
+
+
+def response_content(response):
+    """Texte de la réponse d'une API chat completions, ou chaîne vide."""
+    try:
+        return response['choices'][0]['message']['content'] or ""
+    except (KeyError, IndexError, TypeError):
+        return ""
+
+
+def completion_response(content, model=None):
+    """Réponse au format chat completions reconstituée à partir d'un texte reçu en flux."""
+    return {"model": model, "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+
+def ensure_indexes(db):
+    """Expiration automatique des réponses en cache."""
+    db[LLM_CACHE_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+
+
+# Create a single instance of LLMCache
+llm_cache = LLMCache()
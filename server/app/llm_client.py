@@ -0,0 +1,440 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+import httpx
+
+from config.config import (
+    GROQ_API_KEY, GROQ_API_URL,
+    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT,
+    LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE, LLM_KEEPALIVE_EXPIRY,
+    LLM_HTTP2
+)
+from llm_resilience import (
+    Bulkhead, CircuitBreaker, RetryPolicy, LLMError, LLMUnavailableError, RETRYABLE_STATUSES, parse_retry_after
+)
+from metrics import LatencyHistogram
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class LLMMetrics:
+    """Compteurs des requêtes LLM : volume, erreurs, latence, connexions ouvertes.
+
+    `attempt_latency` mesure chaque requête HTTP, `call_latency` l'appel
+    complet vu par l'appelant (attente d'un créneau et nouvelles tentatives
+    comprises).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempt_latency = LatencyHistogram()
+        self.call_latency = LatencyHistogram()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.connections_opened = 0
+            self.status_codes = {}
+        self.attempt_latency.reset()
+        self.call_latency.reset()
+
+    def request_started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def request_finished(self, elapsed_ms, status=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            if status is None or status >= 400:
+                self.errors += 1
+            key = str(status) if status is not None else "erreur_reseau"
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+        self.attempt_latency.observe(elapsed_ms)
+
+    def call_finished(self, elapsed_ms):
+        self.call_latency.observe(elapsed_ms)
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "connections_opened": self.connections_opened,
+                "status_codes": dict(self.status_codes)
+            }
+        counters["attempt_latency_ms"] = self.attempt_latency.snapshot()
+        counters["call_latency_ms"] = self.call_latency.snapshot()
+        return counters
+
+
+class LLMClient:
+    """Client HTTP partagé par tous les appels à l'API Groq.
+
+    Un seul pool de connexions par processus (keep-alive, HTTP/2 si `h2` est
+    installé) : les appels successifs réutilisent les connexions TLS déjà
+    ouvertes. La variante asynchrone tourne sur une boucle d'événements dédiée
+    et persistante, pour que son pool survive d'un appel `run()` à l'autre.
+    Après un fork (workers), les clients sont recréés dans le processus fils.
+
+    Chaque appel passe par une limite de concurrence (globale et par tenant),
+    un disjoncteur et des nouvelles tentatives sur 429/5xx et erreurs réseau.
+    """
+
+    def __init__(self, api_url=None, api_key=None):
+        self.api_url = api_url or GROQ_API_URL
+        self.api_key = api_key or GROQ_API_KEY
+        self.http2 = LLM_HTTP2 and HTTP2_AVAILABLE
+        self.metrics = LLMMetrics()
+        self.bulkhead = Bulkhead()
+        self.breaker = CircuitBreaker()
+        self.retry_policy = RetryPolicy()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._async_client = None
+        self._loop = None
+        if LLM_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning("Paquet h2 absent : le client LLM utilise HTTP/1.1")
+        if not self.api_key:
+            logger.error("GROQ_API_KEY non défini : les appels LLM échoueront")
+
+    def _check_configured(self):
+        if not self.api_key:
+            raise LLMError("Clé API LLM non configurée (GROQ_API_KEY)", "LLM_NOT_CONFIGURED", 503)
+
+    def _client_options(self):
+        return {
+            "timeout": httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            "limits": httpx.Limits(
+                max_connections=LLM_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+            "http2": self.http2,
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+        }
+
+    def _check_fork(self):
+        # Les sockets et le thread de la boucle appartiennent au processus parent
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._client = None
+            self._async_client = None
+            self._loop = None
+
+    @property
+    def client(self):
+        with self._lock:
+            self._check_fork()
+            if self._client is None:
+                self._client = httpx.Client(**self._client_options())
+                logger.info(f"Client LLM initialisé (http2={self.http2}, pid={self._pid})")
+            return self._client
+
+    def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            self.metrics.connection_opened()
+
+    async def _atrace(self, event_name, info):
+        self._trace(event_name, info)
+
+    def _record_attempt(self, response, error):
+        """Met à jour le disjoncteur. Retourne (à réessayer, Retry-After en secondes)."""
+        if error is not None:
+            self.breaker.record_failure()
+            return True, None
+        if response.status_code in RETRYABLE_STATUSES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.breaker.record_failure(retry_after)
+            return True, retry_after
+        self.breaker.record_success()
+        return False, None
+
+    def _give_up(self, attempt, response, error, retry_after):
+        detail = f"status {response.status_code}" if response is not None else str(error) or type(error).__name__
+        logger.error(f"Appel LLM abandonné après {attempt} tentative(s): {detail}")
+        return LLMUnavailableError(f"Service LLM indisponible ({detail})", retry_after=retry_after)
+
+    def _send(self, payload, timeout):
+        self.metrics.request_started()
+        started = time.perf_counter()
+        status = None
+        try:
+            response = self.client.post(
+                self.api_url,
+                json=payload,
+                timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                extensions={"trace": self._trace}
+            )
+            status = response.status_code
+            return response
+        finally:
+            self.metrics.request_finished((time.perf_counter() - started) * 1000, status)
+
+    def post(self, payload, tenant=None, timeout=None):
+        """Envoie une requête chat completions et retourne la réponse httpx.
+
+        Lève LLMBusyError si aucun créneau ne se libère à temps, et
+        LLMUnavailableError si le disjoncteur est ouvert ou si les nouvelles
+        tentatives sont épuisées. Les autres statuts sont retournés tels quels.
+        """
+        self._check_configured()
+        started = time.monotonic()
+        self.bulkhead.acquire(tenant)
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                probe = self.breaker.before_call()
+                response, error = None, None
+                try:
+                    response = self._send(payload, timeout)
+                except httpx.TransportError as e:
+                    error = e
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                except BaseException:
+                    # Annulation : ni succès ni échec, l'appel de test est libéré
+                    if probe:
+                        self.breaker.release_probe()
+                    raise
+
+                retryable, retry_after = self._record_attempt(response, error)
+                if not retryable:
+                    return response
+                delay = self.retry_policy.next_delay(attempt, started, retry_after)
+                if delay is None:
+                    raise self._give_up(attempt, response, error, retry_after)
+                logger.warning(f"Appel LLM en échec (tentative {attempt}), nouvel essai dans {delay:.2f}s")
+                time.sleep(delay)
+        finally:
+            self.bulkhead.release(tenant)
+            self.metrics.call_finished((time.monotonic() - started) * 1000)
+
+    def _event_loop(self):
+        with self._lock:
+            self._check_fork()
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        """Planifie une coroutine sur la boucle du client et retourne son Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._event_loop())
+
+    def run(self, coro, timeout=None):
+        """Exécute une coroutine sur la boucle du client et attend son résultat."""
+        return self.submit(coro).result(timeout)
+
+    @property
+    def async_client(self):
+        if asyncio.get_running_loop() is not self._loop:
+            raise RuntimeError("Le client LLM asynchrone s'utilise via llm_client.run()")
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._client_options())
+        return self._async_client
+
+    async def _asend(self, payload, timeout):
+        self.metrics.request_started()
+        started = time.perf_counter()
+        status = None
+        try:
+            response = await self.async_client.post(
+                self.api_url,
+                json=payload,
+                timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                extensions={"trace": self._atrace}
+            )
+            status = response.status_code
+            return response
+        finally:
+            self.metrics.request_finished((time.perf_counter() - started) * 1000, status)
+
+    async def apost(self, payload, tenant=None, timeout=None):
+        """Variante asynchrone de post(), à appeler dans une coroutine passée à run()."""
+        self._check_configured()
+        started = time.monotonic()
+        await self.bulkhead.acquire_async(tenant)
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                probe = self.breaker.before_call()
+                response, error = None, None
+                try:
+                    response = await self._asend(payload, timeout)
+                except httpx.TransportError as e:
+                    error = e
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                except BaseException:
+                    # Annulation : ni succès ni échec, l'appel de test est libéré
+                    if probe:
+                        self.breaker.release_probe()
+                    raise
+
+                retryable, retry_after = self._record_attempt(response, error)
+                if not retryable:
+                    return response
+                delay = self.retry_policy.next_delay(attempt, started, retry_after)
+                if delay is None:
+                    raise self._give_up(attempt, response, error, retry_after)
+                logger.warning(f"Appel LLM en échec (tentative {attempt}), nouvel essai dans {delay:.2f}s")
+                await asyncio.sleep(delay)
+        finally:
+            self.bulkhead.release(tenant)
+            self.metrics.call_finished((time.monotonic() - started) * 1000)
+
+    async def astream(self, payload, tenant=None, timeout=None):
+        """Demande la complétion en flux (stream=True) et produit le texte au fil de l'eau.
+
+        Mêmes protections que apost() ; une nouvelle tentative n'est possible
+        que tant qu'aucun fragment n'a été transmis à l'appelant. Une réponse
+        autre que 200 lève LLMError.
+        """
+        payload = dict(payload, stream=True)
+        self._check_configured()
+        started = time.monotonic()
+        await self.bulkhead.acquire_async(tenant)
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                probe = self.breaker.before_call()
+                self.metrics.request_started()
+                sent_at = time.perf_counter()
+                response, error, status, streamed = None, None, None, False
+                try:
+                    async with self.async_client.stream(
+                        "POST",
+                        self.api_url,
+                        json=payload,
+                        timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                        extensions={"trace": self._atrace}
+                    ) as response:
+                        status = response.status_code
+                        if status == 200:
+                            self.breaker.record_success()
+                            async for line in response.aiter_lines():
+                                delta = stream_delta(line)
+                                if delta is None:
+                                    break
+                                if delta:
+                                    streamed = True
+                                    yield delta
+                            return
+                        await response.aread()
+                except httpx.TransportError as e:
+                    if streamed:
+                        self.breaker.record_failure()
+                        raise LLMUnavailableError(f"Flux LLM interrompu ({str(e) or type(e).__name__})")
+                    error, response = e, None
+                except Exception:
+                    if status is None:
+                        self.breaker.record_failure()
+                    raise
+                except BaseException:
+                    # Annulation ou fermeture du flux : ni succès ni échec,
+                    # l'appel de test éventuel est libéré
+                    if probe:
+                        self.breaker.release_probe()
+                    raise
+                finally:
+                    self.metrics.request_finished((time.perf_counter() - sent_at) * 1000, status)
+
+                retryable, retry_after = self._record_attempt(response, error)
+                if not retryable:
+                    raise LLMError(f"Erreur API LLM (status {status}): {response.text[:200]}")
+                delay = self.retry_policy.next_delay(attempt, started, retry_after)
+                if delay is None:
+                    raise self._give_up(attempt, response, error, retry_after)
+                logger.warning(f"Appel LLM en flux en échec (tentative {attempt}), nouvel essai dans {delay:.2f}s")
+                await asyncio.sleep(delay)
+        finally:
+            self.bulkhead.release(tenant)
+            self.metrics.call_finished((time.monotonic() - started) * 1000)
+
+    def pool_stats(self):
+        """Connexions ouvertes et inactives de chaque pool."""
+        stats = {
+            "http2": self.http2,
+            "max_connections": LLM_POOL_MAX_CONNECTIONS,
+            "max_keepalive": LLM_POOL_MAX_KEEPALIVE
+        }
+        for name, client in (("sync", self._client), ("async", self._async_client)):
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", None) or [])
+            stats[name] = {
+                "connections": len(connections),
+                "idle": sum(1 for connection in connections if connection.is_idle())
+            }
+        return stats
+
+    def stats(self):
+        return {
+            "requests": self.metrics.snapshot(),
+            "pool": self.pool_stats(),
+            "circuit_breaker": self.breaker.snapshot(),
+            "concurrency": self.bulkhead.snapshot(),
+            "retries": self.retry_policy.snapshot()
+        }
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+            if self._loop is not None:
+                if self._async_client is not None:
+                    asyncio.run_coroutine_threadsafe(self._async_client.aclose(), self._loop).result(5)
+                    self._async_client = None
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+
+def stream_delta(line):
+    """Texte d'une ligne Server-Sent Events de l'API : '' si la ligne n'en porte pas, None à la fin du flux."""
+    if not line.startswith("data:"):
+        return ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        return json.loads(data)["choices"][0]["delta"].get("content") or ""
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return ""
+
+
+# Create a single instance of LLMClient
+llm_client = LLMClient()
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+from flask import jsonify
+
+from config.config import (
+    LLM_MAX_CONCURRENCY, LLM_TENANT_MAX_CONCURRENCY, LLM_ACQUIRE_TIMEOUT,
+    LLM_MAX_ATTEMPTS, LLM_RETRY_BASE_SECONDS, LLM_RETRY_MAX_SECONDS, LLM_CALL_DEADLINE,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Statuts HTTP justifiant une nouvelle tentative
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+# États du disjoncteur
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Intervalle d'attente d'un créneau par la variante asynchrone
+ASYNC_ACQUIRE_POLL_SECONDS = 0.05
+
+
+class LLMError(Exception):
+    """Erreur d'appel au LLM, convertie en réponse JSON par les routes."""
+
+    def __init__(self, message, code="LLM_ERROR", status=502):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+
+
+class LLMUnavailableError(LLMError):
+    """Backend LLM indisponible : disjoncteur ouvert ou tentatives épuisées."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, "LLM_UNAVAILABLE", 503)
+        self.retry_after = retry_after
+
+
+class LLMBusyError(LLMError):
+    """Aucun créneau d'appel libre dans le délai imparti (global ou par tenant)."""
+
+    def __init__(self, message):
+        super().__init__(message, "LLM_BUSY", 503)
+
+
+def parse_retry_after(value):
+    """Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes, ou None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, retry_after=None, base=None, maximum=None):
+    """Délai avant la tentative suivante : exponentiel avec gigue complète.
+
+    Un Retry-After fourni par l'API sert de minimum.
+    """
+    base = LLM_RETRY_BASE_SECONDS if base is None else base
+    maximum = LLM_RETRY_MAX_SECONDS if maximum is None else maximum
+    delay = random.uniform(0, min(maximum, base * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, maximum))
+    return delay
+
+
+class Bulkhead:
+    """Limite les appels LLM simultanés, au total et par tenant (recruteur)."""
+
+    def __init__(self, max_concurrency=None, tenant_max_concurrency=None, acquire_timeout=None):
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        self.tenant_max_concurrency = tenant_max_concurrency or LLM_TENANT_MAX_CONCURRENCY
+        self.acquire_timeout = LLM_ACQUIRE_TIMEOUT if acquire_timeout is None else acquire_timeout
+        self._global = threading.BoundedSemaphore(self.max_concurrency)
+        self._tenants = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.tenant_in_flight = {}
+        self.rejected = 0
+
+    def _tenant_semaphore(self, tenant):
+        with self._lock:
+            semaphore = self._tenants.get(tenant)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.tenant_max_concurrency)
+                self._tenants[tenant] = semaphore
+            return semaphore
+
+    def _semaphores(self, tenant):
+        semaphores = [self._global]
+        if tenant:
+            semaphores.insert(0, self._tenant_semaphore(tenant))
+        return semaphores
+
+    def _acquired(self, tenant):
+        with self._lock:
+            self.in_flight += 1
+            if tenant:
+                self.tenant_in_flight[tenant] = self.tenant_in_flight.get(tenant, 0) + 1
+
+    def _rejected(self, tenant):
+        with self._lock:
+            self.rejected += 1
+        raise LLMBusyError(f"Trop d'appels LLM en cours{f' pour le tenant {tenant}' if tenant else ''}")
+
+    def acquire(self, tenant=None):
+        deadline = time.monotonic() + self.acquire_timeout
+        taken = []
+        for semaphore in self._semaphores(tenant):
+            if not semaphore.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                for held in taken:
+                    held.release()
+                self._rejected(tenant)
+            taken.append(semaphore)
+        self._acquired(tenant)
+
+    async def acquire_async(self, tenant=None):
+        # Les sémaphores sont partagés avec les appels synchrones : la boucle
+        # d'événements ne doit pas bloquer, elle réessaie périodiquement
+        deadline = time.monotonic() + self.acquire_timeout
+        taken = []
+        for semaphore in self._semaphores(tenant):
+            while not semaphore.acquire(blocking=False):
+                if time.monotonic() >= deadline:
+                    for held in taken:
+                        held.release()
+                    self._rejected(tenant)
+                await asyncio.sleep(ASYNC_ACQUIRE_POLL_SECONDS)
+            taken.append(semaphore)
+        self._acquired(tenant)
+
+    def release(self, tenant=None):
+        with self._lock:
+            self.in_flight -= 1
+            if tenant:
+                remaining = self.tenant_in_flight.get(tenant, 1) - 1
+                if remaining:
+                    self.tenant_in_flight[tenant] = remaining
+                else:
+                    self.tenant_in_flight.pop(tenant, None)
+        for semaphore in reversed(self._semaphores(tenant)):
+            semaphore.release()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "tenant_max_concurrency": self.tenant_max_concurrency,
+                "in_flight": self.in_flight,
+                "tenant_in_flight": dict(self.tenant_in_flight),
+                "rejected": self.rejected
+            }
+
+
+class CircuitBreaker:
+    """Disjoncteur : après `failure_threshold` échecs consécutifs, les appels
+    échouent immédiatement pendant `reset_seconds`, puis un seul appel test
+    décide de la fermeture ou d'une nouvelle ouverture.
+    """
+
+    def __init__(self, failure_threshold=None, reset_seconds=None):
+        self.failure_threshold = failure_threshold or LLM_BREAKER_FAILURES
+        self.reset_seconds = reset_seconds or LLM_BREAKER_RESET_SECONDS
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def before_call(self):
+        """Autorise l'appel ou lève LLMUnavailableError si le disjoncteur est ouvert.
+
+        Retourne True si l'appel est l'appel de test du disjoncteur semi-ouvert.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now >= self.open_until:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+                logger.info("Disjoncteur LLM semi-ouvert : appel de test autorisé")
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            retry_after = max(0.0, self.open_until - now)
+        raise LLMUnavailableError("Service LLM temporairement indisponible", retry_after=retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Disjoncteur LLM refermé")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """Libère l'appel de test interrompu sans résultat (annulation de la
+        tâche, fermeture du flux) : un nouvel appel de test est autorisé."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                pause = max(self.reset_seconds, retry_after or 0)
+                if self.state != OPEN:
+                    self.times_opened += 1
+                    logger.warning(f"Disjoncteur LLM ouvert pour {pause:.1f}s après {self.consecutive_failures} échecs")
+                self.state = OPEN
+                self.opened_at = time.time()
+                self.open_until = time.monotonic() + pause
+                self.probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "opened_at": self.opened_at,
+                "reopens_in": round(max(0.0, self.open_until - time.monotonic()), 2) if self.state == OPEN else 0,
+                "times_opened": self.times_opened,
+                "short_circuited": self.short_circuited
+            }
+
+
+class RetryPolicy:
+    """Paramètres des nouvelles tentatives d'un appel LLM."""
+
+    def __init__(self, max_attempts=None, deadline=None):
+        self.max_attempts = max_attempts or LLM_MAX_ATTEMPTS
+        self.deadline = deadline or LLM_CALL_DEADLINE
+        self._lock = threading.Lock()
+        self.retries = 0
+
+    def next_delay(self, attempt, started, retry_after=None):
+        """Délai avant la tentative suivante, ou None s'il ne faut plus réessayer."""
+        if attempt >= self.max_attempts:
+            return None
+        delay = backoff_delay(attempt, retry_after)
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        with self._lock:
+            self.retries += 1
+        return delay
+
+    def snapshot(self):
+        with self._lock:
+            return {"max_attempts": self.max_attempts, "deadline": self.deadline, "retries": self.retries}
+
+
+def llm_error_response(error):
+    """Réponse JSON d'une route pour une LLMError, avec Retry-After si connu."""
+    response = jsonify({"error": error.message, "code": error.code})
+    response.status_code = error.status
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(max(1, int(retry_after + 0.5)))
+    return response
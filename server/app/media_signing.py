@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import time
+from urllib.parse import urlencode
+
+from flask import current_app
+
+from config.config import MEDIA_URL_SECRET, MEDIA_URL_TTL, MEDIA_ACCEL_REDIRECT_PREFIX
+from video_streaming import stream_media
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MediaSigner:
+    """Signe et vérifie des URLs de médias (vidéos, CV) sans accès à la base.
+
+    La signature HMAC couvre la ressource, l'utilisateur autorisé, le chemin
+    de stockage et l'expiration : une requête média vérifiée n'a besoin ni du
+    JWT ni de MongoDB pour retrouver le fichier.
+    """
+
+    def __init__(self, secret=None, ttl=None):
+        self.secret = (secret or MEDIA_URL_SECRET).encode("utf-8")
+        self.ttl = ttl or MEDIA_URL_TTL
+
+    def _expiry(self, ttl):
+        # Arrondir l'expiration à une fenêtre fixe : la même URL est réémise
+        # pendant toute la fenêtre, ce qui la rend cacheable par le navigateur
+        # et par un proxy frontal.
+        now = int(time.time())
+        return (now // ttl + 2) * ttl
+
+    def _signature(self, resource, principal, storage_key, exp):
+        message = f"{resource}\n{principal}\n{storage_key}\n{exp}".encode("utf-8")
+        digest = hmac.new(self.secret, message, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def sign(self, resource, principal, storage_key, ttl=None):
+        """Retourne les paramètres de requête signés pour une ressource."""
+        exp = self._expiry(ttl or self.ttl)
+        return {
+            "exp": str(exp),
+            "sub": str(principal),
+            "key": storage_key,
+            "sig": self._signature(resource, principal, storage_key, exp),
+        }
+
+    def signed_url(self, base_url, resource, principal, storage_key, ttl=None):
+        """Construit l'URL complète signée."""
+        params = self.sign(resource, principal, storage_key, ttl)
+        return f"{base_url}?{urlencode(params)}"
+
+    def verify(self, resource, params):
+        """Vérifie les paramètres signés.
+
+        Retourne un dictionnaire {principal, storage_key, exp} si la signature
+        est valide et non expirée, sinon None.
+        """
+        try:
+            exp = int(params.get("exp", ""))
+        except ValueError:
+            logger.error("URL signée: expiration invalide")
+            return None
+
+        principal = params.get("sub")
+        storage_key = params.get("key")
+        signature = params.get("sig")
+        if not principal or not storage_key or not signature:
+            logger.error("URL signée: paramètres manquants")
+            return None
+
+        expected = self._signature(resource, principal, storage_key, exp)
+        if not hmac.compare_digest(expected, signature):
+            logger.error(f"URL signée: signature invalide pour {resource}")
+            return None
+
+        if exp < int(time.time()):
+            logger.error(f"URL signée expirée pour {resource}")
+            return None
+
+        return {"principal": principal, "storage_key": storage_key, "exp": exp}
+
+
+def resolve_storage_path(storage_key):
+    """Convertit une clé de stockage (chemin relatif ou absolu) en chemin absolu."""
+    path = storage_key.replace('\\', '/')
+    if not os.path.isabs(path):
+        path = os.path.join(current_app.root_path, path)
+    return path
+
+
+def signed_media_response(storage_key, mimetype, exp, download_name=None):
+    """Sert un média vérifié, avec les en-têtes de cache adaptés à l'expiration.
+
+    Si MEDIA_ACCEL_REDIRECT_PREFIX est configuré et que la clé est relative,
+    l'envoi du fichier est délégué au proxy frontal via X-Accel-Redirect.
+    """
+    max_age = max(0, exp - int(time.time()))
+
+    if MEDIA_ACCEL_REDIRECT_PREFIX and not os.path.isabs(storage_key):
+        response = current_app.response_class(status=200, mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + storage_key.lstrip("/")
+    else:
+        path = resolve_storage_path(storage_key)
+        if not os.path.exists(path):
+            return None
+        response = stream_media(path, mimetype, download_name=download_name)
+
+    response.headers["Cache-Control"] = f"private, max-age={max_age}"
+    return response
+
+
+# Create a single instance of MediaSigner
+media_signer = MediaSigner()
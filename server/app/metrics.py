@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Mesure la durée de chaque étape d'un traitement (en millisecondes).
+
+    Le détail est journalisé et peut être renvoyé au client via l'en-tête
+    Server-Timing, visible dans l'onglet réseau du navigateur.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = OrderedDict()
+        self._started = time.perf_counter()
+        self._last_mark = self._started
+
+    def mark(self, stage_name):
+        """Attribue à `stage_name` le temps écoulé depuis la marque précédente."""
+        now = time.perf_counter()
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + (now - self._last_mark) * 1000
+        self._last_mark = now
+
+    @contextmanager
+    def stage(self, stage_name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._last_mark = time.perf_counter()
+            elapsed = (self._last_mark - started) * 1000
+            self.stages[stage_name] = self.stages.get(stage_name, 0.0) + elapsed
+
+    def total_ms(self):
+        return (time.perf_counter() - self._started) * 1000
+
+    def as_dict(self):
+        timings = {name: round(ms, 2) for name, ms in self.stages.items()}
+        timings["total"] = round(self.total_ms(), 2)
+        return timings
+
+    def server_timing_header(self):
+        parts = [f"{name};dur={ms:.2f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.2f}")
+        return ", ".join(parts)
+
+    def log(self):
+        details = ", ".join(f"{name}={ms:.1f}ms" for name, ms in self.stages.items())
+        logger.info(f"[{self.name}] {details}, total={self.total_ms():.1f}ms")
+
+
+class LatencyHistogram:
+    """Histogramme cumulatif de latences (ms), sûr entre threads."""
+
+    def __init__(self, buckets_ms=(100, 250, 500, 1000, 2500, 5000, 10000, 30000)):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets_ms) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+
+    def observe(self, elapsed_ms):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            for index, bound in enumerate(self.buckets_ms):
+                if elapsed_ms <= bound:
+                    self.counts[index] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"le_{bound}" for bound in self.buckets_ms] + ["le_inf"]
+            return {
+                "count": self.count,
+                "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+                "buckets": dict(zip(labels, self.counts))
+            }
@@ -0,0 +1,24 @@
+import argparse
+import logging
+
+from pymongo import MongoClient
+
+from config.config import MONGO_URI
+from routes.recruteurv1.entretiens_questions import ensure_questions_indexes, resolve_duplicate_questions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Résout les doublons de questions par candidature puis crée l'index unique")
+    parser.add_argument("--dry-run", action="store_true", help="Liste les doublons sans les modifier")
+    args = parser.parse_args()
+
+    db = MongoClient(MONGO_URI).get_database("Entretien_ai")
+    resolved = resolve_duplicate_questions(db, args.dry_run)
+    if not args.dry_run:
+        ensure_questions_indexes(db)
+    logger.info(f"Migration terminée: {resolved} doublon(s) {'trouvé(s)' if args.dry_run else 'résolu(s)'}")
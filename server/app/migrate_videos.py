@@ -0,0 +1,29 @@
+import argparse
+import logging
+import os
+
+from pymongo import MongoClient
+
+from config.config import MONGO_URI
+from video_store import VIDEOS_COLLECTION, migrate_inline_videos
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Déplace sur disque les vidéos stockées en base64 dans MongoDB (champ video_data)")
+    parser.add_argument("--video-dir", default=os.path.join(APP_DIR, "Uploads", "videos"),
+                        help="Dossier de destination des vidéos")
+    # Les anciennes versions écrivaient dans la collection `db.videos`
+    parser.add_argument("--collections", nargs="+", default=[VIDEOS_COLLECTION, "db.videos"])
+    parser.add_argument("--dry-run", action="store_true", help="Liste les vidéos sans les migrer")
+    args = parser.parse_args()
+
+    db = MongoClient(MONGO_URI).get_database("Entretien_ai")
+    migrated = migrate_inline_videos(db, APP_DIR, args.video_dir, args.collections, args.dry_run)
+    logger.info(f"Migration terminée: {migrated} vidéo(s)")
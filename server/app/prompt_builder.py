@@ -0,0 +1,318 @@
+import hashlib
+import logging
+import math
+import re
+import threading
+import unicodedata
+
+from config.config import PROMPT_CV_TOKEN_BUDGET, PROMPT_OFFER_TOKEN_BUDGET, PROMPT_TOKENIZER_ENCODING
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Estimation sans tokenizer : texte français, un token pour ~3,5 caractères
+CHARS_PER_TOKEN = 3.5
+
+# Sections de CV conservées, par ordre de priorité, avec leurs intitulés reconnus
+CV_SECTIONS = (
+    ("experience", "Expérience", r"exp[ée]riences?(\s+professionnelles?)?|parcours(\s+professionnel)?|"
+                                 r"work\s+experience|professional\s+experience|experience|emplois?|stages?"),
+    ("competences", "Compétences", r"comp[ée]tences?(\s+\w+)?|skills|technical\s+skills|technologies|"
+                                   r"outils|savoir-faire|connaissances(\s+\w+)?"),
+    ("projets", "Projets", r"projets?(\s+\w+)?|projects|r[ée]alisations"),
+    ("formation", "Formation", r"formations?|[ée]tudes|dipl[ôo]mes?|education|cursus|certifications?"),
+    ("profil", "Profil", r"profil|à\s+propos|about(\s+me)?|summary|r[ée]sum[ée]|objectifs?"),
+)
+# Sections sans intérêt pour les questions d'entretien
+CV_DROPPED_SECTIONS = (r"langues?|languages|centres?\s+d'int[ée]r[êe]ts?|loisirs|hobbies|int[ée]r[êe]ts|"
+                       r"r[ée]f[ée]rences|contact|coordonn[ée]es|informations\s+personnelles|personal\s+details")
+
+HEADING_MAX_CHARS = 50
+_SECTION_PATTERNS = [(key, label, re.compile(rf"^({pattern})\s*:?$", re.IGNORECASE))
+                     for key, label, pattern in CV_SECTIONS]
+_DROPPED_PATTERN = re.compile(rf"^({CV_DROPPED_SECTIONS})\s*:?$", re.IGNORECASE)
+
+# Éléments retirés de chaque ligne : coordonnées, liens, numéros de page, puces
+_BOILERPLATE = [
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),
+    re.compile(r"(https?://|www\.)\S+", re.IGNORECASE),
+    re.compile(r"(?<!\d)(\+\d{1,3}[\s.]?)?0?\d([\s.-]?\d{2}){4}(?!\d)"),
+]
+_BOILERPLATE_LINES = re.compile(
+    r"^((page\s*)?\d+\s*(/|sur|of)\s*\d+|page\s*\d+|cv|[\W_]+|.{0,30}\bcurriculum\s+vitae\b.{0,30})$",
+    re.IGNORECASE
+)
+_BULLETS = re.compile(r"^[•▪●◦■□►▶✓✔➢\-–—*·]+\s*")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b]+")
+
+# Format de réponse demandé pour toute liste de questions
+QUESTIONS_FORMAT = """Format de réponse souhaité (en JSON):
+[
+    {
+        "question": "Question 1",
+        "type": "présentation",
+        "objectif": "Connaître le candidat"
+    },
+    ...
+]"""
+
+# Champs de l'offre utiles à la génération des questions
+OFFER_FIELDS = (
+    ("titre", "Poste"),
+    ("entreprise", "Entreprise"),
+    ("departement", "Département"),
+    ("localisation", "Localisation"),
+)
+# Tous les champs de l'offre lus par serialize_offer
+OFFER_PROMPT_FIELDS = tuple(field for field, _ in OFFER_FIELDS) + ("description", "competences_requises", "questions_ids")
+
+
+class TokenCounter:
+    """Compte les tokens d'un texte avec tiktoken s'il est installé et que
+    l'encodage est disponible localement, sinon par estimation.
+    """
+
+    def __init__(self, encoding_name=None):
+        self.encoding_name = encoding_name or PROMPT_TOKENIZER_ENCODING
+        self.backend = None
+        self._encoding = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self.backend is not None:
+                return
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+                self.backend = f"tiktoken:{self.encoding_name}"
+            except Exception as e:
+                # Module absent ou encodage non téléchargeable (serveur hors ligne)
+                logger.info(f"Tokenizer indisponible ({str(e) or type(e).__name__}), estimation par caractères")
+                self.backend = "estimation"
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self.backend is None:
+            self._load()
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def normalize_text(text):
+    """Lignes nettoyées du texte extrait d'un PDF : espaces, puces, coordonnées,
+    numéros de page et lignes répétées (en-têtes et pieds de page) retirés.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    lines = []
+    seen = set()
+    for raw in text.splitlines():
+        line = _BULLETS.sub("", raw.strip())
+        for pattern in _BOILERPLATE:
+            line = pattern.sub(" ", line)
+        line = _SPACES.sub(" ", line).strip(" |,;-")
+        if not line or _BOILERPLATE_LINES.match(line):
+            continue
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line)
+    return lines
+
+
+def split_cv_sections(lines):
+    """Répartit les lignes d'un CV par section. Les lignes qui précèdent le
+    premier intitulé (nom, titre) sont rattachées au profil. Retourne None si
+    aucun intitulé n'est reconnu.
+    """
+    sections = {}
+    current = "profil"
+    found = False
+    for line in lines:
+        if len(line) <= HEADING_MAX_CHARS:
+            heading = next((key for key, _, pattern in _SECTION_PATTERNS if pattern.match(line)), None)
+            if heading:
+                current, found = heading, True
+                continue
+            if _DROPPED_PATTERN.match(line):
+                current, found = None, True
+                continue
+        if current:
+            sections.setdefault(current, []).append(line)
+    return sections if found else None
+
+
+def truncate_lines(lines, budget, counter):
+    """Premières lignes tenant dans `budget` tokens (la dernière est coupée)."""
+    kept = []
+    used = 0
+    for line in lines:
+        tokens = counter.count(line) + 1
+        if used + tokens <= budget:
+            kept.append(line)
+            used += tokens
+            continue
+        remaining = budget - used
+        if remaining > 8:
+            cut = int(len(line) * remaining / tokens)
+            kept.append(line[:cut].rsplit(" ", 1)[0] + " …")
+        break
+    return kept
+
+
+def allocate_budget(sizes, budget):
+    """Répartit équitablement `budget` entre sections : une section plus courte
+    que sa part la garde entière et cède le reste aux autres.
+    """
+    allocation = {}
+    pending = dict(sizes)
+    while pending:
+        share = budget / len(pending)
+        small = {key: size for key, size in pending.items() if size <= share}
+        if not small:
+            allocation.update({key: int(share) for key in pending})
+            break
+        for key, size in small.items():
+            allocation[key] = size
+            budget -= size
+            del pending[key]
+    return allocation
+
+
+def compact_cv(cv_text, budget=None, counter=None):
+    """Texte du CV réduit aux sections utiles (expérience, compétences, projets,
+    formation, profil), dans la limite de `budget` tokens.
+    """
+    budget = budget or PROMPT_CV_TOKEN_BUDGET
+    counter = counter or token_counter
+    lines = normalize_text(cv_text)
+    sections = split_cv_sections(lines)
+    if not sections:
+        return "\n".join(truncate_lines(lines, budget, counter))
+
+    blocks = [(label, sections[key]) for key, label, _ in CV_SECTIONS if sections.get(key)]
+    # Chaque intitulé coûte quelques tokens
+    available = budget - 4 * len(blocks)
+    sizes = {label: sum(counter.count(line) + 1 for line in body) for label, body in blocks}
+    allocation = allocate_budget(sizes, available)
+    parts = []
+    for label, body in blocks:
+        kept = truncate_lines(body, allocation[label], counter)
+        if kept:
+            parts.append(f"## {label}\n" + "\n".join(kept))
+    return "\n\n".join(parts)
+
+
+def serialize_offer(job_offer, budget=None, counter=None):
+    """Champs de l'offre utiles au prompt (poste, entreprise, compétences,
+    description), sans les identifiants ni la liste des candidatures.
+    """
+    budget = budget or PROMPT_OFFER_TOKEN_BUDGET
+    counter = counter or token_counter
+    if not isinstance(job_offer, dict):
+        return "\n".join(truncate_lines(normalize_text(str(job_offer or "")), budget, counter))
+
+    lines = []
+    for field, label in OFFER_FIELDS:
+        value = job_offer.get(field)
+        if value:
+            lines.append(f"{label}: {_SPACES.sub(' ', str(value)).strip()}")
+    competences = job_offer.get("competences_requises") or job_offer.get("questions_ids") or []
+    competences = [c.strip() for c in competences if isinstance(c, str) and c.strip()]
+    if competences:
+        lines.append("Compétences requises: " + ", ".join(competences))
+
+    header = "\n".join(lines)
+    description = normalize_text(job_offer.get("description") or "")
+    remaining = budget - counter.count(header) - 2
+    if description and remaining > 0:
+        header += "\nDescription:\n" + "\n".join(truncate_lines(description, remaining, counter))
+    return header
+
+
+def offer_fingerprint(job_offer):
+    """Empreinte des champs de l'offre utilisés dans les prompts."""
+    return hashlib.sha256(serialize_offer(job_offer).encode("utf-8")).hexdigest()
+
+
+def build_questions_prompt(cv_text, job_offer):
+    """Prompt de génération des 10 questions d'entretien, CV et offre compactés."""
+    cv_compact = compact_cv(cv_text)
+    offer_text = serialize_offer(job_offer)
+    prompt = f"""En tant qu'expert en recrutement, analyse le CV du candidat et l'offre d'emploi pour générer 10 questions pertinentes pour l'entretien.
+
+CV du candidat:
+{cv_compact}
+
+Offre d'emploi:
+{offer_text}
+
+Génère 10 questions qui:
+1. Présentez-vous
+2. Explorent l'expérience pertinente du candidat
+3. Testent la compréhension du rôle
+4. Évaluent la motivation et l'adaptation
+5. Incluent une question sur un défi technique
+6. Questions basées sur le CV du candidat
+
+{QUESTIONS_FORMAT}"""
+    logger.info(
+        f"Prompt questions: CV {len(cv_text or '')} -> {len(cv_compact)} caractères, "
+        f"~{token_counter.count(prompt)} tokens ({token_counter.backend})"
+    )
+    return prompt
+
+
+def build_bank_prompt(job_offer, count):
+    """Prompt des questions communes à tous les candidats d'une offre."""
+    return f"""En tant qu'expert en recrutement, analyse l'offre d'emploi pour générer {count} questions pertinentes pour l'entretien, communes à tous les candidats au poste.
+
+Offre d'emploi:
+{serialize_offer(job_offer)}
+
+Génère {count} questions qui:
+1. Présentez-vous
+2. Testent la compréhension du rôle
+3. Évaluent la motivation et l'adaptation
+4. Incluent une question sur un défi technique lié au poste
+Les questions ne doivent faire référence à aucun candidat en particulier.
+
+{QUESTIONS_FORMAT}"""
+
+
+def build_candidate_questions_prompt(cv_text, job_offer, bank_questions, count):
+    """Prompt des questions propres au CV d'un candidat, en complément de la
+    banque de questions de l'offre (qui n'est pas régénérée).
+    """
+    cv_compact = compact_cv(cv_text)
+    already_asked = "\n".join(f"- {q.get('question', '')}" for q in bank_questions if isinstance(q, dict))
+    prompt = f"""En tant qu'expert en recrutement, analyse le CV du candidat au regard de l'offre d'emploi pour générer {count} questions pertinentes pour l'entretien, propres à ce candidat.
+
+CV du candidat:
+{cv_compact}
+
+Offre d'emploi:
+{serialize_offer(job_offer)}
+
+Questions déjà posées à tous les candidats (ne pas les répéter):
+{already_asked}
+
+Génère {count} questions qui:
+1. Explorent l'expérience pertinente du candidat
+2. Portent sur des projets, réalisations ou compétences cités dans le CV
+3. Vérifient l'adéquation entre le parcours du candidat et les compétences requises
+
+{QUESTIONS_FORMAT}"""
+    logger.info(
+        f"Prompt questions du candidat: CV {len(cv_text or '')} -> {len(cv_compact)} caractères, "
+        f"~{token_counter.count(prompt)} tokens ({token_counter.backend})"
+    )
+    return prompt
+
+
+# Create a single instance of TokenCounter
+token_counter = TokenCounter()
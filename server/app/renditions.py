@@ -0,0 +1,288 @@
+import logging
+import os
+import re
+import subprocess
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from flask import current_app
+
+from config.config import (
+    RENDITION_VIDEO_FORMAT, RENDITION_MAX_HEIGHT, RENDITION_VIDEO_CRF,
+    RENDITION_AUDIO_ENABLED, RENDITION_AUDIO_BITRATE, RENDITION_CONCURRENCY
+)
+from audio_segments import ffmpeg_binary
+from jobs import enqueue, job_handler, heartbeat, is_last_attempt
+from transcription import ENTRETIENS_COLLECTION, media_absolute_path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Conversion des vidéos d'entretien en versions compressées par les workers
+RENDITION_JOB_TYPE = 'transcode_video'
+# Après les rapports et les transcriptions
+RENDITION_JOB_PRIORITY = -10
+RENDITIONS_EN_ATTENTE = 'en_attente'
+RENDITIONS_EN_COURS = 'en_cours'
+RENDITIONS_TERMINE = 'termine'
+RENDITIONS_ECHEC = 'echec'
+
+RENDITIONS_DIR = 'Uploads/videos/renditions'
+# Prolongation du bail du job pendant une conversion longue
+HEARTBEAT_SECONDS = 60
+
+MEDIA_TYPES = {
+    ".webm": "video/webm",
+    ".weba": "audio/webm",
+    ".mp4": "video/mp4",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".m4a": "audio/mp4"
+}
+
+# Vidéo compressée lisible dès les premiers octets : index (moov / Cues) en
+# tête de fichier, audio mono suffisant pour la parole
+VIDEO_FORMATS = {
+    "mp4": {
+        "extension": ".mp4",
+        "muxer": "mp4",
+        "codec": "h264",
+        "args": [
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", str(RENDITION_VIDEO_CRF), "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "64k", "-ac", "1",
+            "-movflags", "+faststart"
+        ]
+    },
+    "webm": {
+        "extension": ".webm",
+        "muxer": "webm",
+        "codec": "vp9",
+        "args": [
+            "-c:v", "libvpx-vp9", "-crf", str(RENDITION_VIDEO_CRF), "-b:v", "0",
+            "-deadline", "good", "-cpu-used", "4", "-row-mt", "1",
+            "-c:a", "libopus", "-b:a", "48k", "-ac", "1",
+            "-cues_to_front", "1"
+        ]
+    }
+}
+AUDIO_ARGS = ["-vn", "-c:a", "libopus", "-b:a", RENDITION_AUDIO_BITRATE, "-ac", "1", "-application", "voip"]
+
+
+def media_mimetype(path, default="video/webm"):
+    """Type MIME d'un média d'après son extension."""
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), default)
+
+
+def probe_media(path):
+    """Durée (s), codecs et dimensions d'un média lus dans la sortie de `ffmpeg -i`."""
+    completed = subprocess.run(
+        [ffmpeg_binary(), "-nostdin", "-hide_banner", "-i", path],
+        capture_output=True
+    )
+    output = completed.stderr.decode(errors="replace")
+    info = {"duration": None, "video_codec": None, "width": None, "height": None, "audio_codec": None}
+    # Les webm enregistrés par MediaRecorder n'ont souvent pas de durée (N/A)
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", output)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    video = re.search(r"Stream #\S+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})", output)
+    if video:
+        info["video_codec"] = video.group(1)
+        info["width"], info["height"] = int(video.group(2)), int(video.group(3))
+    audio = re.search(r"Stream #\S+.*?: Audio: (\w+)", output)
+    if audio:
+        info["audio_codec"] = audio.group(1)
+    return info
+
+
+def run_ffmpeg(arguments, on_progress=None):
+    """Lance ffmpeg en appelant `on_progress` toutes les HEARTBEAT_SECONDS."""
+    process = subprocess.Popen(
+        [ffmpeg_binary(), "-nostdin", "-hide_banner", "-loglevel", "error", "-y"] + arguments,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    while True:
+        try:
+            _, stderr = process.communicate(timeout=HEARTBEAT_SECONDS)
+            break
+        except subprocess.TimeoutExpired:
+            if on_progress:
+                on_progress()
+    if process.returncode != 0:
+        raise RuntimeError(f"Conversion impossible: {stderr.decode(errors='replace').strip()}")
+
+
+def transcode(source, destination, muxer, arguments, on_progress=None):
+    """Écrit la conversion à côté de sa destination puis la renomme : un
+    lecteur ne voit jamais de fichier partiel."""
+    temp_path = f"{destination}.part"
+    try:
+        run_ffmpeg(["-i", source] + arguments + ["-f", muxer, temp_path], on_progress)
+        os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return destination
+
+
+def strip_video_track(path):
+    """Réécrit un média reçu en capture audio avec sa seule piste audio.
+
+    Un webm qui contient encore de la vidéo (client qui enregistre la caméra)
+    n'est pas seulement renommé : sa piste audio est copiée sans réencodage.
+    """
+    muxer = "ogg" if os.path.splitext(path)[1].lower() in (".opus", ".ogg") else "webm"
+    transcode(path, path, muxer, ["-map", "0:a:0", "-c:a", "copy"])
+    logger.info(f"Piste vidéo retirée d'un média en capture audio: {path} ({os.path.getsize(path)} octets)")
+
+
+def rendition_entry(kind, relative_path, info, codec=None, source=False):
+    path = media_absolute_path(relative_path)
+    size = os.path.getsize(path)
+    entry = {
+        "type": kind,
+        "path": relative_path,
+        "mimetype": media_mimetype(relative_path, "audio/ogg" if kind == "audio" else "video/webm"),
+        "codec": codec or (info["video_codec"] if kind == "video" else info["audio_codec"]),
+        "width": info["width"] if kind == "video" else None,
+        "height": info["height"] if kind == "video" else None,
+        "size": size,
+        "bitrate": int(size * 8 / info["duration"]) if info.get("duration") else None
+    }
+    if source:
+        entry["source"] = True
+    return entry
+
+
+def build_renditions(entretien_id, media_path, on_progress=None):
+    """Produit les versions compressées d'un média et retourne leur description,
+    le média d'origine compris (`source`)."""
+    source = media_absolute_path(media_path)
+    info = probe_media(source)
+    renditions = [rendition_entry("video" if info["height"] else "audio", media_path, info, source=True)]
+    original_size = renditions[0]["size"]
+    os.makedirs(media_absolute_path(RENDITIONS_DIR), exist_ok=True)
+
+    if info["height"]:
+        video_format = VIDEO_FORMATS[RENDITION_VIDEO_FORMAT]
+        height = min(RENDITION_MAX_HEIGHT, info["height"])
+        relative_path = f"{RENDITIONS_DIR}/entretien_{entretien_id}_{height}p{video_format['extension']}"
+        path = transcode(
+            source, media_absolute_path(relative_path), video_format["muxer"],
+            ["-map", "0:v:0", "-map", "0:a:0?", "-vf", f"scale=-2:trunc(min({height}\\,ih)/2)*2"] + video_format["args"],
+            on_progress
+        )
+        if os.path.getsize(path) < original_size:
+            converted = probe_media(path)
+            converted["duration"] = converted["duration"] or info["duration"]
+            renditions.append(rendition_entry("video", relative_path, converted, video_format["codec"]))
+        else:
+            # Vidéo déjà compacte : l'originale reste la plus petite
+            os.remove(path)
+
+    # Un entretien capturé en audio seul (Opus) est déjà compact
+    if RENDITION_AUDIO_ENABLED and info["audio_codec"] and (info["height"] or info["audio_codec"] != "opus"):
+        relative_path = f"{RENDITIONS_DIR}/entretien_{entretien_id}_audio.opus"
+        transcode(source, media_absolute_path(relative_path), "ogg", AUDIO_ARGS, on_progress)
+        renditions.append(rendition_entry("audio", relative_path, info, "opus"))
+    return renditions
+
+
+def remove_renditions(renditions):
+    for rendition in renditions or []:
+        if not rendition.get("source"):
+            try:
+                os.remove(media_absolute_path(rendition["path"]))
+            except OSError:
+                pass
+
+
+def enqueue_renditions(db, entretien_id, media_path):
+    """Met en file la conversion du média d'un entretien et retourne l'ID du job."""
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": ObjectId(entretien_id)},
+        {"$set": {"renditions_statut": RENDITIONS_EN_ATTENTE}}
+    )
+    return enqueue(
+        db,
+        RENDITION_JOB_TYPE,
+        {"entretien_id": str(entretien_id), "media_path": media_path},
+        priority=RENDITION_JOB_PRIORITY,
+        dedupe_key=f"renditions:{entretien_id}"
+    )
+
+
+@job_handler(RENDITION_JOB_TYPE, max_concurrency=RENDITION_CONCURRENCY)
+def transcode_video_job(payload, job):
+    """Convertit la vidéo d'un entretien en versions compressées ; les versions
+    sont enregistrées sur l'entretien (`renditions`)."""
+    db = current_app.mongo
+    entretien_id = ObjectId(payload["entretien_id"])
+    media_path = payload["media_path"]
+    current = {"_id": entretien_id, "video_path": media_path}
+    if not os.path.isfile(media_absolute_path(media_path)):
+        logger.error(f"Média introuvable pour la conversion de {entretien_id}: {media_path}")
+        db[ENTRETIENS_COLLECTION].update_one(current, {"$set": {"renditions_statut": RENDITIONS_ECHEC}})
+        return {"ignore": "média introuvable"}
+
+    db[ENTRETIENS_COLLECTION].update_one(current, {"$set": {"renditions_statut": RENDITIONS_EN_COURS}})
+    try:
+        renditions = build_renditions(entretien_id, media_path, on_progress=lambda: heartbeat(db, job))
+    except Exception:
+        db[ENTRETIENS_COLLECTION].update_one(current, {"$set": {
+            "renditions_statut": RENDITIONS_ECHEC if is_last_attempt(job) else RENDITIONS_EN_ATTENTE
+        }})
+        raise
+
+    result = db[ENTRETIENS_COLLECTION].update_one(current, {"$set": {
+        "renditions": renditions,
+        "renditions_statut": RENDITIONS_TERMINE,
+        "renditions_date": datetime.now(timezone.utc)
+    }})
+    if result.matched_count == 0:
+        # Vidéo remplacée pendant la conversion
+        remove_renditions(renditions)
+        return {"ignore": "vidéo remplacée"}
+
+    original = renditions[0]["size"]
+    logger.info(f"Versions de l'entretien {entretien_id}: " + ", ".join(
+        f"{r['type']} {r['codec']} {r['size']} octets ({r['size'] / original:.0%})" for r in renditions[1:]
+    ))
+    return {"renditions": [{"type": r["type"], "codec": r["codec"], "size": r["size"]} for r in renditions]}
+
+
+def accepted_types(formats=None, accept=None):
+    """Types MIME lisibles par le client : paramètre `formats` (ex: "mp4,webm")
+    ou en-tête Accept. None si le client accepte tout."""
+    if formats:
+        return {MEDIA_TYPES.get(f".{value.strip().lower().lstrip('.')}", value.strip().lower())
+                for value in formats.split(",") if value.strip()}
+    types = {value.split(";")[0].strip().lower() for value in (accept or "").split(",") if value.strip()}
+    if not types or "*/*" in types:
+        return None
+    return types
+
+
+def _accepts(types, mimetype):
+    return types is None or mimetype in types or f"{mimetype.split('/')[0]}/*" in types
+
+
+def select_rendition(renditions, kind="video", types=None, min_height=None):
+    """Plus petite version qui convient au client, ou None.
+
+    Une version convient si son type est lisible (`types`), si elle contient
+    de la vidéo quand `kind` vaut "video" et si sa hauteur atteint
+    `min_height` (ou la plus haute disponible si aucune ne l'atteint).
+    """
+    candidates = [
+        rendition for rendition in renditions or []
+        if (kind == "audio" or rendition["type"] == "video") and _accepts(types, rendition["mimetype"])
+    ]
+    if min_height and kind == "video" and candidates:
+        target = min(min_height, max(rendition.get("height") or 0 for rendition in candidates))
+        candidates = [rendition for rendition in candidates if (rendition.get("height") or 0) >= target]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda rendition: rendition["size"])
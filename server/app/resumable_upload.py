@@ -0,0 +1,257 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+
+from config.config import MAX_INTERVIEW_UPLOAD_SIZE, UPLOAD_EXPIRATION_HOURS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+UPLOADS_COLLECTION = 'uploads'
+
+TUS_VERSION = "1.0.0"
+# Taille des blocs lus depuis la requête et écrits sur le disque
+WRITE_CHUNK_SIZE = 1024 * 1024
+# Durée du verrou posé sur un upload pendant un PATCH, prolongé au fil des
+# blocs écrits dès qu'il lui reste moins de la moitié de sa durée
+LOCK_SECONDS = 120
+LOCK_RENEW_SECONDS = LOCK_SECONDS / 2
+# Les octets reçus sont écrits dans `<path>.part`, renommé une fois complet :
+# un fichier .part sans upload actif est un reste d'upload abandonné
+PARTIAL_SUFFIX = ".part"
+
+
+class UploadError(Exception):
+    """Erreur du protocole d'upload, convertie en réponse JSON par la route."""
+
+    def __init__(self, message, code, status):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+
+
+def ensure_indexes(db):
+    """Index de recherche et expiration automatique des uploads abandonnés."""
+    db[UPLOADS_COLLECTION].create_index([("entretien_id", ASCENDING)])
+    db[UPLOADS_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+
+
+def create_upload(db, entretien_id, candidat_id, length, path):
+    """Déclare un nouvel upload de `length` octets écrit dans `path`."""
+    if length <= 0:
+        raise UploadError("Taille d'upload invalide", "INVALID_UPLOAD_LENGTH", 400)
+    if length > MAX_INTERVIEW_UPLOAD_SIZE:
+        raise UploadError(
+            f"Taille maximale dépassée ({MAX_INTERVIEW_UPLOAD_SIZE} octets)",
+            "UPLOAD_TOO_LARGE",
+            413
+        )
+
+    # Créer le fichier partiel vide : les PATCH y ajoutent les blocs en O_APPEND
+    partial_path = f"{path}{PARTIAL_SUFFIX}"
+    fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o640)
+    os.close(fd)
+
+    now = datetime.now(timezone.utc)
+    upload = {
+        "entretien_id": ObjectId(entretien_id),
+        "candidat_id": ObjectId(candidat_id),
+        "length": length,
+        "offset": 0,
+        "path": path,
+        "partial_path": partial_path,
+        "statut": "en_cours",
+        "verrou_jusqu_a": None,
+        "date_creation": now,
+        "date_maj": now,
+        "expires_at": now + timedelta(hours=UPLOAD_EXPIRATION_HOURS)
+    }
+    upload["_id"] = db[UPLOADS_COLLECTION].insert_one(upload).inserted_id
+    logger.info(f"Upload créé: {upload['_id']} ({length} octets) pour l'entretien {entretien_id}")
+    return upload
+
+
+def get_upload(db, upload_id, entretien_id, candidat_id):
+    """Récupère un upload appartenant au candidat, ou None."""
+    try:
+        upload_obj_id = ObjectId(upload_id)
+    except Exception:
+        return None
+    return db[UPLOADS_COLLECTION].find_one({
+        "_id": upload_obj_id,
+        "entretien_id": ObjectId(entretien_id),
+        "candidat_id": ObjectId(candidat_id)
+    })
+
+
+def _lock_until():
+    # Précision de MongoDB (milliseconds) : la valeur relue doit être
+    # identique pour identifier le détenteur du verrou
+    until = datetime.now(timezone.utc) + timedelta(seconds=LOCK_SECONDS)
+    return until.replace(microsecond=until.microsecond // 1000 * 1000)
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def append_chunk(db, upload, offset, stream, content_length=None):
+    """Ajoute au fichier les octets lus depuis `stream` à partir de `offset`.
+
+    L'offset doit correspondre à celui enregistré. Les octets reçus avant
+    une coupure de connexion sont conservés : le client reprend à l'offset
+    retourné par la requête HEAD. Retourne le nouvel offset.
+    """
+    length = upload["length"]
+    if content_length is not None and offset + content_length > length:
+        raise UploadError("Le bloc dépasse la taille déclarée", "UPLOAD_TOO_LARGE", 413)
+
+    now = datetime.now(timezone.utc)
+    lock = _lock_until()
+    claimed = db[UPLOADS_COLLECTION].find_one_and_update(
+        {
+            "_id": upload["_id"],
+            "statut": "en_cours",
+            "offset": offset,
+            "$or": [{"verrou_jusqu_a": None}, {"verrou_jusqu_a": {"$lt": now}}]
+        },
+        {"$set": {"verrou_jusqu_a": lock}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not claimed:
+        raise UploadError("Offset invalide ou upload en cours d'écriture", "OFFSET_CONFLICT", 409)
+
+    def renew_lock():
+        # Le verrou posé identifie son détenteur : s'il a été repris par un
+        # autre écrivain (PATCH bloqué au-delà de LOCK_SECONDS), on s'arrête
+        nonlocal lock, renewed_at
+        renewed = _lock_until()
+        result = db[UPLOADS_COLLECTION].update_one(
+            {"_id": upload["_id"], "verrou_jusqu_a": lock},
+            {"$set": {"verrou_jusqu_a": renewed}}
+        )
+        if result.matched_count == 0:
+            raise UploadError("Verrou de l'upload perdu pendant l'écriture", "LOCK_LOST", 409)
+        lock, renewed_at = renewed, time.monotonic()
+
+    written = 0
+    renewed_at = time.monotonic()
+    lock_lost = False
+    fd = os.open(upload.get("partial_path", upload["path"]), os.O_WRONLY | os.O_APPEND)
+    try:
+        # Supprimer les octets d'une écriture interrompue non enregistrée
+        os.ftruncate(fd, offset)
+        while True:
+            remaining = length - offset - written
+            chunk = stream.read(min(WRITE_CHUNK_SIZE, remaining + 1))
+            if not chunk:
+                break
+            if len(chunk) > remaining:
+                raise UploadError("Le bloc dépasse la taille déclarée", "UPLOAD_TOO_LARGE", 413)
+            if time.monotonic() - renewed_at >= LOCK_RENEW_SECONDS:
+                try:
+                    renew_lock()
+                except UploadError:
+                    lock_lost = True
+                    raise
+            _write_all(fd, chunk)
+            written += len(chunk)
+    finally:
+        os.close(fd)
+        if not lock_lost:
+            # Enregistré seulement par le détenteur du verrou
+            db[UPLOADS_COLLECTION].update_one(
+                {"_id": upload["_id"], "verrou_jusqu_a": lock},
+                {"$set": {
+                    "offset": offset + written,
+                    "verrou_jusqu_a": None,
+                    "date_maj": datetime.now(timezone.utc)
+                }}
+            )
+        logger.info(f"Upload {upload['_id']}: {written} octets reçus (offset {offset + written}/{length})")
+
+    return offset + written
+
+
+def complete_upload(db, upload):
+    """Marque l'upload comme terminé une fois tous les octets reçus ; le
+    fichier partiel prend alors son nom définitif (`path`)."""
+    if upload.get("statut") == "termine":
+        return upload
+    if upload["offset"] != upload["length"]:
+        raise UploadError(
+            f"Upload incomplet ({upload['offset']}/{upload['length']} octets)",
+            "UPLOAD_INCOMPLETE",
+            409
+        )
+    partial_path = upload.get("partial_path")
+    if partial_path and os.path.exists(partial_path):
+        os.replace(partial_path, upload["path"])
+    completed = db[UPLOADS_COLLECTION].find_one_and_update(
+        {"_id": upload["_id"], "offset": upload["length"]},
+        {"$set": {"statut": "termine", "date_maj": datetime.now(timezone.utc)}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not completed:
+        raise UploadError("Upload modifié pendant la finalisation", "OFFSET_CONFLICT", 409)
+    return completed
+
+
+def claim_finalization(db, upload):
+    """Réserve le traitement de l'entretien pour un upload terminé.
+
+    Retourne False si une finalisation précédente l'a déjà pris en charge :
+    une requête de finalisation répétée n'a alors aucun effet.
+    """
+    result = db[UPLOADS_COLLECTION].update_one(
+        {"_id": upload["_id"], "statut": "termine", "entretien_finalise": {"$ne": True}},
+        {"$set": {"entretien_finalise": True, "date_maj": datetime.now(timezone.utc)}}
+    )
+    return result.modified_count == 1
+
+
+def release_finalization(db, upload):
+    """Rend la finalisation après un échec du traitement : le client peut réessayer."""
+    db[UPLOADS_COLLECTION].update_one(
+        {"_id": upload["_id"]},
+        {"$unset": {"entretien_finalise": ""}}
+    )
+
+
+def purge_abandoned_uploads(db, directory, grace_seconds=LOCK_SECONDS):
+    """Supprime de `directory` les fichiers partiels dont l'upload a expiré.
+
+    L'index TTL supprime les documents des uploads abandonnés mais pas leurs
+    octets sur disque. Un fichier partiel récent (upload en cours de
+    création) est conservé. Retourne (fichiers supprimés, fichiers restants).
+    """
+    now = datetime.now(timezone.utc)
+    removed, remaining = 0, 0
+    for name in os.listdir(directory):
+        if not name.endswith(PARTIAL_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        active = db[UPLOADS_COLLECTION].find_one(
+            {"partial_path": path, "statut": "en_cours", "expires_at": {"$gt": now}},
+            {"_id": 1}
+        )
+        try:
+            if active or time.time() - os.path.getmtime(path) < grace_seconds:
+                remaining += 1
+                continue
+            os.remove(path)
+        except OSError:
+            continue
+        db[UPLOADS_COLLECTION].delete_many({"partial_path": path})
+        removed += 1
+        logger.info(f"Fichier d'upload abandonné supprimé: {path}")
+    return removed, remaining
@@ -4,6 +4,7 @@ from bson import ObjectId
 from datetime import datetime
 import logging
 from .entretiens_questions import generate_interview_questions, extract_text_from_pdf
+from llm_resilience import LLMError, llm_error_response
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -52,6 +53,9 @@ def accept_candidate(candidature_id):
             "questions": questions
         }), 200
 
+    except LLMError as e:
+        logger.error(f"Service LLM indisponible: {e.message}")
+        return llm_error_response(e)
     except Exception as e:
         logger.error(f"Erreur lors de l'acceptation du candidat: {str(e)}")
         return jsonify({"error": str(e)}), 500 
\ No newline at end of file
@@ -1,15 +1,40 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, make_response, Response, stream_with_context
 from bson import ObjectId
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from jwt_manager import jwt_manager
 import logging
 from flask_cors import cross_origin
 from pymongo.errors import PyMongoError
+import base64
 import json
 import os
-import whisper
+import time
+import uuid
+from contextlib import closing
 import requests
-import httpx
+from resumable_upload import (
+    TUS_VERSION, UploadError, create_upload, get_upload, append_chunk, complete_upload,
+    claim_finalization, release_finalization, purge_abandoned_uploads
+)
+from config.config import (
+    MAX_INTERVIEW_UPLOAD_SIZE, TRANSCRIPTION_ON_SAVE, RENDITIONS_ON_SAVE, UPLOAD_PURGE_INTERVAL_SECONDS,
+    LIVE_TRANSCRIPTION_ENABLED, LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES, LIVE_TRANSCRIPTION_RAPPORT_DELAY_SECONDS
+)
+from jobs import enqueue, job_handler, heartbeat, is_last_attempt, run_now
+from pymongo import ReturnDocument
+from cache import TTLCache
+from metrics import StageTimer
+from scoring import InterviewScorer
+from llm_cache import CACHE_USE, cache_mode_from_request
+from llm_resilience import LLMError
+from media_signing import media_signer
+from transcription import enqueue_transcription
+from renditions import enqueue_renditions, probe_media, strip_video_track
+from video_store import CAPTURE_AUDIO, capture_extension, entretien_capture_mode, write_stream_file
+from live_transcription import (
+    LIVE_FIELD, LIVE_JOB_TYPE, LIVE_TERMINE, live_state, pending_live_questions, append_live_audio,
+    enqueue_live_pass, advance_live_transcription, abandon_live_transcription
+)
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -23,11 +48,32 @@ ENTRETIENS_COLLECTION = 'entretiens'
 QUESTIONS_COLLECTION = 'questions'
 RAPPORTS_COLLECTION = 'rapports'
 
-# Configuration Groq
-GROQ_API_KEY = "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"
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-
-logger.info("Configuration Groq initialisée")
+# Génération du rapport en arrière-plan
+REPORT_JOB_TYPE = 'generate_rapport'
+RAPPORT_EN_ATTENTE = 'en_attente'
+RAPPORT_EN_COURS = 'en_cours'
+RAPPORT_TERMINE = 'termine'
+RAPPORT_ECHEC = 'echec'
+
+# Bail de la génération d'un rapport (job ou flux SSE) : passé ce délai, un
+# autre processus peut la reprendre
+RAPPORT_LEASE_SECONDS = 600
+# Prolongation du bail du job et de la réservation du rapport pendant la
+# génération (au plus une fois par intervalle)
+RAPPORT_HEARTBEAT_SECONDS = 30
+# Intervalle de lecture de l'état d'un rapport généré par un autre processus
+RAPPORT_STREAM_POLL_SECONDS = 1
+# Commentaire SSE envoyé après ce délai sans événement
+RAPPORT_STREAM_PING_SECONDS = 5
+
+# Purge des fichiers d'uploads abandonnés, après tous les autres jobs
+UPLOAD_PURGE_JOB_TYPE = 'purge_uploads'
+UPLOAD_PURGE_JOB_PRIORITY = -20
+
+
+# Cache des listes de questions : un document questions ne change plus une
+# fois l'entretien créé
+questions_cache = TTLCache(maxsize=1024, ttl=900)
 
 def serialize_doc(doc):
     """Serialize MongoDB document to JSON-compatible format."""
@@ -94,6 +140,35 @@ def get_user_from_token(token):
         logger.error(f"Erreur lors de la vérification du token: {str(e)}")
         return None
 
+def authenticate_candidat():
+    """Vérifie le token de la requête et retourne (user, erreur) pour un candidat."""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None, (jsonify({"error": "Authentification requise", "code": "NO_TOKEN"}), 401)
+
+    user = get_user_from_token(auth_header)
+    if not user:
+        return None, (jsonify({"error": "Token invalide ou expiré", "code": "INVALID_TOKEN"}), 401)
+
+    if 'candidat' not in user.get('roles', []):
+        return None, (jsonify({"error": "Accès réservé aux candidats", "code": "UNAUTHORIZED_ROLE"}), 403)
+
+    return user, None
+
+def get_questions_list(db, questions_id):
+    """Retourne la liste des questions d'un entretien, depuis le cache si possible."""
+    if not questions_id:
+        return []
+    key = str(questions_id)
+    questions_list = questions_cache.get(key)
+    if questions_list is None:
+        questions_doc = db[QUESTIONS_COLLECTION].find_one({"_id": ObjectId(questions_id)}, {"questions": 1})
+        if not questions_doc:
+            return []
+        questions_list = questions_doc.get('questions', [])
+        questions_cache.set(key, questions_list)
+    return questions_list
+
 def validate_interview_access(db, entretien_id, user_id):
     """Validate interview access and return interview data if valid."""
     try:
@@ -137,6 +212,68 @@ def process_transcriptions(transcriptions, questions_list):
     
     return processed
 
+def stored_recordings(entretien):
+    """Réponses persistées question par question. `$set recordings.<index>`
+    laisse des cases null pour les questions sans réponse : elles sont ignorées."""
+    return [
+        recording for recording in entretien.get('recordings') or []
+        if isinstance(recording, dict) and isinstance(recording.get('questionIndex'), int)
+    ]
+
+def merge_recordings(existing, processed):
+    """Fusionne les réponses déjà persistées question par question avec celles
+    reçues en fin d'entretien. Les réponses persistées sont prioritaires."""
+    merged = {}
+    for recording in processed:
+        merged[recording['questionIndex']] = recording
+    for recording in existing or []:
+        if isinstance(recording, dict) and isinstance(recording.get('questionIndex'), int):
+            merged[recording['questionIndex']] = recording
+    return [merged[index] for index in sorted(merged)]
+
+def ensure_video_dir():
+    """Crée si nécessaire le dossier de stockage des vidéos et retourne (video_dir, erreur)."""
+    try:
+        # Vérifier si UPLOAD_FOLDER est configuré
+        if not current_app.config.get('UPLOAD_FOLDER'):
+            logger.error("UPLOAD_FOLDER non configuré dans l'application")
+            return None, (jsonify({
+                "success": False,
+                "error": "Configuration manquante pour le stockage des vidéos",
+                "code": "MISSING_CONFIG"
+            }), 500)
+
+        # Créer le dossier upload s'il n'existe pas
+        upload_dir = os.path.join(current_app.root_path, 'Uploads')
+        if not os.path.exists(upload_dir):
+            os.makedirs(upload_dir)
+            logger.info(f"Dossier upload créé: {upload_dir}")
+
+        # Créer le dossier videos s'il n'existe pas
+        video_dir = os.path.join(upload_dir, 'videos')
+        if not os.path.exists(video_dir):
+            os.makedirs(video_dir)
+            logger.info(f"Dossier videos créé: {video_dir}")
+
+        # Vérifier les permissions d'écriture
+        if not os.access(video_dir, os.W_OK):
+            logger.error(f"Pas de permission d'écriture sur le dossier: {video_dir}")
+            return None, (jsonify({
+                "success": False,
+                "error": "Erreur de permission pour le stockage des vidéos",
+                "code": "PERMISSION_ERROR"
+            }), 500)
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la création des dossiers: {str(e)}")
+        return None, (jsonify({
+            "success": False,
+            "error": "Erreur lors de la création des dossiers de stockage",
+            "code": "DIRECTORY_CREATION_ERROR"
+        }), 500)
+
+    return video_dir, None
+
 @entretiens_bp.route("/<entretien_id>", methods=["GET"])
 @cross_origin(origins="http://localhost:3000")
 def get_entretien(entretien_id):
@@ -173,7 +310,8 @@ def get_entretien(entretien_id):
 
         # Organiser les questions et réponses
         qa_pairs = []
-        recordings = entretien.get('recordings', [])
+        # Ignorer les emplacements vides laissés par les réponses incrémentales
+        recordings = [r for r in entretien.get('recordings', []) if isinstance(r, dict)]
         
         for i, question in enumerate(questions_list):
             answer = next((r.get('transcript', '') for r in recordings if r.get('questionIndex') == i), '')
@@ -192,7 +330,9 @@ def get_entretien(entretien_id):
             "data": {
                 "entretien": entretien_data,
                 "questions": questions_list,
-                "qa_pairs": qa_pairs
+                "qa_pairs": qa_pairs,
+                # "audio" : le navigateur n'enregistre que la piste Opus
+                "captureMode": entretien_capture_mode(db, entretien)
             }
         }), 200
         
@@ -203,10 +343,182 @@ def get_entretien(entretien_id):
         logger.error(f"Erreur serveur: {str(e)}")
         return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
 
+@entretiens_bp.route("/<entretien_id>/answers", methods=["POST"])
+@cross_origin(origins="http://localhost:3000")
+def save_answer(entretien_id):
+    """Enregistre la réponse à une question dès que le candidat l'a terminée.
+
+    Accepte du JSON ou un formulaire multipart avec `questionIndex`, `answer`
+    et, en option, un fichier `audio` et les positions `startOffset` /
+    `endOffset` (ms) de la réponse dans l'enregistrement.
+    """
+    try:
+        user, error_response = authenticate_candidat()
+        if error_response:
+            return error_response
+
+        db = current_app.mongo
+        entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
+        if error_msg:
+            return jsonify({"error": error_msg, "code": error_code}), error_code
+
+        if entretien.get('statut') == 'termine':
+            return jsonify({"error": "Entretien déjà terminé", "code": "INTERVIEW_COMPLETED"}), 409
+
+        data = request.get_json(silent=True) or request.form
+        try:
+            question_index = int(data.get('questionIndex'))
+        except (TypeError, ValueError):
+            return jsonify({"error": "questionIndex invalide", "code": "INVALID_QUESTION_INDEX"}), 400
+
+        questions_list = get_questions_list(db, entretien.get('questions_id'))
+        if not 0 <= question_index < len(questions_list):
+            return jsonify({"error": "Question inexistante", "code": "INVALID_QUESTION_INDEX"}), 400
+
+        recording = {
+            "questionIndex": question_index,
+            "question": questions_list[question_index],
+            "transcript": data.get('answer', ''),
+            "timestamp": datetime.now(timezone.utc)
+        }
+        # Transcription en direct déjà terminée : elle remplace celle du navigateur
+        live = live_state(entretien, question_index)
+        if live and live.get('statut') == LIVE_TERMINE:
+            recording.update({
+                "transcript": live.get('texte', ''),
+                "transcript_client": recording["transcript"],
+                "transcript_source": "serveur",
+                "transcription_segments": live.get('segments', [])
+            })
+        for field in ('startOffset', 'endOffset'):
+            if data.get(field) is not None:
+                try:
+                    recording[field] = int(data.get(field))
+                except (TypeError, ValueError):
+                    return jsonify({"error": f"{field} invalide", "code": "INVALID_OFFSET"}), 400
+
+        # Segment audio optionnel de la réponse
+        audio_file = request.files.get('audio')
+        if audio_file:
+            audio_dir = os.path.join(current_app.root_path, 'Uploads', 'audio')
+            os.makedirs(audio_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            audio_path = os.path.join(audio_dir, f"entretien_{entretien_id}_q{question_index}_{timestamp}.webm")
+            audio_file.save(audio_path)
+            recording["audio_path"] = os.path.relpath(audio_path, current_app.root_path).replace('\\', '/')
+
+        # Un tableau est nécessaire pour que $set sur recordings.<index> ne
+        # crée pas un sous-document à clés numériques
+        entretien_filter = {"_id": ObjectId(entretien_id), "candidat_id": ObjectId(user.get('id'))}
+        db[ENTRETIENS_COLLECTION].update_one(
+            {**entretien_filter, "recordings": {"$exists": False}},
+            {"$set": {"recordings": []}}
+        )
+        result = db[ENTRETIENS_COLLECTION].update_one(
+            {**entretien_filter, "statut": {"$ne": "termine"}},
+            {"$set": {
+                f"recordings.{question_index}": recording,
+                "statut": "en_cours",
+                "date_maj": datetime.now(timezone.utc)
+            }}
+        )
+        if result.matched_count == 0:
+            return jsonify({"error": "Entretien déjà terminé", "code": "INTERVIEW_COMPLETED"}), 409
+
+        logger.info(f"Réponse {question_index} enregistrée pour l'entretien {entretien_id}")
+        return jsonify({
+            "success": True,
+            "data": {"recording": serialize_doc(recording)}
+        }), 200
+
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement de la réponse: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
+
+def live_response(state):
+    """Offset reçu et transcription disponible d'une réponse transcrite en direct."""
+    response = make_response(jsonify({
+        "success": True,
+        "data": {
+            "offset": state.get('recu', 0),
+            "statut": state.get('statut'),
+            "transcription": state.get('texte', ''),
+            "transcritJusqua": state.get('transcrit_jusqu_a', 0.0)
+        }
+    }), 200)
+    response.headers['Upload-Offset'] = str(state.get('recu', 0))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@entretiens_bp.route("/<entretien_id>/live/<int:question_index>", methods=["GET", "POST"])
+@cross_origin(origins="http://localhost:3000", expose_headers=["Upload-Offset"])
+def live_answer_audio(entretien_id, question_index):
+    """Transcription en direct d'une réponse.
+
+    POST : ajoute un bloc d'audio PCM 16 bits, 16 kHz, mono (corps
+    application/octet-stream) à l'offset `Upload-Offset` ; `?final=1` pour le
+    dernier bloc de la réponse. GET : offset reçu (reprise après coupure) et
+    transcription déjà disponible. Disponible si LIVE_TRANSCRIPTION_ENABLED.
+    """
+    if not LIVE_TRANSCRIPTION_ENABLED:
+        return jsonify({"error": "Transcription en direct désactivée", "code": "LIVE_TRANSCRIPTION_DISABLED"}), 404
+    try:
+        user, error_response = authenticate_candidat()
+        if error_response:
+            return error_response
+
+        db = current_app.mongo
+        entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
+        if error_msg:
+            return jsonify({"error": error_msg, "code": error_code}), error_code
+
+        if request.method == 'GET':
+            return live_response(live_state(entretien, question_index) or {})
+
+        if entretien.get('statut') == 'termine':
+            return jsonify({"error": "Entretien déjà terminé", "code": "INTERVIEW_COMPLETED"}), 409
+
+        questions_list = get_questions_list(db, entretien.get('questions_id'))
+        if not 0 <= question_index < len(questions_list):
+            return jsonify({"error": "Question inexistante", "code": "INVALID_QUESTION_INDEX"}), 400
+
+        if request.mimetype != 'application/octet-stream':
+            return jsonify({
+                "error": "Content-Type application/octet-stream requis",
+                "code": "INVALID_CONTENT_TYPE"
+            }), 415
+        if request.content_length and request.content_length > LIVE_TRANSCRIPTION_MAX_CHUNK_BYTES:
+            return jsonify({"error": "Bloc audio trop volumineux", "code": "CHUNK_TOO_LARGE"}), 413
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({"error": "En-tête Upload-Offset manquant ou invalide", "code": "INVALID_UPLOAD_OFFSET"}), 400
+
+        try:
+            state = append_live_audio(
+                db, entretien, question_index, questions_list[question_index], offset,
+                request.get_data(cache=False), final=request.args.get('final') == '1'
+            )
+        except UploadError as e:
+            return jsonify({"success": False, "error": e.message, "code": e.code}), e.status
+
+        return live_response(state)
+
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
+    except Exception as e:
+        logger.error(f"Erreur lors de la réception de l'audio en direct: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
+
 @entretiens_bp.route("/<entretien_id>/save", methods=["POST"])
 @cross_origin(origins="http://localhost:3000")
 def save_entretien(entretien_id):
     """Save interview with video and metadata."""
+    timer = StageTimer("save_entretien")
     try:
         auth_header = request.headers.get('Authorization')
         if not auth_header:
@@ -226,11 +538,18 @@ def save_entretien(entretien_id):
         entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
         if error_msg:
             return jsonify({"error": error_msg, "code": error_code}), error_code
+        timer.mark("auth")
 
-        # Vérifier si la vidéo est présente
+        # Vérifier si le média est présent : vidéo webm, ou piste audio
+        # (Opus ou webm audio) pour les offres en capture audio
+        capture_mode = entretien_capture_mode(db, entretien)
         video_file = request.files.get('video')
+        if capture_mode == CAPTURE_AUDIO:
+            video_file = request.files.get('audio') or video_file
         if not video_file:
-            logger.error("Aucun fichier vidéo n'a été reçu")
+            logger.error("Aucun fichier média n'a été reçu")
+            if capture_mode == CAPTURE_AUDIO:
+                return jsonify({"success": False, "error": "Audio manquant", "code": "MISSING_AUDIO"}), 400
             return jsonify({
                 "success": False,
                 "error": "Vidéo manquante",
@@ -238,8 +557,15 @@ def save_entretien(entretien_id):
             }), 400
 
         # Vérifier le type de fichier
-        if not video_file.filename.endswith('.webm'):
+        extension = capture_extension(capture_mode, video_file.filename)
+        if not extension:
             logger.error(f"Type de fichier invalide: {video_file.filename}")
+            if capture_mode == CAPTURE_AUDIO:
+                return jsonify({
+                    "success": False,
+                    "error": "Format audio invalide. Formats acceptés : Opus (.opus, .ogg) ou WebM audio.",
+                    "code": "INVALID_AUDIO_FORMAT"
+                }), 400
             return jsonify({
                 "success": False,
                 "error": "Format de vidéo invalide. Seul le format WebM est accepté.",
@@ -260,54 +586,20 @@ def save_entretien(entretien_id):
             }), 400
 
         # Créer les dossiers nécessaires pour la vidéo
-        try:
-            # Vérifier si UPLOAD_FOLDER est configuré
-            if not current_app.config.get('UPLOAD_FOLDER'):
-                logger.error("UPLOAD_FOLDER non configuré dans l'application")
-                return jsonify({
-                    "success": False,
-                    "error": "Configuration manquante pour le stockage des vidéos",
-                    "code": "MISSING_CONFIG"
-                }), 500
-
-            # Créer le dossier upload s'il n'existe pas
-            upload_dir = os.path.join(current_app.root_path, 'Uploads')
-            if not os.path.exists(upload_dir):
-                os.makedirs(upload_dir)
-                logger.info(f"Dossier upload créé: {upload_dir}")
-
-            # Créer le dossier videos s'il n'existe pas
-            video_dir = os.path.join(upload_dir, 'videos')
-            if not os.path.exists(video_dir):
-                os.makedirs(video_dir)
-                logger.info(f"Dossier videos créé: {video_dir}")
-
-            # Vérifier les permissions d'écriture
-            if not os.access(video_dir, os.W_OK):
-                logger.error(f"Pas de permission d'écriture sur le dossier: {video_dir}")
-                return jsonify({
-                    "success": False,
-                    "error": "Erreur de permission pour le stockage des vidéos",
-                    "code": "PERMISSION_ERROR"
-                }), 500
-
-        except Exception as e:
-            logger.error(f"Erreur lors de la création des dossiers: {str(e)}")
-            return jsonify({
-                "success": False,
-                "error": "Erreur lors de la création des dossiers de stockage",
-                "code": "DIRECTORY_CREATION_ERROR"
-            }), 500
+        video_dir, error_response = ensure_video_dir()
+        if error_response:
+            return error_response
 
         # Générer un nom de fichier unique
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        video_filename = f"interview_{entretien_id}_{timestamp}.webm"
+        video_filename = f"interview_{entretien_id}_{timestamp}{extension}"
         video_path = os.path.join(video_dir, video_filename)
 
         # Sauvegarder la vidéo
         try:
             logger.info(f"Tentative de sauvegarde de la vidéo: {video_path}")
-            video_file.save(video_path)
+            # L'empreinte est calculée pendant l'écriture (cache des transcriptions)
+            _, media_sha256 = write_stream_file(video_file.stream, video_path)
             logger.info(f"Vidéo sauvegardée avec succès: {video_path}")
             
             # Vérifier que le fichier a bien été créé
@@ -340,130 +632,626 @@ def save_entretien(entretien_id):
                 "code": "VIDEO_SAVE_ERROR"
             }), 500
 
-        # Générer l'URL de la vidéo
-        video_url = f"/api/candidates/entretiens/videos/{entretien_id}"
+        timer.mark("video_save")
 
-        # Sauvegarder le chemin relatif de la vidéo avec des forward slashes
-        relative_video_path = os.path.relpath(video_path, current_app.root_path).replace('\\', '/')
-        logger.info(f"Chemin relatif de la vidéo: {relative_video_path}")
+        return finalize_entretien(db, entretien_id, entretien, user, video_path, transcriptions, timer, media_sha256)
 
-        
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
+    except Exception as e:
+        logger.error(f"Erreur serveur: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
 
-        # Récupérer les questions de l'entretien
-        questions_id = entretien.get('questions_id')
-        questions_doc = db[QUESTIONS_COLLECTION].find_one({"_id": ObjectId(questions_id)})
-        questions_list = questions_doc.get('questions', []) if questions_doc else []
+def tus_headers(response, upload=None):
+    """Ajoute les en-têtes du protocole d'upload résumable à la réponse."""
+    response.headers['Tus-Resumable'] = TUS_VERSION
+    response.headers['Tus-Max-Size'] = str(MAX_INTERVIEW_UPLOAD_SIZE)
+    response.headers['Cache-Control'] = 'no-store'
+    if upload is not None:
+        response.headers['Upload-Offset'] = str(upload['offset'])
+        response.headers['Upload-Length'] = str(upload['length'])
+    return response
+
+def upload_metadata(header):
+    """Décode l'en-tête Upload-Metadata (paires `clé valeur-base64` séparées par des virgules)."""
+    metadata = {}
+    for pair in (header or '').split(','):
+        parts = pair.strip().split(' ', 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = base64.b64decode(parts[1]).decode('utf-8') if len(parts) > 1 else ''
+        except (ValueError, UnicodeDecodeError):
+            continue
+    return metadata
+
+def upload_error_response(error):
+    """Convertit une UploadError en réponse JSON."""
+    return tus_headers(make_response(jsonify({
+        "success": False,
+        "error": error.message,
+        "code": error.code
+    }), error.status))
+
+@entretiens_bp.route("/<entretien_id>/uploads", methods=["POST"])
+@cross_origin(origins="http://localhost:3000", expose_headers=["Location", "Upload-Offset", "Upload-Length", "Tus-Resumable", "Tus-Max-Size"])
+def create_video_upload(entretien_id):
+    """Crée un upload résumable pour la vidéo de l'entretien (en-tête Upload-Length)."""
+    try:
+        user, error_response = authenticate_candidat()
+        if error_response:
+            return error_response
 
-        # Traiter les transcriptions
-        processed_recordings = process_transcriptions(transcriptions, questions_list)
-        logger.info(f"Transcriptions traitées: {len(processed_recordings)}")
+        db = current_app.mongo
+        entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
+        if error_msg:
+            return jsonify({"error": error_msg, "code": error_code}), error_code
 
-        # Mettre à jour l'entretien avec les enregistrements traités
         try:
-            db[ENTRETIENS_COLLECTION].update_one(
-                {"_id": ObjectId(entretien_id)},
-                {"$set": {"recordings": processed_recordings}}
-            )
-            logger.info(f"Enregistrements mis à jour pour l'entretien {entretien_id}")
-        except Exception as e:
-            logger.error(f"Erreur lors de la mise à jour des enregistrements: {str(e)}")
+            upload_length = int(request.headers.get('Upload-Length', ''))
+        except ValueError:
             return jsonify({
                 "success": False,
-                "error": "Erreur lors de la mise à jour des enregistrements",
-                "code": "RECORDINGS_UPDATE_ERROR"
-            }), 500
+                "error": "En-tête Upload-Length manquant ou invalide",
+                "code": "INVALID_UPLOAD_LENGTH"
+            }), 400
 
-        # Récupérer l'entretien mis à jour avec les enregistrements
-        updated_entretien = db[ENTRETIENS_COLLECTION].find_one({"_id": ObjectId(entretien_id)})
-        if not updated_entretien:
-            logger.error("Impossible de récupérer l'entretien mis à jour")
+        # Nom du fichier (métadonnée tus `filename`) : détermine le format
+        # stocké pour les offres en capture audio
+        filename = upload_metadata(request.headers.get('Upload-Metadata')).get('filename')
+        capture_mode = entretien_capture_mode(db, entretien)
+        extension = capture_extension(capture_mode, filename or ('audio.weba' if capture_mode == CAPTURE_AUDIO else 'video.webm'))
+        if not extension:
             return jsonify({
                 "success": False,
-                "error": "Erreur lors de la récupération de l'entretien",
-                "code": "FETCH_UPDATE_FAILED"
-            }), 500
+                "error": f"Format de fichier non accepté en capture {capture_mode}",
+                "code": "INVALID_MEDIA_FORMAT"
+            }), 400
+
+        video_dir, error_response = ensure_video_dir()
+        if error_response:
+            return error_response
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        video_path = os.path.join(video_dir, f"interview_{entretien_id}_{timestamp}{extension}")
 
-        # Générer le rapport avec l'entretien mis à jour
-        rapport = None
-        rapport_id = None
         try:
-            rapport = generate_rapport(updated_entretien, questions_list)
-            if rapport:
-                rapport_id = rapport.get('_id')
-                logger.info(f"Rapport généré avec l'ID: {rapport_id}")
+            upload = create_upload(db, entretien_id, user.get('id'), upload_length, video_path)
+        except UploadError as e:
+            return upload_error_response(e)
+        # Les octets d'un upload abandonné sont supprimés après son expiration
+        schedule_upload_purge(db)
+
+        upload_url = f"/api/candidates/entretiens/{entretien_id}/uploads/{str(upload['_id'])}"
+        response = make_response(jsonify({
+            "success": True,
+            "data": {"uploadId": str(upload['_id']), "uploadUrl": upload_url}
+        }), 201)
+        response.headers['Location'] = upload_url
+        return tus_headers(response, upload)
+
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
+    except Exception as e:
+        logger.error(f"Erreur lors de la création de l'upload: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
+
+@entretiens_bp.route("/<entretien_id>/uploads/<upload_id>", methods=["HEAD", "PATCH"])
+@cross_origin(origins="http://localhost:3000", expose_headers=["Upload-Offset", "Upload-Length", "Tus-Resumable"])
+def video_upload_chunk(entretien_id, upload_id):
+    """HEAD : offset courant de l'upload. PATCH : ajoute un bloc à l'offset donné."""
+    try:
+        user, error_response = authenticate_candidat()
+        if error_response:
+            return error_response
+
+        db = current_app.mongo
+        upload = get_upload(db, upload_id, entretien_id, user.get('id'))
+        if not upload:
+            return tus_headers(make_response(jsonify({"error": "Upload non trouvé", "code": "UPLOAD_NOT_FOUND"}), 404))
+
+        if request.method == 'HEAD':
+            return tus_headers(make_response('', 200), upload)
+
+        if request.headers.get('Content-Type') != 'application/offset+octet-stream':
+            return tus_headers(make_response(jsonify({
+                "error": "Content-Type application/offset+octet-stream requis",
+                "code": "INVALID_CONTENT_TYPE"
+            }), 415))
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return tus_headers(make_response(jsonify({
+                "error": "En-tête Upload-Offset manquant ou invalide",
+                "code": "INVALID_UPLOAD_OFFSET"
+            }), 400))
+
+        try:
+            new_offset = append_chunk(db, upload, offset, request.stream, request.content_length)
+        except UploadError as e:
+            return upload_error_response(e)
+
+        upload['offset'] = new_offset
+        return tus_headers(make_response('', 204), upload)
+
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture du bloc: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
+
+@entretiens_bp.route("/<entretien_id>/uploads/<upload_id>/finalize", methods=["POST"])
+@cross_origin(origins="http://localhost:3000")
+def finalize_video_upload(entretien_id, upload_id):
+    """Finalise un upload complet puis lance le traitement de l'entretien."""
+    try:
+        user, error_response = authenticate_candidat()
+        if error_response:
+            return error_response
+
+        db = current_app.mongo
+        entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
+        if error_msg:
+            return jsonify({"error": error_msg, "code": error_code}), error_code
+
+        upload = get_upload(db, upload_id, entretien_id, user.get('id'))
+        if not upload:
+            return jsonify({"error": "Upload non trouvé", "code": "UPLOAD_NOT_FOUND"}), 404
+
+        # Métadonnées en JSON ou dans le champ de formulaire `metadata`
+        try:
+            payload = request.get_json(silent=True)
+            if payload is not None:
+                metadata = payload.get('metadata', payload)
             else:
-                logger.error("Échec de la génération du rapport")
-                return jsonify({
-                    "success": False,
-                    "error": "Échec de la génération du rapport",
-                    "code": "REPORT_GENERATION_FAILED"
-                }), 500
-        except Exception as e:
-            logger.error(f"Erreur lors de la génération du rapport: {str(e)}")
+                metadata = json.loads(request.form.get('metadata', '{}'))
+            transcriptions = metadata.get('transcriptions', [])
+        except (json.JSONDecodeError, AttributeError):
             return jsonify({
                 "success": False,
-                "error": "Erreur lors de la génération du rapport",
-                "code": "REPORT_GENERATION_ERROR"
-            }), 500
+                "error": "Métadonnées invalides",
+                "code": "INVALID_METADATA"
+            }), 400
 
-        # Mettre à jour l'entretien avec le rapport
         try:
-            update_data = {
-                "video_url": video_url,
-                "video_path": relative_video_path, 
-                "rapport_id": rapport_id,
-                "statut": "termine" if rapport_id else "en_cours",
-                "completed_at": datetime.now(timezone.utc) if rapport_id else None,
-                "date_maj": datetime.now(timezone.utc),
-                "last_updated_by": user.get('id')
-            }
+            upload = complete_upload(db, upload)
+        except UploadError as e:
+            return upload_error_response(e)
 
-            update_result = db[ENTRETIENS_COLLECTION].update_one(
-                {"_id": ObjectId(entretien_id)},
-                {"$set": update_data}
-            )
+        # Une finalisation répétée (nouvel essai du client) ne retraite pas l'entretien
+        if not claim_finalization(db, upload):
+            logger.info(f"Upload {upload_id} déjà finalisé")
+            return jsonify({
+                "success": True,
+                "message": "Entretien déjà sauvegardé",
+                "data": {
+                    "videoUrl": entretien.get('video_url'),
+                    "videoPath": entretien.get('video_path'),
+                    "entretien": serialize_doc(entretien),
+                    "rapportStatus": entretien.get('rapport_statut'),
+                    "rapportStreamUrl": rapport_stream_url(entretien_id, user.get('id'))
+                }
+            }), 200
 
-            if update_result.modified_count == 0:
-                logger.error("Échec de la mise à jour de l'entretien")
-                return jsonify({
-                    "success": False,
-                    "error": "Échec de la mise à jour de l'entretien",
-                    "code": "UPDATE_FAILED"
-                }), 500
+        logger.info(f"Upload {upload_id} finalisé ({upload['length']} octets)")
+        try:
+            response = finalize_entretien(db, entretien_id, entretien, user, upload['path'], transcriptions)
+        except Exception:
+            release_finalization(db, upload)
+            raise
+        if isinstance(response, tuple):
+            # Réponse d'erreur : la finalisation peut être relancée
+            release_finalization(db, upload)
+        return response
 
-            logger.info(f"Entretien mis à jour avec succès: {entretien_id}")
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
+    except Exception as e:
+        logger.error(f"Erreur lors de la finalisation de l'upload: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
 
+@job_handler(UPLOAD_PURGE_JOB_TYPE)
+def purge_uploads_job(payload, job):
+    """Supprime les fichiers des uploads abandonnés, puis se replanifie tant
+    que des uploads sont en cours."""
+    video_dir = os.path.join(current_app.root_path, 'Uploads', 'videos')
+    if not os.path.isdir(video_dir):
+        return {"supprimes": 0, "restants": 0}
+    removed, remaining = purge_abandoned_uploads(current_app.mongo, video_dir)
+    if remaining:
+        schedule_upload_purge(current_app.mongo)
+    return {"supprimes": removed, "restants": remaining}
+
+def schedule_upload_purge(db):
+    """Planifie la purge des uploads abandonnés : un seul job par intervalle."""
+    slot = int(time.time()) // UPLOAD_PURGE_INTERVAL_SECONDS + 1
+    return enqueue(
+        db,
+        UPLOAD_PURGE_JOB_TYPE,
+        {},
+        priority=UPLOAD_PURGE_JOB_PRIORITY,
+        dedupe_key=f"purge_uploads:{slot}",
+        delay_seconds=slot * UPLOAD_PURGE_INTERVAL_SECONDS - time.time()
+    )
+
+def discard_media(path):
+    """Supprime un média refusé : aucun entretien n'y fait référence."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def finalize_entretien(db, entretien_id, entretien, user, video_path, transcriptions, timer=None, media_sha256=None):
+    """Traite un entretien dont la vidéo est stockée : transcriptions, statut et rapport.
+
+    Les enregistrements, la vidéo et le statut sont écrits en une seule
+    opération find_one_and_update qui retourne le document final.
+    `media_sha256` est l'empreinte calculée à l'écriture de la vidéo.
+    """
+    timer = timer or StageTimer("finalize_entretien")
+
+    # En capture audio, le contenu est vérifié : un webm qui porte encore une
+    # piste vidéo n'est pas seulement renommé, sa piste vidéo est retirée
+    capture_mode = entretien_capture_mode(db, entretien)
+    if capture_mode == CAPTURE_AUDIO:
+        try:
+            info = probe_media(video_path)
+            if info["audio_codec"] and info["video_codec"]:
+                strip_video_track(video_path)
+                # Contenu réécrit : l'empreinte reçue ne vaut plus
+                media_sha256 = None
         except Exception as e:
-            logger.error(f"Erreur lors de la mise à jour de l'entretien: {str(e)}")
+            logger.error(f"Erreur lors de la conversion du média audio {video_path}: {str(e)}")
+            discard_media(video_path)
             return jsonify({
                 "success": False,
-                "error": "Erreur lors de la mise à jour de l'entretien",
-                "code": "INTERVIEW_UPDATE_ERROR"
+                "error": "Erreur lors de la conversion du média audio",
+                "code": "MEDIA_CONVERSION_ERROR"
             }), 500
+        if not info["audio_codec"]:
+            logger.error(f"Média sans piste audio en capture audio: {video_path}")
+            discard_media(video_path)
+            return jsonify({
+                "success": False,
+                "error": "Le média reçu ne contient pas de piste audio",
+                "code": "INVALID_MEDIA_FORMAT"
+            }), 400
+        timer.mark("audio_check")
+
+    # Générer l'URL de la vidéo
+    video_url = f"/api/candidates/entretiens/videos/{entretien_id}"
+
+    # Sauvegarder le chemin relatif de la vidéo avec des forward slashes
+    relative_video_path = os.path.relpath(video_path, current_app.root_path).replace('\\', '/')
+    logger.info(f"Chemin relatif de la vidéo: {relative_video_path}")
+
+    # Récupérer les questions de l'entretien
+    questions_list = get_questions_list(db, entretien.get('questions_id'))
+    timer.mark("questions")
+
+    # Les réponses déjà enregistrées pendant l'entretien sont conservées
+    # telles quelles : seules les questions sans réponse persistée sont
+    # traitées depuis les métadonnées
+    stored = stored_recordings(entretien)
+    answered = {recording['questionIndex'] for recording in stored}
+    missing = [
+        trans for trans in transcriptions or []
+        if isinstance(trans, dict) and trans.get('questionIndex') not in answered
+    ] if isinstance(transcriptions, list) else []
+    processed_recordings = merge_recordings(stored, process_transcriptions(missing, questions_list))
+    logger.info(f"Réponses: {len(stored)} déjà enregistrée(s), {len(processed_recordings) - len(stored)} ajoutée(s)")
+
+    # Mettre à jour l'entretien : il est terminé côté candidat, le rapport
+    # est généré en arrière-plan par un worker
+    try:
+        now = datetime.now(timezone.utc)
+        update_data = {
+            "video_url": video_url,
+            "video_path": relative_video_path, 
+            "capture_mode": capture_mode,
+            "statut": "termine",
+            "rapport_statut": RAPPORT_EN_ATTENTE,
+            "completed_at": now,
+            "date_maj": now,
+            "last_updated_by": user.get('id')
+        }
+        # Le tableau n'est réécrit que s'il change (réponses ajoutées ou cases
+        # null retirées) : une réponse écrite entre-temps par une passe de
+        # transcription en direct n'est pas écrasée
+        if processed_recordings != entretien.get('recordings'):
+            update_data["recordings"] = processed_recordings
+
+        final_entretien = db[ENTRETIENS_COLLECTION].find_one_and_update(
+            {"_id": ObjectId(entretien_id), "candidat_id": ObjectId(user.get('id'))},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        )
 
-        # Retourner les données mises à jour
-        final_entretien = db[ENTRETIENS_COLLECTION].find_one({"_id": ObjectId(entretien_id)})
         if not final_entretien:
+            logger.error("Échec de la mise à jour de l'entretien")
             return jsonify({
                 "success": False,
-                "error": "Erreur lors de la récupération de l'entretien final",
-                "code": "FETCH_FINAL_FAILED"
+                "error": "Échec de la mise à jour de l'entretien",
+                "code": "UPDATE_FAILED"
             }), 500
 
-        # Sérialiser les données pour la réponse
-        serialized_entretien = serialize_doc(final_entretien)
-        serialized_rapport = serialize_doc(rapport) if rapport else None
+        logger.info(f"Entretien mis à jour avec succès: {entretien_id}")
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la mise à jour de l'entretien: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": "Erreur lors de la mise à jour de l'entretien",
+            "code": "INTERVIEW_UPDATE_ERROR"
+        }), 500
+    timer.mark("persist")
+
+    # Mettre la génération du rapport en file. Si des transcriptions en
+    # direct sont en cours, le rapport attend leurs dernières passes (la
+    # dernière l'avance) ou, au plus, LIVE_TRANSCRIPTION_RAPPORT_DELAY_SECONDS
+    pending_live = pending_live_questions(final_entretien) if LIVE_TRANSCRIPTION_ENABLED else []
+    for question_index in pending_live:
+        enqueue_live_pass(db, entretien_id, question_index, live_state(final_entretien, question_index)['recu'], final=True)
+    job_id = enqueue_rapport(db, entretien_id, LIVE_TRANSCRIPTION_RAPPORT_DELAY_SECONDS if pending_live else 0)
+    if TRANSCRIPTION_ON_SAVE:
+        # Transcription complète de la vidéo par les workers de transcription
+        enqueue_transcription(db, entretien_id, relative_video_path, now, media_sha256=media_sha256)
+    if RENDITIONS_ON_SAVE:
+        # Versions compressées de la vidéo pour la lecture côté recruteur
+        enqueue_renditions(db, entretien_id, relative_video_path)
+    timer.mark("enqueue")
+
+    # Sérialiser les données pour la réponse
+    serialized_entretien = serialize_doc(final_entretien)
+    timer.mark("serialize")
+    timer.log()
+
+    response = make_response(jsonify({
+        "success": True,
+        "message": "Entretien sauvegardé, rapport en cours de génération",
+        "data": {
+            "videoUrl": video_url,
+            "videoPath": relative_video_path,
+
+            "entretien": serialized_entretien,
+            "rapport": None,
+            "rapportStatus": RAPPORT_EN_ATTENTE,
+            "rapportJobId": str(job_id) if job_id else None,
+            "rapportStreamUrl": rapport_stream_url(entretien_id, user.get('id')),
+            "recordings": stored_recordings(final_entretien),
+            "timings": timer.as_dict()
+        }
+    }), 202)
+    response.headers['Server-Timing'] = timer.server_timing_header()
+    return response
+
+def enqueue_rapport(db, entretien_id, delay_seconds=0):
+    return enqueue(
+        db,
+        REPORT_JOB_TYPE,
+        {"entretien_id": str(entretien_id)},
+        priority=10,
+        dedupe_key=f"rapport:{entretien_id}",
+        delay_seconds=delay_seconds
+    )
+
+def rapport_stream_url(entretien_id, principal):
+    """URL signée du flux de génération du rapport.
+
+    EventSource ne peut pas envoyer d'en-tête Authorization : l'accès est
+    porté par la signature, comme pour les vidéos.
+    """
+    return media_signer.signed_url(
+        f"/api/candidates/entretiens/rapports/{entretien_id}/stream",
+        f"rapport:{entretien_id}",
+        principal,
+        str(entretien_id)
+    )
+
+def claim_rapport(db, entretien_id, owner):
+    """Réserve la génération du rapport pour `owner` (job ou flux SSE).
+
+    Retourne l'entretien, ou None si le rapport n'est pas en attente ou s'il
+    est généré ailleurs sous un bail encore valide.
+    """
+    now = datetime.now(timezone.utc)
+    return db[ENTRETIENS_COLLECTION].find_one_and_update(
+        {
+            "_id": entretien_id,
+            "$or": [
+                {"rapport_statut": RAPPORT_EN_ATTENTE},
+                {"rapport_statut": RAPPORT_EN_COURS, "rapport_bail_expire": {"$not": {"$gt": now}}}
+            ]
+        },
+        {
+            "$set": {
+                "rapport_statut": RAPPORT_EN_COURS,
+                "rapport_genere_par": owner,
+                "rapport_bail_expire": now + timedelta(seconds=RAPPORT_LEASE_SECONDS)
+            },
+            "$unset": {"rapport_progression": ""}
+        },
+        return_document=ReturnDocument.AFTER
+    )
+
+def release_rapport(db, entretien_id, owner, statut=RAPPORT_EN_ATTENTE):
+    """Rend la génération du rapport si `owner` la détient encore."""
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "rapport_genere_par": owner, "rapport_statut": RAPPORT_EN_COURS},
+        {
+            "$set": {"rapport_statut": statut},
+            "$unset": {"rapport_genere_par": "", "rapport_bail_expire": ""}
+        }
+    )
+
+def renew_rapport_lease(db, entretien_id, owner):
+    """Prolonge la réservation du rapport détenue par `owner`."""
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "rapport_genere_par": owner, "rapport_statut": RAPPORT_EN_COURS},
+        {"$set": {"rapport_bail_expire": datetime.now(timezone.utc) + timedelta(seconds=RAPPORT_LEASE_SECONDS)}}
+    )
+
+def record_rapport_progress(db, entretien_id, owner, event, data):
+    """Enregistre le score de chaque question évaluée, pour les clients qui suivent le rapport."""
+    if event != "score":
+        return
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "rapport_genere_par": owner},
+        {"$set": {f"rapport_progression.{data['index']}": data}}
+    )
+
+def persist_rapport(db, entretien_id, rapport, owner):
+    """Enregistre le rapport et le rattache à l'entretien (unique écriture du résultat).
+
+    Le rattachement n'a lieu que si `owner` détient encore la réservation ;
+    sinon le rapport est supprimé et None est retourné.
+    """
+    rapport["_id"] = db[RAPPORTS_COLLECTION].insert_one(rapport).inserted_id
+    result = db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "rapport_genere_par": owner, "rapport_statut": RAPPORT_EN_COURS},
+        {
+            "$set": {
+                "rapport_id": rapport["_id"],
+                "rapport_statut": RAPPORT_TERMINE,
+                "date_maj": datetime.now(timezone.utc)
+            },
+            "$unset": {"rapport_genere_par": "", "rapport_bail_expire": "", "rapport_progression": ""}
+        }
+    )
+    if result.matched_count == 0:
+        # Réservation expirée et reprise, ou régénération demandée entre-temps
+        db[RAPPORTS_COLLECTION].delete_one({"_id": rapport["_id"]})
+        logger.warning(f"Rapport de l'entretien {entretien_id} non enregistré : réservation perdue par {owner}")
+        return None
+    logger.info(f"Rapport généré et sauvegardé avec l'ID: {rapport['_id']}")
+    return rapport
+
+@job_handler(REPORT_JOB_TYPE)
+def generate_rapport_job(payload, job):
+    """Génère le rapport d'un entretien terminé (exécuté par un worker)."""
+    db = current_app.mongo
+    entretien_id = ObjectId(payload["entretien_id"])
+    owner = f"job:{job['_id']}"
+    timer = StageTimer("generate_rapport_job")
+
+    entretien = claim_rapport(db, entretien_id, owner)
+    if not entretien:
+        current = db[ENTRETIENS_COLLECTION].find_one({"_id": entretien_id}, {"rapport_statut": 1})
+        if not current:
+            logger.error(f"Entretien introuvable pour le rapport: {entretien_id}")
+            return {"ignore": "entretien introuvable"}
+        if current.get("rapport_statut") != RAPPORT_EN_COURS:
+            return {"ignore": f"rapport {current.get('rapport_statut')}"}
+        # Rapport en cours de génération par un flux SSE : nouvel essai plus tard
+        raise RuntimeError("Rapport en cours de génération par un autre processus")
+
+    timer.mark("claim")
+
+    # Transcriptions en direct non terminées (délai dépassé ou fonction
+    # désactivée) : les réponses gardent la transcription du navigateur
+    for question_index in pending_live_questions(entretien):
+        abandon_live_transcription(db, entretien_id, question_index)
+
+    questions_list = get_questions_list(db, entretien.get('questions_id'))
+    timer.mark("questions")
+
+    # Les événements (dont un ping toutes les quelques secondes) prolongent
+    # les baux : un rapport long n'est pas repris par un autre worker
+    last_heartbeat = time.monotonic()
+
+    def on_event(event, data):
+        nonlocal last_heartbeat
+        record_rapport_progress(db, entretien_id, owner, event, data)
+        if time.monotonic() - last_heartbeat >= RAPPORT_HEARTBEAT_SECONDS:
+            last_heartbeat = time.monotonic()
+            heartbeat(db, job)
+            renew_rapport_lease(db, entretien_id, owner)
+
+    error = "Échec de la génération du rapport"
+    try:
+        rapport = generate_rapport(
+            entretien, questions_list, timer,
+            cache_mode=payload.get("cache_mode", CACHE_USE),
+            on_event=on_event
+        )
+    except LLMError as e:
+        rapport, error = None, f"Service LLM indisponible: {e.message}"
+    if not rapport:
+        release_rapport(db, entretien_id, owner, RAPPORT_ECHEC if is_last_attempt(job) else RAPPORT_EN_ATTENTE)
+        raise RuntimeError(error)
+
+    if not persist_rapport(db, entretien_id, rapport, owner):
+        return {"ignore": "réservation du rapport perdue"}
+    timer.mark("persist")
+    timer.log()
+    return {"rapport_id": str(rapport["_id"]), "timings": timer.as_dict()}
+
+@job_handler(LIVE_JOB_TYPE)
+def transcribe_live_job(payload, job):
+    """Passe de transcription en direct d'une réponse. Quand la dernière
+    réponse d'un entretien terminé est transcrite, le rapport est mis en file."""
+    db = current_app.mongo
+    entretien_id = ObjectId(payload["entretien_id"])
+    question_index = payload["questionIndex"]
+    final = payload.get("final", False)
+    try:
+        state = advance_live_transcription(
+            db, entretien_id, question_index, final, on_region=lambda: heartbeat(db, job)
+        )
+    except Exception:
+        if final and is_last_attempt(job):
+            # La réponse garde la transcription du navigateur
+            abandon_live_transcription(db, entretien_id, question_index)
+            enqueue_rapport_when_live_done(db, entretien_id)
+        raise
+
+    if state is None:
+        return {"ignore": "aucune parole terminée"}
+    if state["statut"] == LIVE_TERMINE:
+        enqueue_rapport_when_live_done(db, entretien_id)
+    return {"statut": state["statut"], "transcrit_jusqu_a": state["transcrit_jusqu_a"]}
+
+def enqueue_rapport_when_live_done(db, entretien_id):
+    """Lance le rapport sans attendre son délai si l'entretien est sauvegardé
+    et qu'aucune transcription en direct n'est en cours."""
+    entretien = db[ENTRETIENS_COLLECTION].find_one(
+        {"_id": entretien_id},
+        {"statut": 1, "rapport_statut": 1, LIVE_FIELD: 1}
+    )
+    if (entretien and entretien.get("statut") == "termine"
+            and entretien.get("rapport_statut") == RAPPORT_EN_ATTENTE
+            and not pending_live_questions(entretien)):
+        job_id = enqueue_rapport(db, entretien_id)
+        run_now(db, f"rapport:{entretien_id}")
+        return job_id
+    return None
+
+@entretiens_bp.route("/<entretien_id>/rapport/statut", methods=["GET"])
+@cross_origin(origins="http://localhost:3000")
+def get_rapport_statut(entretien_id):
+    """Retourne l'état de la génération du rapport d'un entretien."""
+    try:
+        user, error_response = authenticate_candidat()
+        if error_response:
+            return error_response
+
+        db = current_app.mongo
+        entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
+        if error_msg:
+            return jsonify({"error": error_msg, "code": error_code}), error_code
 
+        rapport_id = entretien.get('rapport_id')
         return jsonify({
             "success": True,
-            "message": "Entretien sauvegardé avec succès",
             "data": {
-                "videoUrl": video_url,
-                "videoPath": relative_video_path,
-               
-                "entretien": serialized_entretien,
-                "rapport": serialized_rapport,
-                "recordings": processed_recordings
+                "rapportStatus": entretien.get('rapport_statut', RAPPORT_TERMINE if rapport_id else None),
+                "rapportId": str(rapport_id) if rapport_id else None,
+                "rapportStreamUrl": rapport_stream_url(entretien_id, user.get('id'))
             }
         }), 200
 
@@ -474,147 +1262,262 @@ def save_entretien(entretien_id):
         logger.error(f"Erreur serveur: {str(e)}")
         return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
 
-def generate_rapport(entretien, questions_list):
-    """Génère un rapport d'entretien basé sur les réponses du candidat et les questions."""
+def build_qa_pairs(entretien, questions_list):
+    """Associe chaque réponse enregistrée à sa question."""
+    qa_pairs = []
+    for recording in stored_recordings(entretien):
+        question_index = recording.get('questionIndex')
+        if question_index is not None and 0 <= question_index < len(questions_list):
+            # Convertir le timestamp en string ISO si présent
+            timestamp = recording.get('timestamp')
+            if isinstance(timestamp, datetime):
+                timestamp = timestamp.isoformat()
+
+            qa_pairs.append({
+                "question": questions_list[question_index],
+                "answer": recording.get('transcript', ''),
+                "timestamp": timestamp
+            })
+    return qa_pairs
+
+def build_rapport(entretien, questions_list, qa_pairs, evaluation):
+    """Document rapport à partir de l'évaluation, ou None si aucune réponse n'a pu être évaluée."""
+    questions_en_echec = evaluation["questions_en_echec"]
+    if len(questions_en_echec) == len(qa_pairs):
+        logger.error("Aucune réponse n'a pu être évaluée")
+        return None
+
+    return {
+        "entretien_id": ObjectId(entretien["_id"]),
+        "candidat_id": ObjectId(entretien["candidat_id"]),
+        "recruteur_id": ObjectId(entretien["recruteur_id"]),
+        "date_creation": datetime.now(timezone.utc),
+        "statut": "termine",
+        "questions_analysees": evaluation["questions_analysees"],
+        "score_global": evaluation["score_global"],
+        "points_forts": evaluation["points_forts"],
+        "conclusion": evaluation["conclusion"],
+        "evaluation_complete": not questions_en_echec,
+        "questions_en_echec": questions_en_echec,
+        "qa_pairs": qa_pairs,
+        "questions": questions_list
+    }
+
+def rapport_scorer(db, entretien, cache_mode):
+    return InterviewScorer(
+        db=db,
+        cache_mode=cache_mode,
+        tenant=str(entretien.get("recruteur_id")) if entretien.get("recruteur_id") else None
+    )
+
+def generate_rapport(entretien, questions_list, timer=None, cache_mode=CACHE_USE, on_event=None):
+    """Génère un rapport d'entretien basé sur les réponses du candidat et les questions.
+
+    Le rapport est retourné sans être enregistré : l'appelant le persiste avec
+    persist_rapport(). `on_event(événement, données)` reçoit la progression
+    de l'évaluation. Lève LLMError si le service LLM est indisponible.
+    """
+    timer = timer or StageTimer("generate_rapport")
     try:
-        # Récupérer les enregistrements des réponses
-        recordings = entretien.get('recordings', [])
-        if not recordings:
+        if not entretien.get('recordings'):
             logger.error("Aucun enregistrement trouvé pour l'entretien")
             return None
 
         # Organiser les questions et réponses
-        qa_pairs = []
-        for recording in recordings:
-            question_index = recording.get('questionIndex')
-            if question_index is not None and 0 <= question_index < len(questions_list):
-                # Convertir le timestamp en string ISO si présent
-                timestamp = recording.get('timestamp')
-                if isinstance(timestamp, datetime):
-                    timestamp = timestamp.isoformat()
-                
-                qa_pairs.append({
-                    "question": questions_list[question_index],
-                    "answer": recording.get('transcript', ''),
-                    "timestamp": timestamp
-                })
-
-        # Préparation du prompt pour Groq
-        prompt = f"""En tant qu'expert en recrutement, évaluez cet entretien d'embauche.
-
-Questions et réponses du candidat :
-{json.dumps(qa_pairs, indent=2, ensure_ascii=False)}
-
-Veuillez fournir une évaluation détaillée au format JSON suivant :
-{{
-    "questions_analysees": [
-        {{
-            "question": "Question posée",
-            "reponse": "Réponse du candidat",
-            "analyse": "Analyse détaillée de la réponse",
-            "score": 8
-        }}
-    ],
-    "score_global": 7,
-    "points_forts": ["Point fort 1", "Point fort 2"],
-    
-    "conclusion": "Conclusion sur l'adéquation du candidat"
-}}"""
+        qa_pairs = build_qa_pairs(entretien, questions_list)
+        if not qa_pairs:
+            logger.error("Aucune réponse exploitable pour l'entretien")
+            return None
+        timer.mark("prompt")
+
+        # Évaluation question par question en parallèle, puis synthèse
+        scorer = rapport_scorer(current_app.mongo, entretien, cache_mode)
+        logger.info(f"Évaluation de {len(qa_pairs)} réponses (concurrence: {scorer.concurrency})...")
+        evaluation = None
+        for event, data in scorer.stream_interview(qa_pairs):
+            if event == "evaluation":
+                evaluation = data
+            elif on_event:
+                on_event(event, data)
+        timer.mark("llm")
+
+        return build_rapport(entretien, questions_list, qa_pairs, evaluation)
+
+    except LLMError:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération du rapport: {str(e)}")
+        return None
 
-        # Appel à l'API Groq
-        try:
-            headers = {
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "llama3-8b-8192",
-                "messages": [
-                    {"role": "system", "content": "Tu es un expert en recrutement qui évalue les entretiens d'embauche."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 1500
-            }
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
 
-            logger.info("Envoi de la requête à l'API Groq...")
-            with httpx.Client(timeout=30.0) as client:
-                response = client.post(
-                    GROQ_API_URL,
-                    json=data,
-                    headers=headers
-                )
-                
-                if response.status_code == 401:
-                    logger.error("Erreur d'authentification avec l'API Groq")
-                    return None
-                elif response.status_code != 200:
-                    logger.error(f"Erreur API Groq (status {response.status_code}): {response.text}")
-                    return None
-                    
-                response.raise_for_status()
-                evaluation_data = response.json()
-                
-                # Extraire et parser la réponse
-                evaluation_text = evaluation_data['choices'][0]['message']['content'].strip()
-                
-                # Trouver le début et la fin de la structure JSON
-                start_index = evaluation_text.find('{')
-                end_index = evaluation_text.rfind('}') + 1
+def stream_rapport_generation(db, entretien, owner, cache_mode):
+    """Génère le rapport réservé par `owner` en transmettant la progression.
 
-                if start_index == -1 or end_index == 0:
-                    logger.error("Format de réponse invalide - aucun JSON trouvé")
-                    return None
+    Si le client se déconnecte avant la fin, la génération est rendue au
+    worker ; les évaluations déjà obtenues sont en cache. Une erreur
+    transmise au client termine la génération (rapport en échec).
+    """
+    entretien_id = entretien["_id"]
+    completed = False
+    terminal = False
+    try:
+        questions_list = get_questions_list(db, entretien.get('questions_id'))
+        qa_pairs = build_qa_pairs(entretien, questions_list)
+        yield sse_event("statut", {"rapportStatus": RAPPORT_EN_COURS, "questions": len(qa_pairs)})
+        if not qa_pairs:
+            terminal = True
+            yield sse_event("erreur", {"error": "Aucune réponse exploitable pour l'entretien", "code": "NO_ANSWERS"})
+            return
+
+        # Fermer le flux du scorer annule les appels LLM en cours si le client se déconnecte
+        evaluation = None
+        with closing(rapport_scorer(db, entretien, cache_mode).stream_interview(qa_pairs)) as events:
+            for event, data in events:
+                if event == "evaluation":
+                    evaluation = data
+                elif event == "ping":
+                    yield ": ping\n\n"
+                else:
+                    record_rapport_progress(db, entretien_id, owner, event, data)
+                    yield sse_event(event, data)
+
+        rapport = build_rapport(entretien, questions_list, qa_pairs, evaluation)
+        if not rapport:
+            terminal = True
+            yield sse_event("erreur", {"error": "Aucune réponse n'a pu être évaluée", "code": "EVALUATION_FAILED"})
+            return
+        if not persist_rapport(db, entretien_id, rapport, owner):
+            terminal = True
+            yield sse_event("erreur", {
+                "error": "Le rapport est généré par un autre processus",
+                "code": "RAPPORT_CLAIM_LOST"
+            })
+            return
+        completed = True
+        yield sse_event("rapport", {"rapportId": str(rapport["_id"]), "rapport": serialize_doc(rapport)})
 
-                # Extraire la chaîne JSON
-                evaluation_json = evaluation_text[start_index:end_index]
-                evaluation = json.loads(evaluation_json)
-                
-                # Créer le rapport final
-                rapport = {
-                    "entretien_id": ObjectId(entretien["_id"]),
-                    "candidat_id": ObjectId(entretien["candidat_id"]),
-                    "recruteur_id": ObjectId(entretien["recruteur_id"]),
-                    "date_creation": datetime.now(timezone.utc),
-                    "statut": "termine",
-                    "questions_analysees": evaluation.get("questions_analysees", []),
-                    "score_global": evaluation.get("score_global", 0),
-                    "points_forts": evaluation.get("points_forts", []),
-                   
-                    "conclusion": evaluation.get("conclusion", ""),
-                    "evaluation_complete": True,
-                    "qa_pairs": qa_pairs,
-                    "questions": questions_list
-                }
-                
-                # Insérer le rapport dans la base de données
-                db = current_app.mongo
-                rapport_id = db[RAPPORTS_COLLECTION].insert_one(rapport).inserted_id
-                logger.info(f"Rapport généré et sauvegardé avec l'ID: {rapport_id}")
-                
-                # Mettre à jour l'entretien avec l'ID du rapport
-                db[ENTRETIENS_COLLECTION].update_one(
-                    {"_id": ObjectId(entretien["_id"])},
-                    {"$set": {"rapport_id": rapport_id}}
-                )
-                logger.info(f"Entretien mis à jour avec l'ID du rapport: {rapport_id}")
-                
-                return rapport
+    except LLMError as e:
+        terminal = True
+        yield sse_event("erreur", {"error": e.message, "code": e.code})
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération du rapport en flux: {str(e)}")
+        terminal = True
+        yield sse_event("erreur", {"error": "Erreur serveur", "code": "SERVER_ERROR"})
+    finally:
+        if terminal and not completed:
+            # Échec déjà transmis au client : pas de nouvel essai automatique
+            # (le recruteur peut relancer la génération)
+            release_rapport(db, entretien_id, owner, RAPPORT_ECHEC)
+        elif not completed:
+            # Client déconnecté en cours de génération
+            release_rapport(db, entretien_id, owner)
+            enqueue(
+                db,
+                REPORT_JOB_TYPE,
+                {"entretien_id": str(entretien_id), "cache_mode": cache_mode},
+                priority=10,
+                dedupe_key=f"rapport:{entretien_id}"
+            )
 
-        except httpx.HTTPError as e:
-            logger.error(f"Erreur HTTP lors de la requête à l'API Groq: {str(e)}")
-            return None
-        except json.JSONDecodeError as e:
-            logger.error(f"Erreur lors du parsing JSON: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"Erreur lors de l'appel à l'API Groq: {str(e)}")
-            return None
+def rapport_events(db, entretien_id, cache_mode):
+    """Événements Server-Sent Events du rapport d'un entretien.
+
+    Un rapport en attente est réservé et généré dans la requête. S'il est
+    déjà généré par un worker, sa progression enregistrée est suivie jusqu'au
+    rapport final ; un rapport terminé est envoyé immédiatement.
+    """
+    owner = f"flux:{uuid.uuid4().hex}"
+    sent_progress = set()
+    last_statut = None
+    last_event = time.monotonic()
+    deadline = last_event + RAPPORT_LEASE_SECONDS
+
+    while time.monotonic() < deadline:
+        entretien = claim_rapport(db, entretien_id, owner)
+        if entretien:
+            yield from stream_rapport_generation(db, entretien, owner, cache_mode)
+            return
+
+        entretien = db[ENTRETIENS_COLLECTION].find_one(
+            {"_id": entretien_id},
+            {"rapport_statut": 1, "rapport_id": 1, "rapport_progression": 1}
+        )
+        if not entretien:
+            yield sse_event("erreur", {"error": "Entretien non trouvé", "code": "INTERVIEW_NOT_FOUND"})
+            return
+
+        rapport_id = entretien.get('rapport_id')
+        statut = entretien.get('rapport_statut', RAPPORT_TERMINE if rapport_id else None)
+        if statut != last_statut:
+            last_statut, last_event = statut, time.monotonic()
+            yield sse_event("statut", {"rapportStatus": statut})
+
+        progression = entretien.get('rapport_progression') or {}
+        for index in sorted(progression, key=int):
+            if index not in sent_progress:
+                sent_progress.add(index)
+                last_event = time.monotonic()
+                yield sse_event("score", progression[index])
+
+        if statut == RAPPORT_TERMINE and rapport_id:
+            rapport = db[RAPPORTS_COLLECTION].find_one({"_id": ObjectId(rapport_id)})
+            if rapport:
+                yield sse_event("rapport", {"rapportId": str(rapport_id), "rapport": serialize_doc(rapport)})
+            else:
+                yield sse_event("erreur", {"error": "Rapport non trouvé", "code": "REPORT_NOT_FOUND"})
+            return
+        if statut not in (RAPPORT_EN_ATTENTE, RAPPORT_EN_COURS):
+            yield sse_event("erreur", {"error": "Rapport indisponible", "code": "REPORT_UNAVAILABLE", "rapportStatus": statut})
+            return
+
+        if time.monotonic() - last_event >= RAPPORT_STREAM_PING_SECONDS:
+            last_event = time.monotonic()
+            yield ": ping\n\n"
+        time.sleep(RAPPORT_STREAM_POLL_SECONDS)
+
+    yield sse_event("erreur", {"error": "Délai de génération du rapport dépassé", "code": "REPORT_TIMEOUT"})
+
+@entretiens_bp.route("/rapports/<entretien_id>/stream", methods=["GET"])
+@cross_origin(origins="http://localhost:3000")
+def stream_rapport(entretien_id):
+    """Rapport d'un entretien en flux (Server-Sent Events).
+
+    Accès par l'URL signée retournée avec l'entretien (recruteur ou candidat)
+    ou par le token du candidat. Événements : statut, question, analyse
+    (fragments du texte de l'analyse), score, synthese_en_cours, synthese,
+    rapport (document final enregistré) et erreur.
+    """
+    try:
+        db = current_app.mongo
+        if request.args.get('sig'):
+            if not media_signer.verify(f"rapport:{entretien_id}", request.args):
+                return jsonify({"error": "URL signée invalide ou expirée", "code": "INVALID_SIGNATURE"}), 403
+            entretien_obj_id = ObjectId(entretien_id)
+        else:
+            user, error_response = authenticate_candidat()
+            if error_response:
+                return error_response
+            entretien, error_msg, error_code = validate_interview_access(db, entretien_id, user.get('id'))
+            if error_msg:
+                return jsonify({"error": error_msg, "code": error_code}), error_code
+            entretien_obj_id = entretien["_id"]
+
+        response = Response(
+            stream_with_context(rapport_events(db, entretien_obj_id, cache_mode_from_request(request))),
+            mimetype="text/event-stream"
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
 
+    except PyMongoError as e:
+        logger.error(f"Erreur MongoDB: {str(e)}")
+        return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
     except Exception as e:
-        logger.error(f"Erreur lors de la génération du rapport: {str(e)}")
-        return None
+        logger.error(f"Erreur serveur: {str(e)}")
+        return jsonify({"error": "Erreur serveur", "code": "SERVER_ERROR"}), 500
 
 @entretiens_bp.route("/rapports/<entretien_id>", methods=["GET"])
 @cross_origin(origins="http://localhost:3000")
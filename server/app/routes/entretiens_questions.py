@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson import ObjectId
-from pymongo.errors import PyMongoError
+from pymongo.errors import PyMongoError, DuplicateKeyError
 import datetime
 from utils import verify_token
 import logging
@@ -13,6 +13,12 @@ from dotenv import load_dotenv
 import base64
 import json
 import httpx
+from llm_client import llm_client
+from config.config import LLM_MODEL
+from llm_resilience import LLMError, LLMBusyError, llm_error_response
+from llm_cache import llm_cache, response_content, cache_mode_from_request, CACHE_USE
+from single_flight import single_flight, SingleFlightTimeout
+from prompt_builder import build_questions_prompt, serialize_offer
 from datetime import datetime, timezone
 
 # Configure logging
@@ -31,12 +37,7 @@ ENTRETIENS_COLLECTION = 'entretiens'
 USERS_COLLECTION = 'utilisateurs'
 QUESTIONS_COLLECTION = 'questions'
 
-# Configuration Groq
 load_dotenv()
-GROQ_API_KEY = "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"
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-
-logger.info("Configuration Groq initialisée")
 
 def store_questions(candidature_id, offre_id, questions, cv_text, job_offer):
     """Stocke les questions générées dans la collection questions"""
@@ -48,13 +49,21 @@ def store_questions(candidature_id, offre_id, questions, cv_text, job_offer):
             "questions": questions,
             "cv_context": cv_text[:1000],  # Stocker un extrait du CV
             "offre_context": job_offer,
-            "date_creation": datetime.datetime.utcnow(),
+            "date_creation": datetime.now(timezone.utc),
             "statut": "actif"
         }
 
-        # Insérer dans la collection questions
+        # Insérer dans la collection questions (une seule fois par candidature,
+        # voir ensure_questions_indexes)
         db = current_app.mongo
-        result = db[QUESTIONS_COLLECTION].insert_one(questions_doc)
+        try:
+            result = db[QUESTIONS_COLLECTION].insert_one(questions_doc)
+        except DuplicateKeyError:
+            existing = db[QUESTIONS_COLLECTION].find_one(
+                {"candidature_id": ObjectId(candidature_id)}, {"_id": 1}
+            )
+            logger.warning(f"Questions déjà stockées pour la candidature {candidature_id}, doublon ignoré")
+            return existing["_id"] if existing else None
         
         if result.inserted_id:
             logger.info(f"Questions stockées avec succès pour la candidature {candidature_id}")
@@ -87,16 +96,14 @@ def get_stored_questions(candidature_id):
         logger.error(f"Erreur lors de la récupération des questions: {str(e)}")
         return None
 
-def make_groq_request(prompt):
-    """Fait une requête à l'API Groq"""
+def make_groq_request(prompt, cache_mode=CACHE_USE, tenant=None):
+    """Fait une requête à l'API Groq (réponse mise en cache, voir llm_cache).
+
+    Lève LLMError si le service LLM est indisponible ou saturé.
+    """
     try:
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         data = {
-            "model": "llama3-8b-8192",
+            "model": LLM_MODEL,
             "messages": [
                 {"role": "system", "content": "Tu es un expert en recrutement qui crée des questions d'entretien pertinentes et ciblées."},
                 {"role": "user", "content": prompt}
@@ -105,20 +112,27 @@ def make_groq_request(prompt):
             "max_tokens": 1500
         }
 
-        logger.info("Envoi de la requête à l'API Groq...")
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(GROQ_API_URL, json=data, headers=headers)
-            
+        def fetch():
+            logger.info("Envoi de la requête à l'API Groq...")
+            response = llm_client.post(data, tenant=tenant)
+
             if response.status_code == 401:
                 logger.error("Erreur d'authentification avec l'API Groq. Vérifiez votre clé API.")
                 return None
             elif response.status_code != 200:
                 logger.error(f"Erreur API Groq (status {response.status_code}): {response.text}")
                 return None
-                
-            response.raise_for_status()
+
             return response.json()
 
+        # Ne conserver que les réponses contenant une liste de questions
+        return llm_cache.completion(
+            current_app.mongo, data, fetch, mode=cache_mode,
+            validate=lambda r: '[' in response_content(r)
+        )
+
+    except LLMError:
+        raise
     except httpx.HTTPError as e:
         logger.error(f"Erreur HTTP lors de la requête à l'API Groq: {str(e)}")
         return None
@@ -184,49 +198,53 @@ def extract_text_from_pdf(pdf_data):
         logger.error(f"Erreur lors de l'extraction du texte du PDF: {str(e)}")
         return ""
 
-def generate_interview_questions(cv_text, job_offer, candidature_id=None, offre_id=None):
-    """Génère des questions d'entretien en utilisant l'API Groq"""
+def generate_interview_questions(cv_text, job_offer, candidature_id=None, offre_id=None, cache_mode=CACHE_USE):
+    """Génère des questions d'entretien en utilisant l'API Groq.
+
+    Une seule génération par candidature : les appels simultanés (acceptation,
+    pré-génération, /interviews/generate) attendent et réutilisent les
+    questions stockées par le premier. Lève LLMError si le service LLM est
+    indisponible ou si la génération en cours ailleurs ne se termine pas à
+    temps : l'appelant répond 503.
+    """
+    if not candidature_id:
+        return request_interview_questions(cv_text, job_offer, candidature_id, offre_id, cache_mode)
+
+    def lookup():
+        stored_questions = get_stored_questions(candidature_id)
+        if stored_questions:
+            logger.info("Utilisation des questions existantes")
+            return stored_questions['questions']
+        return None
+
     try:
-        # Vérifier si des questions existent déjà
-        if candidature_id:
-            stored_questions = get_stored_questions(candidature_id)
-            if stored_questions:
-                logger.info("Utilisation des questions existantes")
-                return stored_questions['questions']
-
-        # Limiter la taille du texte si nécessaire
-        if len(cv_text) > 20000:
-            cv_text = cv_text[:19000]
-        
-        # Préparation du prompt pour Groq
-        prompt = f"""En tant qu'expert en recrutement, analyse le CV du candidat et l'offre d'emploi pour générer 10 questions pertinentes pour l'entretien.
-
-CV du candidat:
-{cv_text}
-
-Offre d'emploi:
-{job_offer}
-
-Génère 10 questions qui:
-1. Présentez-vous
-2. Explorent l'expérience pertinente du candidat
-3. Testent la compréhension du rôle
-4. Évaluent la motivation et l'adaptation
-5. Incluent une question sur un défi technique
-6. Questions basées sur le CV du candidat
-
-Format de réponse souhaité (en JSON):
-[
-    {{
-        "question": "Question 1",
-        "type": "présentation",
-        "objectif": "Connaître le candidat"
-    }},
-    ...
-]"""
+        return single_flight.do(
+            current_app.mongo,
+            f"questions:{candidature_id}",
+            lookup,
+            lambda: request_interview_questions(cv_text, job_offer, candidature_id, offre_id, cache_mode)
+        )
+    except SingleFlightTimeout as e:
+        raise LLMBusyError(str(e))
+    except LLMError:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération des questions: {str(e)}")
+        return ['error']
+
+def request_interview_questions(cv_text, job_offer, candidature_id=None, offre_id=None, cache_mode=CACHE_USE):
+    """Appelle l'API Groq et stocke les questions obtenues si les IDs sont fournis."""
+    try:
+        # CV réduit aux sections utiles et offre réduite aux champs utiles,
+        # dans les budgets de tokens configurés
+        prompt = build_questions_prompt(cv_text, job_offer)
 
         # Appel à l'API Groq
-        response = make_groq_request(prompt)
+        # Les appels LLM sont limités par recruteur (tenant)
+        tenant = None
+        if isinstance(job_offer, dict) and job_offer.get('recruteur_id'):
+            tenant = str(job_offer['recruteur_id'])
+        response = make_groq_request(prompt, cache_mode, tenant)
         if not response:
             logger.error("Pas de réponse de l'API Groq")
             return ['error']
@@ -253,7 +271,7 @@ Format de réponse souhaité (en JSON):
             
             # Stocker les questions si les IDs sont fournis
             if candidature_id and offre_id:
-                store_questions(candidature_id, offre_id, questions, cv_text, job_offer)
+                store_questions(candidature_id, offre_id, questions, cv_text, serialize_offer(job_offer))
             
             return questions
 
@@ -264,6 +282,8 @@ Format de réponse souhaité (en JSON):
             logger.error(f"Erreur lors du traitement de la réponse: {str(e)}")
             return ['error']
 
+    except LLMError:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la génération des questions: {str(e)}")
         return ['error']
@@ -285,12 +305,12 @@ def generate_interview():
             return jsonify({"error": "Tous les champs sont requis"}), 400
 
         # Récupérer les détails de la candidature
-        candidature = current_app.mongo.db.candidatures.find_one({"_id": ObjectId(candidature_id)})
+        candidature = current_app.mongo[CANDIDATURES_COLLECTION].find_one({"_id": ObjectId(candidature_id)})
         if not candidature:
             return jsonify({"error": "Candidature non trouvée"}), 404
 
         # Récupérer les détails de l'offre
-        offre = current_app.mongo.db.offres.find_one({"_id": ObjectId(offre_id)})
+        offre = current_app.mongo[OFFRES_COLLECTION].find_one({"_id": ObjectId(offre_id)})
         if not offre:
             return jsonify({"error": "Offre non trouvée"}), 404
 
@@ -304,27 +324,26 @@ def generate_interview():
                 cv_text = ""
 
         # Générer les questions
-        questions = generate_interview_questions(cv_text, job_offer or offre, candidature_id, offre_id)
+        questions = generate_interview_questions(
+            cv_text, job_offer or offre, candidature_id, offre_id,
+            cache_mode=cache_mode_from_request(request)
+        )
         
         if questions == ['error']:
             return jsonify({"error": "Erreur lors de la génération des questions"}), 500
 
-        # Stocker les questions dans la base de données
-        questions_doc = {
-            "candidature_id": ObjectId(candidature_id),
-            "offre_id": ObjectId(offre_id),
-            "questions": questions,
-            "date_creation": datetime.now(timezone.utc)
-        }
-        
-        result = current_app.mongo.db.questions.insert_one(questions_doc)
+        # Les questions sont déjà stockées par generate_interview_questions
+        stored_questions = get_stored_questions(candidature_id)
         
         return jsonify({
             "success": True,
-            "questions_id": str(result.inserted_id),
+            "questions_id": str(stored_questions["_id"]) if stored_questions else None,
             "questions": questions
         }), 200
 
+    except LLMError as e:
+        logger.error(f"Service LLM indisponible: {e.message}")
+        return llm_error_response(e)
     except Exception as e:
         logger.error(f"Erreur lors de la génération de l'entretien: {str(e)}")
         return jsonify({"error": str(e)}), 500 
\ No newline at end of file
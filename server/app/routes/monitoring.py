@@ -0,0 +1,47 @@
+from flask import Blueprint, current_app, jsonify, request
+import hmac
+import logging
+
+from config.config import MONITORING_TOKEN
+from llm_client import llm_client
+from llm_cache import llm_cache
+from single_flight import single_flight
+from whisper_registry import whisper_registry
+from transcription_cache import transcription_cache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+monitoring_bp = Blueprint('monitoring', __name__)
+
+
+@monitoring_bp.before_request
+def check_monitoring_token():
+    """Les routes de supervision exigent le jeton MONITORING_TOKEN. Sans jeton
+    configuré, elles ne sont ouvertes qu'en mode debug."""
+    if not MONITORING_TOKEN:
+        if current_app.debug:
+            return None
+        return jsonify({"error": "Supervision désactivée (MONITORING_TOKEN non défini)", "code": "MONITORING_DISABLED"}), 403
+    token = request.headers.get('X-Monitoring-Token', '')
+    if not hmac.compare_digest(token, MONITORING_TOKEN):
+        return jsonify({"error": "Jeton de supervision invalide", "code": "INVALID_MONITORING_TOKEN"}), 401
+    return None
+
+
+@monitoring_bp.route('/llm', methods=['GET'])
+def llm_metrics():
+    """Métriques du client LLM : requêtes, latence, pool de connexions, cache, générations uniques."""
+    stats = llm_client.stats()
+    stats["cache"] = llm_cache.stats()
+    stats["single_flight"] = single_flight.stats()
+    return jsonify(stats), 200
+
+
+@monitoring_bp.route('/whisper', methods=['GET'])
+def whisper_metrics():
+    """Modèles Whisper chargés dans ce processus : temps de chargement, mémoire, threads, cache."""
+    stats = whisper_registry.stats()
+    stats["cache"] = transcription_cache.stats()
+    return jsonify(stats), 200
@@ -6,6 +6,7 @@ from utils import verify_token
 import os
 import logging
 from jwt_manager import jwt_manager
+from routes.recruteurv1.entretiens_questions import schedule_questions_pregeneration
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -280,6 +281,9 @@ def submit_candidature():
             {"$push": {"candidature_ids": result.inserted_id}}
         )
 
+        # Questions d'entretien pré-générées en arrière-plan
+        schedule_questions_pregeneration(db, result.inserted_id, offre)
+
         logger.info(f"Nouvelle candidature créée pour l'offre {offre_id} par le candidat {candidat_id}")
         return jsonify({
             "message": "Candidature enregistrée avec succès",
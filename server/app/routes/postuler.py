@@ -7,6 +7,7 @@ from werkzeug.utils import secure_filename
 from pymongo.errors import PyMongoError
 from flask_cors import CORS
 from utils import verify_token
+from routes.recruteurv1.entretiens_questions import schedule_questions_pregeneration
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -126,6 +127,9 @@ def create_candidature():
             {"$push": {"candidature_ids": result.inserted_id}}
         )
 
+        # Questions d'entretien pré-générées en arrière-plan
+        schedule_questions_pregeneration(db, result.inserted_id, offre)
+
         logger.info(f"Nouvelle candidature créée pour l'offre {offre_id} par {data['email']}")
         return jsonify({
             "message": "Candidature enregistrée avec succès",
@@ -228,6 +232,9 @@ def postuler(offre_id):
             {"$push": {"candidature_ids": result.inserted_id}}
         )
 
+        # Questions d'entretien pré-générées en arrière-plan
+        schedule_questions_pregeneration(db, result.inserted_id, offre)
+
         logger.info(f"Nouvelle candidature créée pour l'offre {offre_id} par {data['email']}")
         return jsonify({
             "message": "Candidature enregistrée avec succès",
@@ -410,6 +417,9 @@ def submit_candidature():
             {'_id': ObjectId(offre_id)},
             {'$push': {'candidature_ids': ObjectId(candidature_id)}}
         )
+
+        # Questions d'entretien pré-générées en arrière-plan
+        schedule_questions_pregeneration(db, candidature_id, offre)
         
         logger.info(f"Candidature soumise pour utilisateur: {user_email}, offre: {offre_id}, candidature: {candidature_id}")
 
@@ -10,7 +10,11 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import PyPDF2
 import io
-from .entretiens_questions import generate_interview_questions, get_stored_questions
+from .entretiens_questions import generate_interview_questions, get_stored_questions, candidature_cv_text
+from media_signing import media_signer, signed_media_response
+from llm_resilience import LLMError, llm_error_response
+from llm_cache import cache_mode_from_request
+from video_store import offer_capture_mode
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -224,6 +228,14 @@ def get_offres_with_candidates(auth_payload):
 
 
                         cv_url = f"/api/candidates/cv/{str(candidature['_id'])}"
+                        signed_cv_url = None
+                        if candidature.get("cv_path"):
+                            signed_cv_url = media_signer.signed_url(
+                                cv_url,
+                                f"cv:{str(candidature['_id'])}",
+                                auth_payload.get('sub'),
+                                candidature["cv_path"]
+                            )
                         candidature_data = {
                             "id": str(candidature["_id"]),
                             "nom":u['nom'],
@@ -231,6 +243,7 @@ def get_offres_with_candidates(auth_payload):
                             "status": candidature.get("statut", "En attente"),
                             "date_candidature": candidature.get("created_at", datetime.now(timezone.utc)).isoformat(),
                             "cv_url": cv_url,
+                            "signed_cv_url": signed_cv_url,
                             "lettre_motivation": candidature.get("lettre_motivation", "")
                         }
                         candidatures_list.append(candidature_data)
@@ -311,24 +324,25 @@ def update_candidate_status(candidate_id, auth_payload):
 
         # Si le statut est "Accepté", générer les questions et créer l'entretien
         if data['status'] == "Accepté":
-            # Extraire le texte du CV
-            cv_text = ""
-            if candidature.get("cv_path"):
-                with open(candidature["cv_path"], 'rb') as f:
-                    cv_text = extract_text_from_pdf(f.read())
-
-            # Générer les questions
-            questions_result = generate_interview_questions(cv_text, offre, candidate_id, str(offre_id))
-            
-            if questions_result == ['error']:
-                logger.error("Erreur lors de la génération des questions")
-                return jsonify({"error": "Erreur lors de la génération des questions", "code": "QUESTIONS_GENERATION_ERROR"}), 500
-
-            # Récupérer les questions stockées pour obtenir l'ID
+            # Questions pré-générées au dépôt de la candidature, sinon générées maintenant
             stored_questions = get_stored_questions(candidate_id)
-            if not stored_questions:
-                logger.error("Questions non trouvées après génération")
-                return jsonify({"error": "Erreur lors de la récupération des questions", "code": "QUESTIONS_NOT_FOUND"}), 500
+            if stored_questions:
+                logger.info(f"Questions pré-générées utilisées pour la candidature {candidate_id}")
+            else:
+                questions_result = generate_interview_questions(
+                    candidature_cv_text(candidature), offre, candidate_id, str(offre_id),
+                    cache_mode=cache_mode_from_request(request)
+                )
+
+                if questions_result == ['error']:
+                    logger.error("Erreur lors de la génération des questions")
+                    return jsonify({"error": "Erreur lors de la génération des questions", "code": "QUESTIONS_GENERATION_ERROR"}), 500
+
+                # Récupérer les questions stockées pour obtenir l'ID
+                stored_questions = get_stored_questions(candidate_id)
+                if not stored_questions:
+                    logger.error("Questions non trouvées après génération")
+                    return jsonify({"error": "Erreur lors de la récupération des questions", "code": "QUESTIONS_NOT_FOUND"}), 500
 
             # Créer l'entretien
             entretien = {
@@ -337,6 +351,7 @@ def update_candidate_status(candidate_id, auth_payload):
                 "candidat_id": candidature.get("user_id"),
                 "recruteur_id": ObjectId(recruteur_id),
                 "questions_id": stored_questions["_id"],
+                "capture_mode": offer_capture_mode(offre),
                 "statut": "planifie",
                 "date_creation": datetime.now(timezone.utc),
                 "date_maj": datetime.now(timezone.utc)
@@ -371,6 +386,9 @@ def update_candidate_status(candidate_id, auth_payload):
         logger.info(f"Statut de la candidature {candidate_id} mis à jour vers {data['status']} par le recruteur {recruteur_id}")
         return jsonify({"message": "Statut mis à jour"}), 200
 
+    except LLMError as e:
+        logger.error(f"Service LLM indisponible pour la candidature {candidate_id}: {e.message}")
+        return llm_error_response(e)
     except PyMongoError as e:
         logger.error(f"Erreur MongoDB dans /candidates/{candidate_id}: {str(e)}")
         return jsonify({"error": "Erreur de base de données", "code": "DB_ERROR"}), 500
@@ -382,9 +400,30 @@ def update_candidate_status(candidate_id, auth_payload):
 def get_cv(candidature_id):
     """Récupérer le CV d'une candidature."""
     try:
+        # URL signée : vérification sans état, aucune requête MongoDB
+        if request.args.get('sig'):
+            signed = media_signer.verify(f"cv:{candidature_id}", request.args)
+            if not signed:
+                return jsonify({"error": "URL signée invalide ou expirée", "code": "INVALID_SIGNATURE"}), 403
+
+            response = signed_media_response(
+                signed["storage_key"],
+                "application/pdf",
+                signed["exp"],
+                download_name="cv.pdf"
+            )
+            if response is None:
+                logger.warning(f"CV non trouvé pour la candidature: {candidature_id}")
+                response = make_response(generate_not_available_pdf())
+                response.headers["Content-Type"] = "application/pdf"
+                response.headers["Content-Disposition"] = "inline; filename=cv_non_disponible.pdf"
+            response.headers["Access-Control-Allow-Origin"] = "*"
+            response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
+            return response
+
         # Récupérer le token depuis l'URL ou les headers
         token = request.args.get('token')
-        logger.info(f"Token reçu dans l'URL: {token[:20]}...")  # Log seulement le début du token pour la sécurité
+        logger.info(f"Token reçu dans l'URL: {token[:20] if token else None}...")  # Log seulement le début du token pour la sécurité
 
         if not token:
             logger.error("Aucun token d'authentification fourni")
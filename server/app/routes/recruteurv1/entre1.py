@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request, current_app, send_file
+from flask import Blueprint, jsonify, request, current_app
 from bson import ObjectId
 from datetime import datetime, timezone
 import logging
@@ -8,13 +8,19 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import json
 import os
-import base64
-import tempfile
-import shutil
-import whisper
+from whisper_registry import whisper_registry
 from moviepy import VideoFileClip
 import io
 import gridfs
+from media_signing import media_signer, signed_media_response
+from video_streaming import stream_media
+from jobs import enqueue
+from llm_cache import cache_mode_from_request
+from routes.entretiens import REPORT_JOB_TYPE, RAPPORT_EN_ATTENTE, RAPPORT_EN_COURS, rapport_stream_url, ensure_video_dir
+from transcription import enqueue_transcription
+from renditions import accepted_types, enqueue_renditions, media_mimetype, select_rendition
+from config.config import RENDITIONS_ON_SAVE
+from video_store import VIDEOS_COLLECTION, VIDEO_METADATA_PROJECTION, video_metadata, write_base64_file
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +37,10 @@ UTILISATEURS_COLLECTION = 'utilisateurs'
 RECRUTEURS_COLLECTION = 'recruteurs'
 ENTRETIENS_COLLECTION = 'entretiens'
 
+# Détail d'un entretien : métadonnées de la vidéo plus la transcription et
+# les métadonnées d'origine lues par le client (payload.video)
+VIDEO_DETAILS_PROJECTION = {**VIDEO_METADATA_PROJECTION, "transcription": 1, "metadata": 1}
+
 # Configure CORS
 CORS(entretiensection_bp, 
      resources={r"/*": {"origins": "http://localhost:3000"}},
@@ -140,52 +150,66 @@ def require_auth(role):
         return wrapped_function
     return decorator
 
-def store_video_and_transcribe(video_base64, entretien_id):
-    """Stocke la vidéo et génère une transcription."""
-    try:
-        temp_dir = tempfile.mkdtemp()
-        video_path = os.path.join(temp_dir, f"{entretien_id}.mp4")
-        
-        video_data = base64.b64decode(video_base64)
-        with open(video_path, "wb") as f:
-            f.write(video_data)
-            
-        video_url = f"/api/recruteur/entretiens/videos/{entretien_id}"
-        
-        model = whisper.load_model("base")
-        result = model.transcribe(video_path)
-        transcription = result["text"]
-        
-        video_doc = {
-            "entretien_id": ObjectId(entretien_id),
-            "video_data": video_base64,
-            "video_url": video_url,
-            "transcription": transcription,
-            "created_at": datetime.now(timezone.utc)
-        }
-        video_id = current_app.mongo.db.videos.insert_one(video_doc).inserted_id
-        
-        current_app.mongo.db.entretiens.update_one(
-            {"_id": ObjectId(entretien_id)},
-            {
-                "$set": {
-                    "video_id": video_id,
-                    "video_url": video_url,
-                    "transcription": transcription,
-                    "statut": "termine",
-                    "completed_at": datetime.now(timezone.utc),
-                    "date_maj": datetime.now(timezone.utc)
-                }
-            }
-        )
-        
-        return video_id, transcription, video_url
-        
-    finally:
-        try:
-            shutil.rmtree(temp_dir)
-        except Exception as e:
-            logger.error(f"Erreur lors du nettoyage des fichiers temporaires: {str(e)}")
+def store_video_and_transcribe(video_base64, entretien_id, defer=False):
+    """Stocke la vidéo et génère une transcription.
+
+    La vidéo est décodée par blocs dans le dossier des vidéos ; le document
+    `videos` n'en garde que les métadonnées. Avec `defer`, la transcription
+    est confiée aux workers de transcription et la valeur retournée est None.
+    """
+    video_id, relative_video_path, video_url, sha256 = store_video_file(video_base64, entretien_id)
+    if RENDITIONS_ON_SAVE:
+        enqueue_renditions(current_app.mongo, entretien_id, relative_video_path)
+    now = datetime.now(timezone.utc)
+    update = {
+        "video_id": video_id,
+        "video_url": video_url,
+        "video_path": relative_video_path,
+        "statut": "termine",
+        "completed_at": now,
+        "date_maj": now
+    }
+
+    if defer:
+        current_app.mongo[ENTRETIENS_COLLECTION].update_one({"_id": ObjectId(entretien_id)}, {"$set": update})
+        # Empreinte calculée à l'écriture : la vidéo n'est pas relue pour le cache
+        enqueue_transcription(current_app.mongo, entretien_id, relative_video_path, now, media_sha256=sha256)
+        return video_id, None, video_url
+
+    # Modèle chargé une seule fois par processus
+    result = whisper_registry.transcribe(os.path.join(current_app.root_path, relative_video_path))
+    transcription = result["text"]
+
+    current_app.mongo[VIDEOS_COLLECTION].update_one({"_id": video_id}, {"$set": {"transcription": transcription}})
+    update["transcription"] = transcription
+    current_app.mongo[ENTRETIENS_COLLECTION].update_one({"_id": ObjectId(entretien_id)}, {"$set": update})
+
+    return video_id, transcription, video_url
+
+def store_video_file(video_base64, entretien_id):
+    """Écrit la vidéo sur disque et enregistre ses métadonnées.
+
+    Retourne (video_id, chemin relatif, URL, sha256).
+    """
+    video_dir, error = ensure_video_dir()
+    if error:
+        raise RuntimeError("Dossier des vidéos indisponible")
+
+    video_path = os.path.join(video_dir, f"{entretien_id}.mp4")
+    size, sha256 = write_base64_file(video_base64, video_path)
+    relative_video_path = os.path.relpath(video_path, current_app.root_path).replace('\\', '/')
+    video_url = f"/api/recruteur/entretiens/videos/{entretien_id}"
+
+    video_id = current_app.mongo[VIDEOS_COLLECTION].insert_one({
+        "entretien_id": ObjectId(entretien_id),
+        "video_path": relative_video_path,
+        "video_url": video_url,
+        "size": size,
+        "sha256": sha256,
+        "created_at": datetime.now(timezone.utc)
+    }).inserted_id
+    logger.info(f"Vidéo de l'entretien {entretien_id} stockée: {relative_video_path} ({size} octets)")
+    return video_id, relative_video_path, video_url, sha256
 
 @entretiensection_bp.route("", methods=["GET"])
 @require_auth("recruteur")
@@ -205,6 +229,9 @@ def get_recruiter_interviews(auth_payload):
         if not recruteur_id:
             return jsonify({"error": "ID recruteur non trouvé", "code": "MISSING_RECRUITER_ID"}), 400
 
+        # Métadonnées des vidéos en une seule requête, sans les octets
+        videos = video_metadata(db, [entretien["_id"] for entretien in entretiens])
+
         result = []
         for entretien in entretiens:
             try:
@@ -215,7 +242,7 @@ def get_recruiter_interviews(auth_payload):
                     continue
 
                 candidat = db[UTILISATEURS_COLLECTION].find_one({"_id": entretien.get("candidat_id")})
-                video = db["videos"].find_one({"entretien_id": entretien["_id"]})
+                video = videos.get(entretien["_id"])
                 
                 # Récupérer le rapport
                 rapport = None
@@ -308,8 +335,8 @@ def get_interview_details(interview_id, auth_payload):
             offre = db[OFFRES_COLLECTION].find_one({"_id": ObjectId(interview['offre_id'])})
         
         # Récupérer la vidéo
-        video = db["videos"].find_one({"entretien_id": interview["_id"]})
-        logger.info(f"Vidéo trouvée: {video}")
+        video = db[VIDEOS_COLLECTION].find_one({"entretien_id": interview["_id"]}, VIDEO_DETAILS_PROJECTION)
+        logger.info(f"Vidéo trouvée: {video['_id'] if video else None}")
 
         # Construire l'URL complète de la vidéo
         video_url = None
@@ -317,6 +344,38 @@ def get_interview_details(interview_id, auth_payload):
             video_url = f"/api/recruteur/entretiens/videos/{str(interview['_id'])}"
             logger.info(f"URL de la vidéo construite: {video_url}")
 
+        # URL signée : les requêtes du lecteur (y compris les Range) ne
+        # repassent ni par le JWT ni par MongoDB. Une URL par version
+        # compressée ; l'URL principale désigne la plus petite vidéo.
+        signed_video_url = None
+        signed_renditions = []
+        if interview.get('video_path'):
+            def sign_media(storage_key):
+                return media_signer.signed_url(
+                    f"/api/recruteur/entretiens/videos/{str(interview['_id'])}",
+                    f"video:{str(interview['_id'])}",
+                    auth_payload.get('sub'),
+                    storage_key
+                )
+            default = select_rendition(interview.get('renditions'))
+            signed_video_url = sign_media(default['path'] if default else interview['video_path'])
+            signed_renditions = [
+                {
+                    "url": sign_media(rendition['path']),
+                    "type": rendition['type'],
+                    "mimetype": rendition['mimetype'],
+                    "height": rendition.get('height'),
+                    "size": rendition['size']
+                }
+                for rendition in interview.get('renditions') or []
+            ]
+            video_url = video_url or signed_video_url
+
+        # Flux SSE du rapport : progression de la génération puis rapport final
+        signed_rapport_stream_url = None
+        if interview.get('statut') == "termine":
+            signed_rapport_stream_url = rapport_stream_url(interview['_id'], auth_payload.get('sub'))
+
         # Convertir l'entretien en dictionnaire
         interview_dict = convert_objectid(interview)
         logger.info(f"Entretien converti en dictionnaire: {interview_dict}")
@@ -325,7 +384,10 @@ def get_interview_details(interview_id, auth_payload):
         response_data = {
             "interview": {
                 **interview_dict,
-                "questions": questions
+                "questions": questions,
+                "signed_video_url": signed_video_url,
+                "signed_renditions": signed_renditions,
+                "signed_rapport_stream_url": signed_rapport_stream_url
             },
             "offre": convert_objectid(offre) if offre else None,
             "candidat": convert_objectid(candidat) if candidat else None,
@@ -370,7 +432,7 @@ def get_interview_recordings(interview_id, auth_payload):
         if not entretien:
             return jsonify({"error": "Entretien non trouvé", "code": "INTERVIEW_NOT_FOUND"}), 404
 
-        recordings = entretien.get("recordings", [])
+        recordings = [r for r in entretien.get("recordings", []) if isinstance(r, dict)]
 
         return jsonify({
             "success": True,
@@ -442,10 +504,32 @@ def save_interview_recordings(interview_id, auth_payload):
             "error": "Erreur lors de la sauvegarde des enregistrements"
         }), 500
 
-@entretiensection_bp.route("/videos/<string:interview_id>", methods=["GET"])
+@entretiensection_bp.route("/videos/<string:interview_id>", methods=["GET", "HEAD"])
+@entretiensection_bp.route("/videos/<string:interview_id>/stream", methods=["GET", "HEAD"])
 def get_interview_video(interview_id):
     """Récupérer la vidéo d'un entretien."""
     try:
+        # URL signée : vérification sans état, aucune requête MongoDB
+        if request.args.get('sig'):
+            signed = media_signer.verify(f"video:{interview_id}", request.args)
+            if not signed:
+                return jsonify({"error": "URL signée invalide ou expirée"}), 403
+
+            storage_key = signed['storage_key']
+            response = signed_media_response(
+                storage_key,
+                media_mimetype(storage_key),
+                signed['exp'],
+                download_name=f"interview_{interview_id}{os.path.splitext(storage_key)[1]}"
+            )
+            if response is None:
+                logger.error(f"Le fichier vidéo n'existe pas: {signed['storage_key']}")
+                return jsonify({"error": "Fichier vidéo non trouvé"}), 404
+            response.headers['Access-Control-Allow-Origin'] = 'http://localhost:3000'
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.headers['Access-Control-Expose-Headers'] = 'Accept-Ranges, Content-Range, Content-Length, ETag'
+            return response
+
         # Récupérer le token depuis l'URL
         token = request.args.get('token')
         if not token:
@@ -486,6 +570,17 @@ def get_interview_video(interview_id):
             logger.error(f"Chemin de la vidéo non trouvé pour l'entretien: {interview_id}")
             return jsonify({"error": "Vidéo non trouvée"}), 404
 
+        # Plus petite version adaptée au client : ?media=audio pour l'audio
+        # seul, ?formats=mp4,webm (ou en-tête Accept), ?height=480
+        rendition = select_rendition(
+            entretien.get('renditions'),
+            kind=request.args.get('media', 'video'),
+            types=accepted_types(request.args.get('formats'), request.headers.get('Accept')),
+            min_height=request.args.get('height', type=int)
+        )
+        if rendition:
+            video_path = rendition['path']
+
         # Normaliser le chemin du fichier et convertir les backslashes en forward slashes
         video_path = video_path.replace('\\', '/')
         if not os.path.isabs(video_path):
@@ -499,16 +594,17 @@ def get_interview_video(interview_id):
             return jsonify({"error": "Fichier vidéo non trouvé"}), 404
 
         logger.info(f"Envoi du fichier vidéo: {video_path}")
-        response = send_file(
+        response = stream_media(
             video_path,
-            mimetype='video/webm',
-            as_attachment=False,
-            download_name=f"interview_{interview_id}.webm"
+            media_mimetype(video_path),
+            download_name=f"interview_{interview_id}{os.path.splitext(video_path)[1]}"
         )
         response.headers['Access-Control-Allow-Origin'] = 'http://localhost:3000'
         response.headers['Access-Control-Allow-Credentials'] = 'true'
         response.headers['Access-Control-Allow-Methods'] = 'GET, OPTIONS'
-        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Range'
+        response.headers['Access-Control-Expose-Headers'] = 'Accept-Ranges, Content-Range, Content-Length, ETag'
+        response.headers['Vary'] = 'Accept'
         return response
 
     except Exception as e:
@@ -581,6 +677,64 @@ def get_interview_report(interview_id, auth_payload):
         logger.error(f"Erreur lors de la récupération du rapport: {str(e)}")
         return jsonify({"error": str(e), "code": "SERVER_ERROR"}), 500
 
+@entretiensection_bp.route("/<string:interview_id>/rapport/regenerate", methods=["POST"])
+@require_auth("recruteur")
+def regenerate_interview_report(interview_id, auth_payload):
+    """Relance la génération du rapport d'un entretien terminé.
+
+    Le mode de cache LLM (en-tête X-LLM-Cache : use, refresh ou bypass) est
+    transmis au job ; par défaut, les évaluations déjà obtenues pour les
+    mêmes réponses sont réutilisées.
+    """
+    try:
+        db = current_app.mongo
+        now = datetime.now(timezone.utc)
+        interview_filter = {
+            "_id": ObjectId(interview_id),
+            "recruteur_id": ObjectId(auth_payload.get('recruteur_id')),
+            "statut": "termine"
+        }
+        # Un rapport en cours de génération sous un bail valide n'est pas
+        # remis en attente : le générateur perdrait sa réservation
+        updated = db[ENTRETIENS_COLLECTION].update_one(
+            {
+                **interview_filter,
+                "$or": [
+                    {"rapport_statut": {"$ne": RAPPORT_EN_COURS}},
+                    {"rapport_bail_expire": {"$not": {"$gt": now}}}
+                ]
+            },
+            {"$set": {"rapport_statut": RAPPORT_EN_ATTENTE, "date_maj": now}}
+        )
+        if updated.matched_count == 0:
+            if db[ENTRETIENS_COLLECTION].count_documents(interview_filter, limit=1) == 0:
+                return jsonify({"error": "Entretien terminé non trouvé", "code": "INTERVIEW_NOT_FOUND"}), 404
+            return jsonify({
+                "error": "Le rapport est déjà en cours de génération",
+                "code": "RAPPORT_IN_PROGRESS"
+            }), 409
+
+        job_id = enqueue(
+            db,
+            REPORT_JOB_TYPE,
+            {"entretien_id": interview_id, "cache_mode": cache_mode_from_request(request)},
+            priority=10,
+            dedupe_key=f"rapport:{interview_id}"
+        )
+        logger.info(f"Régénération du rapport demandée pour l'entretien: {interview_id}")
+
+        return jsonify({
+            "success": True,
+            "data": {
+                "rapportStatus": RAPPORT_EN_ATTENTE,
+                "rapportJobId": str(job_id) if job_id else None
+            }
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la régénération du rapport: {str(e)}")
+        return jsonify({"error": str(e), "code": "SERVER_ERROR"}), 500
+
 @entretiensection_bp.route("/<string:interview_id>/message", methods=["POST"])
 @require_auth("recruteur")
 def send_interview_message(interview_id, auth_payload):
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson import ObjectId
-from pymongo.errors import PyMongoError
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError, DuplicateKeyError, OperationFailure
 import datetime
 from utils import verify_token
 import logging
@@ -13,6 +14,17 @@ from dotenv import load_dotenv
 import base64
 import json
 import httpx
+from llm_client import llm_client
+from config.config import LLM_MODEL
+from llm_resilience import LLMError, LLMBusyError
+from llm_cache import llm_cache, response_content, CACHE_USE
+from single_flight import single_flight, SingleFlightTimeout
+from prompt_builder import (
+    build_questions_prompt, build_bank_prompt, build_candidate_questions_prompt,
+    serialize_offer, offer_fingerprint
+)
+from jobs import enqueue, job_handler
+from config.config import QUESTIONS_PREGEN_POLICY, QUESTIONS_PREGEN_TOP_N, QUESTIONS_PREGEN_CONCURRENCY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,12 +42,22 @@ ENTRETIENS_COLLECTION = 'entretiens'
 USERS_COLLECTION = 'utilisateurs'
 QUESTIONS_COLLECTION = 'questions'
 
-# Configuration Groq
-load_dotenv()
-GROQ_API_KEY = "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"
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Pré-génération des questions au dépôt d'une candidature : job de basse
+# priorité, pour que l'acceptation n'ait plus qu'à lire le document questions
+QUESTIONS_JOB_TYPE = 'pregenerate_questions'
+QUESTIONS_JOB_PRIORITY = -10
+PREGENERATION_TOUJOURS = 'toujours'
+PREGENERATION_TOP_N = 'top_n'
+PREGENERATION_JAMAIS = 'jamais'
+PREGENERATION_POLICIES = (PREGENERATION_TOUJOURS, PREGENERATION_TOP_N, PREGENERATION_JAMAIS)
+
+# Questions par entretien, dont celles de la banque commune à l'offre
+# (stockée dans offres.banque_questions)
+INTERVIEW_QUESTIONS_COUNT = 10
+BANK_QUESTIONS_COUNT = 5
+QUESTION_BANK_FIELD = 'banque_questions'
 
-logger.info("Configuration Groq initialisée")
+load_dotenv()
 
 def store_questions(candidature_id, offre_id, questions, cv_text, job_offer):
     """Stocke les questions générées dans la collection questions"""
@@ -51,9 +73,17 @@ def store_questions(candidature_id, offre_id, questions, cv_text, job_offer):
             "statut": "actif"
         }
 
-        # Insérer dans la collection questions
+        # Insérer dans la collection questions (une seule fois par candidature,
+        # voir ensure_questions_indexes)
         db = current_app.mongo
-        result = db[QUESTIONS_COLLECTION].insert_one(questions_doc)
+        try:
+            result = db[QUESTIONS_COLLECTION].insert_one(questions_doc)
+        except DuplicateKeyError:
+            existing = db[QUESTIONS_COLLECTION].find_one(
+                {"candidature_id": ObjectId(candidature_id)}, {"_id": 1}
+            )
+            logger.warning(f"Questions déjà stockées pour la candidature {candidature_id}, doublon ignoré")
+            return existing["_id"] if existing else None
         
         if result.inserted_id:
             logger.info(f"Questions stockées avec succès pour la candidature {candidature_id}")
@@ -86,16 +116,69 @@ def get_stored_questions(candidature_id):
         logger.error(f"Erreur lors de la récupération des questions: {str(e)}")
         return None
 
-def make_groq_request(prompt):
-    """Fait une requête à l'API Groq"""
-    try:
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
+def resolve_duplicate_questions(db, dry_run=False):
+    """Résout les doublons de questions créés avant l'index unique.
+
+    Le document rattaché à un entretien (sinon le plus récent) est conservé,
+    les autres doublons rattachés à un entretien perdent leur candidature_id
+    et les derniers sont supprimés. Migration ponctuelle : voir
+    migrate_questions.py. Retourne le nombre de doublons résolus.
+    """
+    duplicates = db[QUESTIONS_COLLECTION].aggregate([
+        {"$match": {"candidature_id": {"$type": "objectId"}}},
+        {"$sort": {"date_creation": -1}},
+        {"$group": {"_id": "$candidature_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ])
+    resolved = 0
+    for group in duplicates:
+        referenced = {
+            e["questions_id"] for e in db[ENTRETIENS_COLLECTION].find(
+                {"questions_id": {"$in": group["ids"]}}, {"questions_id": 1}
+            )
         }
-        
+        keep = next((qid for qid in group["ids"] if qid in referenced), group["ids"][0])
+        others = [qid for qid in group["ids"] if qid != keep]
+        resolved += len(others)
+        if dry_run:
+            logger.info(f"Candidature {group['_id']}: {len(others)} doublon(s), conservé {keep}")
+            continue
+        detached = [qid for qid in others if qid in referenced]
+        if detached:
+            db[QUESTIONS_COLLECTION].update_many(
+                {"_id": {"$in": detached}},
+                {"$rename": {"candidature_id": "candidature_id_doublon"}}
+            )
+        db[QUESTIONS_COLLECTION].delete_many({"_id": {"$in": [qid for qid in others if qid not in referenced]}})
+        logger.warning(f"{len(others)} doublon(s) de questions résolu(s) pour la candidature {group['_id']}")
+    return resolved
+
+def ensure_questions_indexes(db):
+    """Un seul document questions par candidature (index unique).
+
+    Les doublons antérieurs à l'index ne sont pas modifiés au démarrage :
+    tant que `python migrate_questions.py` n'a pas été lancé, l'index n'est
+    pas créé et la génération unique (single-flight) reste seule à éviter
+    les doublons.
+    """
+    try:
+        db[QUESTIONS_COLLECTION].create_index(
+            [("candidature_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"candidature_id": {"$type": "objectId"}}
+        )
+    except OperationFailure as e:
+        logger.error(f"Index unique des questions non créé (doublons existants, "
+                     f"lancer python migrate_questions.py): {str(e)}")
+
+def make_groq_request(prompt, cache_mode=CACHE_USE, tenant=None):
+    """Fait une requête à l'API Groq (réponse mise en cache, voir llm_cache).
+
+    Lève LLMError si le service LLM est indisponible ou saturé.
+    """
+    try:
         data = {
-            "model": "llama3-8b-8192",
+            "model": LLM_MODEL,
             "messages": [
                 {"role": "system", "content": "Tu es un expert en recrutement qui crée des questions d'entretien pertinentes et ciblées."},
                 {"role": "user", "content": prompt}
@@ -104,20 +187,27 @@ def make_groq_request(prompt):
             "max_tokens": 1500
         }
 
-        logger.info("Envoi de la requête à l'API Groq...")
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(GROQ_API_URL, json=data, headers=headers)
-            
+        def fetch():
+            logger.info("Envoi de la requête à l'API Groq...")
+            response = llm_client.post(data, tenant=tenant)
+
             if response.status_code == 401:
                 logger.error("Erreur d'authentification avec l'API Groq. Vérifiez votre clé API.")
                 return None
             elif response.status_code != 200:
                 logger.error(f"Erreur API Groq (status {response.status_code}): {response.text}")
                 return None
-                
-            response.raise_for_status()
+
             return response.json()
 
+        # Ne conserver que les réponses contenant une liste de questions
+        return llm_cache.completion(
+            current_app.mongo, data, fetch, mode=cache_mode,
+            validate=lambda r: '[' in response_content(r)
+        )
+
+    except LLMError:
+        raise
     except httpx.HTTPError as e:
         logger.error(f"Erreur HTTP lors de la requête à l'API Groq: {str(e)}")
         return None
@@ -183,87 +273,257 @@ def extract_text_from_pdf(pdf_data):
         logger.error(f"Erreur lors de l'extraction du texte du PDF: {str(e)}")
         return ""
 
-def generate_interview_questions(cv_text, job_offer, candidature_id=None, offre_id=None):
-    """Génère des questions d'entretien en utilisant l'API Groq"""
+def generate_interview_questions(cv_text, job_offer, candidature_id=None, offre_id=None, cache_mode=CACHE_USE):
+    """Génère des questions d'entretien en utilisant l'API Groq.
+
+    Une seule génération par candidature : les appels simultanés (acceptation,
+    pré-génération, /interviews/generate) attendent et réutilisent les
+    questions stockées par le premier. Lève LLMError si le service LLM est
+    indisponible ou si la génération en cours ailleurs ne se termine pas à
+    temps : l'appelant répond 503.
+    """
+    if not candidature_id:
+        return request_interview_questions(cv_text, job_offer, candidature_id, offre_id, cache_mode)
+
+    def lookup():
+        stored_questions = get_stored_questions(candidature_id)
+        if stored_questions:
+            logger.info("Utilisation des questions existantes")
+            return stored_questions['questions']
+        return None
+
     try:
-        # Vérifier si des questions existent déjà
-        if candidature_id:
-            stored_questions = get_stored_questions(candidature_id)
-            if stored_questions:
-                logger.info("Utilisation des questions existantes")
-                return stored_questions['questions']
-
-        # Limiter la taille du texte si nécessaire
-        if len(cv_text) > 20000:
-            cv_text = cv_text[:19000]
-        
-        # Préparation du prompt pour Groq
-        prompt = f"""En tant qu'expert en recrutement, analyse le CV du candidat et l'offre d'emploi pour générer 10 questions pertinentes pour l'entretien.
-
-CV du candidat:
-{cv_text}
-
-Offre d'emploi:
-{job_offer}
-
-Génère 10 questions qui:
-1. Présentez-vous
-2. Explorent l'expérience pertinente du candidat
-3. Testent la compréhension du rôle
-4. Évaluent la motivation et l'adaptation
-5. Incluent une question sur un défi technique
-6. Questions basées sur le CV du candidat
-
-
-Format de réponse souhaité (en JSON):
-[
-    {{
-        "question": "Question 1",
-        "type": "présentation",
-        "objectif": "Connaître le candidat"
-    }},
-    ...
-]"""
+        return single_flight.do(
+            current_app.mongo,
+            f"questions:{candidature_id}",
+            lookup,
+            lambda: request_interview_questions(cv_text, job_offer, candidature_id, offre_id, cache_mode)
+        )
+    except SingleFlightTimeout as e:
+        raise LLMBusyError(str(e))
+    except LLMError:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération des questions: {str(e)}")
+        return ['error']
+
+def parse_questions(response):
+    """Liste de questions contenue dans une réponse de l'API Groq, ou None."""
+    questions_text = response['choices'][0]['message']['content'].strip()
+    logger.info("Réponse reçue de l'API Groq")
+
+    # Trouver le début et la fin de la structure JSON
+    start_index = questions_text.find('[')
+    end_index = questions_text.rfind(']') + 1
+    if start_index == -1 or end_index == 0:
+        logger.error("Format de réponse invalide - aucune liste trouvée")
+        return None
+
+    try:
+        questions = json.loads(questions_text[start_index:end_index])
+    except json.JSONDecodeError as e:
+        logger.error(f"Erreur lors du parsing JSON: {str(e)}")
+        return None
+    if not isinstance(questions, list) or not questions:
+        logger.error("Format de réponse invalide - liste de questions vide")
+        return None
+    return questions
+
+def offer_tenant(job_offer):
+    """Les appels LLM sont limités par recruteur (tenant)."""
+    if isinstance(job_offer, dict) and job_offer.get('recruteur_id'):
+        return str(job_offer['recruteur_id'])
+    return None
+
+def offer_question_bank(offre, cache_mode=CACHE_USE):
+    """Questions communes à tous les candidats d'une offre (présentation, rôle,
+    motivation, défi technique), générées une fois et gardées sur l'offre.
+
+    La banque stockée n'est valide que si l'empreinte des champs de l'offre
+    utilisés par le prompt n'a pas changé. Retourne None si elle ne peut pas
+    être générée.
+    """
+    db = current_app.mongo
+    offre_id = offre["_id"]
+    fingerprint = offer_fingerprint(offre)
+
+    def lookup():
+        current = db[OFFRES_COLLECTION].find_one({"_id": offre_id}, {QUESTION_BANK_FIELD: 1})
+        bank = (current or {}).get(QUESTION_BANK_FIELD) or {}
+        if bank.get("empreinte") == fingerprint and bank.get("questions"):
+            return bank["questions"]
+        return None
+
+    def compute():
+        logger.info(f"Génération de la banque de questions de l'offre {offre_id}")
+        response = make_groq_request(build_bank_prompt(offre, BANK_QUESTIONS_COUNT), cache_mode, offer_tenant(offre))
+        questions = parse_questions(response) if response else None
+        if not questions:
+            return None
+        questions = questions[:BANK_QUESTIONS_COUNT]
+        db[OFFRES_COLLECTION].update_one(
+            {"_id": offre_id},
+            {"$set": {QUESTION_BANK_FIELD: {
+                "questions": questions,
+                "empreinte": fingerprint,
+                "modele": LLM_MODEL,
+                "date_creation": datetime.datetime.utcnow()
+            }}}
+        )
+        return questions
+
+    try:
+        return single_flight.do(db, f"banque:{offre_id}", lookup, compute)
+    except SingleFlightTimeout:
+        logger.warning(f"Banque de questions de l'offre {offre_id} toujours en cours de génération")
+        return None
+
+def merge_questions(bank_questions, candidate_questions):
+    """Question de présentation de la banque, puis questions propres au CV,
+    puis le reste de la banque.
+    """
+    return bank_questions[:1] + candidate_questions + bank_questions[1:]
+
+def request_interview_questions(cv_text, job_offer, candidature_id=None, offre_id=None, cache_mode=CACHE_USE):
+    """Appelle l'API Groq et stocke les questions obtenues si les IDs sont fournis.
+
+    Pour une offre enregistrée, seules les questions propres au CV sont
+    générées et complètent la banque de questions de l'offre ; sans banque,
+    les 10 questions sont générées ensemble.
+    """
+    try:
+        bank = None
+        if isinstance(job_offer, dict) and job_offer.get('_id'):
+            bank = offer_question_bank(job_offer, cache_mode)
+
+        # CV réduit aux sections utiles et offre réduite aux champs utiles,
+        # dans les budgets de tokens configurés
+        candidate_count = INTERVIEW_QUESTIONS_COUNT - len(bank) if bank else INTERVIEW_QUESTIONS_COUNT
+        if bank:
+            prompt = build_candidate_questions_prompt(cv_text, job_offer, bank, candidate_count)
+        else:
+            prompt = build_questions_prompt(cv_text, job_offer)
 
         # Appel à l'API Groq
-        response = make_groq_request(prompt)
+        response = make_groq_request(prompt, cache_mode, offer_tenant(job_offer))
         if not response:
             logger.error("Pas de réponse de l'API Groq")
             return ['error']
 
-        # Extraire et parser la réponse
-        questions_text = response['choices'][0]['message']['content'].strip()
-        logger.info("Réponse reçue de l'API Groq")
-        
-        try:
-            # Trouver le début et la fin de la structure JSON
-            start_index = questions_text.find('[')
-            end_index = questions_text.rfind(']') + 1
-
-            if start_index == -1 or end_index == 0:
-                logger.error("Format de réponse invalide - aucune liste trouvée")
-                return ['error']
-
-            # Extraire la chaîne JSON
-            questions_json = questions_text[start_index:end_index]
-            logger.info("JSON extrait de la réponse")
-
-            # Parser la chaîne JSON en liste Python
-            questions = json.loads(questions_json)
-            
-            # Stocker les questions si les IDs sont fournis
-            if candidature_id and offre_id:
-                store_questions(candidature_id, offre_id, questions, cv_text, job_offer)
-            
-            return questions
-
-        except json.JSONDecodeError as e:
-            logger.error(f"Erreur lors du parsing JSON: {str(e)}")
-            return ['error']
-        except Exception as e:
-            logger.error(f"Erreur lors du traitement de la réponse: {str(e)}")
+        questions = parse_questions(response)
+        if not questions:
             return ['error']
+        if bank:
+            questions = merge_questions(bank, questions[:candidate_count])
+
+        # Stocker les questions si les IDs sont fournis
+        if candidature_id and offre_id:
+            store_questions(candidature_id, offre_id, questions, cv_text, serialize_offer(job_offer))
 
+        return questions
+
+    except LLMError:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de la génération des questions: {str(e)}")
-        return ['error'] 
\ No newline at end of file
+        return ['error']
+
+def candidature_cv_text(candidature):
+    """Texte du CV d'une candidature (chaîne vide si absent ou illisible)."""
+    cv_path = candidature.get("cv_path")
+    if not cv_path:
+        return ""
+    try:
+        with open(cv_path, 'rb') as f:
+            return extract_text_from_pdf(f.read())
+    except OSError as e:
+        logger.error(f"CV illisible pour la candidature {candidature.get('_id')}: {str(e)}")
+        return ""
+
+def pregeneration_policy(offre):
+    """Politique de pré-génération des questions d'une offre : (mode, N)."""
+    mode = offre.get("pregeneration_questions") or QUESTIONS_PREGEN_POLICY
+    if mode not in PREGENERATION_POLICIES:
+        mode = PREGENERATION_TOP_N
+    try:
+        top_n = int(offre.get("pregeneration_top_n") or QUESTIONS_PREGEN_TOP_N)
+    except (TypeError, ValueError):
+        top_n = QUESTIONS_PREGEN_TOP_N
+    return mode, top_n
+
+def adequation_score(cv_text, offre):
+    """Part des compétences requises de l'offre citées dans le CV (0 à 1)."""
+    competences = offre.get("competences_requises") or offre.get("questions_ids") or []
+    competences = [c.strip().lower() for c in competences if isinstance(c, str) and c.strip()]
+    if not competences:
+        return 0.0
+    text = cv_text.lower()
+    return round(sum(1 for c in competences if c in text) / len(competences), 3)
+
+def schedule_questions_pregeneration(db, candidature_id, offre):
+    """Met en file la pré-génération des questions d'une nouvelle candidature.
+
+    N'échoue jamais : la candidature est déjà enregistrée et, sans
+    pré-génération, les questions sont générées à l'acceptation.
+    """
+    try:
+        mode, _ = pregeneration_policy(offre)
+        if mode == PREGENERATION_JAMAIS:
+            return None
+        return enqueue(
+            db,
+            QUESTIONS_JOB_TYPE,
+            {"candidature_id": str(candidature_id)},
+            priority=QUESTIONS_JOB_PRIORITY,
+            dedupe_key=f"questions:{candidature_id}"
+        )
+    except Exception as e:
+        logger.error(f"Pré-génération des questions non planifiée pour {candidature_id}: {str(e)}")
+        return None
+
+@job_handler(QUESTIONS_JOB_TYPE, max_concurrency=QUESTIONS_PREGEN_CONCURRENCY)
+def pregenerate_questions_job(payload, job):
+    """Pré-génère les questions d'entretien d'une candidature (exécuté par un worker).
+
+    Avec la politique top_n, seules les N candidatures de l'offre dont le CV
+    couvre le mieux les compétences requises sont traitées.
+    """
+    db = current_app.mongo
+    candidature_id = payload["candidature_id"]
+
+    candidature = db[CANDIDATURES_COLLECTION].find_one({"_id": ObjectId(candidature_id)})
+    if not candidature:
+        return {"ignore": "candidature introuvable"}
+    if get_stored_questions(candidature_id):
+        return {"ignore": "questions déjà générées"}
+
+    offre = db[OFFRES_COLLECTION].find_one({"_id": ObjectId(candidature["offre_id"])})
+    if not offre:
+        return {"ignore": "offre introuvable"}
+    mode, top_n = pregeneration_policy(offre)
+    if mode == PREGENERATION_JAMAIS:
+        return {"ignore": "pré-génération désactivée pour l'offre"}
+
+    cv_text = candidature_cv_text(candidature)
+    if mode == PREGENERATION_TOP_N:
+        score = adequation_score(cv_text, offre)
+        db[CANDIDATURES_COLLECTION].update_one(
+            {"_id": candidature["_id"]},
+            {"$set": {"score_adequation": score}}
+        )
+        # Rang parmi les candidatures déjà évaluées ; à score égal, la plus ancienne passe devant
+        ahead = db[CANDIDATURES_COLLECTION].count_documents({
+            "offre_id": candidature["offre_id"],
+            "$or": [
+                {"score_adequation": {"$gt": score}},
+                {"score_adequation": score, "_id": {"$lt": candidature["_id"]}}
+            ]
+        }, limit=top_n)
+        if ahead >= top_n:
+            return {"ignore": f"hors des {top_n} candidatures les plus adéquates", "score_adequation": score}
+
+    questions = generate_interview_questions(cv_text, offre, candidature_id, str(offre["_id"]))
+    if questions == ['error']:
+        raise RuntimeError("Échec de la génération des questions")
+    logger.info(f"Questions pré-générées pour la candidature {candidature_id}")
+    return {"questions": len(questions)}
@@ -7,6 +7,9 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from middleware import require_auth
+from .entretiens_questions import PREGENERATION_POLICIES, QUESTION_BANK_FIELD, pregeneration_policy
+from prompt_builder import OFFER_PROMPT_FIELDS
+from video_store import CAPTURE_MODES, offer_capture_mode
 import os
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,6 +23,24 @@ USERS_COLLECTION = 'utilisateurs'
 CANDIDATURES_COLLECTION = 'candidatures'
 RECRUTEURS_COLLECTION = 'recruteurs'
 
+def validate_pregeneration(data):
+    """Vérifie la politique de pré-génération des questions. Retourne un
+    message d'erreur ou None."""
+    policy = data.get("pregeneration_questions")
+    if policy is not None and policy not in PREGENERATION_POLICIES:
+        return f"Politique de pré-génération invalide. Valeurs autorisées: {list(PREGENERATION_POLICIES)}"
+    top_n = data.get("pregeneration_top_n")
+    if top_n is not None and (not isinstance(top_n, int) or isinstance(top_n, bool) or top_n < 1):
+        return "pregeneration_top_n doit être un entier positif"
+    return None
+
+def validate_capture_mode(data):
+    """Vérifie le mode de capture des entretiens. Retourne un message d'erreur ou None."""
+    capture_mode = data.get("capture_mode")
+    if capture_mode is not None and capture_mode not in CAPTURE_MODES:
+        return f"Mode de capture invalide. Valeurs autorisées: {list(CAPTURE_MODES)}"
+    return None
+
 # Configure CORS
 CORS(offres_recruteur_bp, 
      resources={r"/*": {"origins": "http://localhost:3000"}},
@@ -67,6 +88,7 @@ def get_jwt_manager():
 
 # Helper function to format job offer response
 def format_offre(offre):
+    pregeneration, top_n = pregeneration_policy(offre)
     return {
         "id": str(offre["_id"]),
         "titre": str(offre.get("titre", "Titre non spécifié")),
@@ -79,7 +101,9 @@ def format_offre(offre):
         "date_maj": offre.get("date_maj", datetime.datetime.utcnow()).isoformat() + "Z",
         "questions_ids": offre.get("competences_requises", []),
         "candidature_ids": [str(cid) for cid in offre.get("candidature_ids", [])],
-        
+        "pregeneration_questions": pregeneration,
+        "pregeneration_top_n": top_n,
+        "capture_mode": offer_capture_mode(offre),
     }
 
 # Route to fetch all job offers
@@ -286,6 +310,14 @@ def create_offre(auth_payload):
             if field not in data:
                 return jsonify({"error": f"Champ obligatoire manquant: {field}"}), 400
                 
+        pregeneration_error = validate_pregeneration(data)
+        if pregeneration_error:
+            return jsonify({"error": pregeneration_error}), 400
+
+        capture_mode_error = validate_capture_mode(data)
+        if capture_mode_error:
+            return jsonify({"error": capture_mode_error}), 400
+
         offre = {
             "titre": data["titre"],
             "description": data["description"],
@@ -299,6 +331,9 @@ def create_offre(auth_payload):
             
             "candidature_ids": []
         }
+        for field in ("pregeneration_questions", "pregeneration_top_n", "capture_mode"):
+            if data.get(field) is not None:
+                offre[field] = data[field]
         
         offres_collection = db[OFFRES_COLLECTION]
         result = offres_collection.insert_one(offre)
@@ -364,9 +399,17 @@ def update_offre(auth_payload, id):
             logger.info(f"Offre non trouvée pour ID: {id} ou n'appartient pas au recruteur: {recruteur_id}")
             return jsonify({"error": "Offre non trouvée ou accès non autorisé"}), 404
             
+        pregeneration_error = validate_pregeneration(data)
+        if pregeneration_error:
+            return jsonify({"error": pregeneration_error}), 400
+
+        capture_mode_error = validate_capture_mode(data)
+        if capture_mode_error:
+            return jsonify({"error": capture_mode_error}), 400
+
         update_data = {}
         allowed_fields = ["titre", "description", "localisation", "departement", 
-                         "questions_ids"]
+                         "questions_ids", "pregeneration_questions", "pregeneration_top_n", "capture_mode"]
                          
         for field in allowed_fields:
             if field in data:
@@ -377,9 +420,14 @@ def update_offre(auth_payload, id):
         if "entreprise" in data or "recruteur_id" in data:
             logger.warning(f"Tentative de modification de l'entreprise ou du recruteur_id pour l'offre {id}")
             
+        update = {"$set": update_data}
+        # La banque de questions de l'offre est régénérée si les champs du prompt changent
+        if any(field in update_data for field in OFFER_PROMPT_FIELDS):
+            update["$unset"] = {QUESTION_BANK_FIELD: ""}
+
         offres_collection.update_one(
             {"_id": ObjectId(id)},
-            {"$set": update_data}
+            update
         )
         
         updated_offre = offres_collection.find_one({"_id": ObjectId(id)})
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import logging
+import queue
+import random
+
+import httpx
+
+from config.config import SCORING_CONCURRENCY, SCORING_MAX_ATTEMPTS, LLM_MODEL
+from llm_client import llm_client
+from llm_cache import llm_cache, response_content, completion_response, CACHE_USE, CACHE_REFRESH, CACHE_BYPASS
+from llm_resilience import LLMError
+from incremental_json import IncrementalJSONParser
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCORING_MODEL = LLM_MODEL
+SYSTEM_PROMPT = "Tu es un expert en recrutement qui évalue les entretiens d'embauche."
+
+QUESTION_MAX_TOKENS = 400
+AGGREGATE_MAX_TOKENS = 500
+RETRY_BASE_SECONDS = 1.0
+
+# Délai sans événement au-delà duquel stream_interview() signale qu'il attend
+STREAM_PING_SECONDS = 5.0
+
+
+class ScoringError(Exception):
+    """Réponse du LLM inexploitable pour une question ou pour la synthèse."""
+
+
+def extract_json(text):
+    """Extrait et décode le premier objet JSON présent dans une réponse texte."""
+    start_index = text.find('{')
+    end_index = text.rfind('}') + 1
+    if start_index == -1 or end_index == 0:
+        raise ScoringError("Format de réponse invalide - aucun JSON trouvé")
+    try:
+        return json.loads(text[start_index:end_index])
+    except json.JSONDecodeError as e:
+        raise ScoringError(f"JSON invalide: {str(e)}")
+
+
+def _clamp_score(value):
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ScoringError(f"Score invalide: {value!r}")
+    return max(0.0, min(10.0, score))
+
+
+def _question_prompt(question, answer):
+    return f"""En tant qu'expert en recrutement, évaluez la réponse du candidat à cette question d'entretien.
+
+Question : {question}
+
+Réponse du candidat :
+{answer or "(aucune réponse)"}
+
+Répondez uniquement avec un JSON au format suivant :
+{{
+    "analyse": "Analyse concise de la réponse",
+    "score": 7
+}}"""
+
+
+def _aggregate_prompt(analyses):
+    resume = [
+        {"question": a["question"], "analyse": a["analyse"], "score": a["score"]}
+        for a in analyses if a.get("score") is not None
+    ]
+    return f"""En tant qu'expert en recrutement, faites la synthèse de cet entretien à partir de l'évaluation de chaque réponse.
+
+Évaluations par question :
+{json.dumps(resume, indent=2, ensure_ascii=False)}
+
+Répondez uniquement avec un JSON au format suivant :
+{{
+    "score_global": 7,
+    "points_forts": ["Point fort 1", "Point fort 2"],
+    "conclusion": "Conclusion sur l'adéquation du candidat"
+}}"""
+
+
+class InterviewScorer:
+    """Évalue un entretien question par question, puis en fait la synthèse.
+
+    Chaque question fait l'objet d'une requête courte, exécutée en parallèle
+    dans la limite de `concurrency` requêtes simultanées. Une question en
+    échec est réessayée seule ; la synthèse (score global, points forts,
+    conclusion) est demandée en une dernière requête sur les analyses.
+    `stream_interview()` produit en plus la progression au fil de l'eau.
+    """
+
+    def __init__(self, client=None, model=SCORING_MODEL, concurrency=None, max_attempts=None,
+                 db=None, cache_mode=CACHE_USE, tenant=None):
+        self.client = client or llm_client
+        self.tenant = tenant
+        self.db = db
+        self.cache_mode = cache_mode
+        self.model = model
+        self.concurrency = concurrency or SCORING_CONCURRENCY
+        self.max_attempts = max_attempts or SCORING_MAX_ATTEMPTS
+
+    def _payload(self, prompt, max_tokens, temperature=0.3):
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+    async def _chat(self, prompt, max_tokens, temperature=0.3, retry=False):
+        payload = self._payload(prompt, max_tokens, temperature)
+
+        async def fetch():
+            response = await self.client.apost(payload, tenant=self.tenant)
+            if response.status_code != 200:
+                raise ScoringError(f"Erreur API Groq (status {response.status_code}): {response.text[:200]}")
+            return response.json()
+
+        # Une réentrée sur le même entretien réutilise les évaluations déjà
+        # obtenues ; une nouvelle tentative ne doit pas relire une réponse
+        # rejetée, elle la remplace
+        mode = CACHE_REFRESH if retry and self.cache_mode == CACHE_USE else self.cache_mode
+        result = await llm_cache.acompletion(
+            self.db, payload, fetch, mode=mode,
+            validate=lambda r: '{' in response_content(r)
+        )
+        return response_content(result).strip()
+
+    async def _with_retries(self, label, call):
+        # Les erreurs réseau, 429 et 5xx sont déjà réessayées par le client LLM :
+        # ici, seules les réponses inexploitables sont redemandées
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await call(attempt > 1)
+            except LLMError:
+                raise
+            except (ScoringError, httpx.HTTPError, KeyError, ValueError) as e:
+                last_error = e
+                logger.warning(f"{label}: tentative {attempt}/{self.max_attempts} échouée: {str(e)}")
+                if attempt < self.max_attempts:
+                    delay = RETRY_BASE_SECONDS * (2 ** (attempt - 1))
+                    await asyncio.sleep(delay + random.uniform(0, delay / 2))
+        raise ScoringError(f"{label}: {str(last_error)}")
+
+    @staticmethod
+    def _question_result(question, answer, text):
+        result = extract_json(text)
+        return {
+            "question": question,
+            "reponse": answer,
+            "analyse": str(result.get("analyse", "")),
+            "score": _clamp_score(result.get("score"))
+        }
+
+    async def score_question(self, semaphore, index, qa_pair):
+        """Évalue une réponse. En cas d'échec définitif (réponse inexploitable,
+        LLM saturé ou indisponible), le score vaut None."""
+        question = qa_pair.get("question", "")
+        answer = qa_pair.get("answer", "")
+
+        async def call(retry):
+            async with semaphore:
+                text = await self._chat(_question_prompt(question, answer), QUESTION_MAX_TOKENS, retry=retry)
+            return self._question_result(question, answer, text)
+
+        try:
+            return await self._with_retries(f"Question {index}", call)
+        except (ScoringError, LLMError) as e:
+            # LLM saturé ou indisponible : seule cette question est en échec
+            logger.error(f"Évaluation impossible pour la question {index}: {str(e)}")
+            return self._failed_result(question, answer, e)
+
+    @staticmethod
+    def _failed_result(question, answer, error):
+        return {
+            "question": question,
+            "reponse": answer,
+            "analyse": "Évaluation indisponible pour cette réponse",
+            "score": None,
+            "erreur": str(error)
+        }
+
+    async def aggregate(self, analyses):
+        """Synthèse de l'entretien. Le score global retombe sur la moyenne en cas d'échec."""
+        scores = [a["score"] for a in analyses if a.get("score") is not None]
+        moyenne = round(sum(scores) / len(scores), 1) if scores else 0
+
+        async def call(retry):
+            text = await self._chat(_aggregate_prompt(analyses), AGGREGATE_MAX_TOKENS, retry=retry)
+            result = extract_json(text)
+            return {
+                "score_global": _clamp_score(result.get("score_global", moyenne)),
+                "points_forts": [str(p) for p in result.get("points_forts", [])],
+                "conclusion": str(result.get("conclusion", ""))
+            }
+
+        if not scores:
+            return {"score_global": 0, "points_forts": [], "conclusion": ""}
+        try:
+            return await self._with_retries("Synthèse", call)
+        except (ScoringError, LLMError) as e:
+            logger.error(f"Synthèse impossible, score global calculé par moyenne: {str(e)}")
+            return {"score_global": moyenne, "points_forts": [], "conclusion": ""}
+
+    async def stream_question(self, semaphore, index, qa_pair, emit):
+        """Évalue une réponse en flux : `emit` reçoit l'analyse au fil de sa génération.
+
+        Une réponse en cache est transmise d'un bloc ; une réponse en flux
+        inexploitable est redemandée par score_question(). Si le LLM est
+        saturé ou indisponible, le score de la question vaut None.
+        """
+        question = qa_pair.get("question", "")
+        answer = qa_pair.get("answer", "")
+        emit("question", {"index": index, "question": question})
+
+        payload = self._payload(_question_prompt(question, answer), QUESTION_MAX_TOKENS)
+        use_cache = llm_cache.enabled and self.cache_mode != CACHE_BYPASS
+        key = llm_cache.make_key(payload)
+        text, streamed = None, False
+        if use_cache and self.cache_mode == CACHE_USE:
+            cached = await llm_cache.aget(self.db, key)
+            if cached is not None:
+                text = response_content(cached)
+
+        error = None
+        if text is None:
+            parser = IncrementalJSONParser()
+            chunks = []
+            try:
+                async with semaphore:
+                    async for delta in self.client.astream(payload, tenant=self.tenant):
+                        chunks.append(delta)
+                        parser.feed(delta)
+                        analyse = parser.string_delta("analyse")
+                        if analyse:
+                            emit("analyse", {"index": index, "delta": analyse})
+                text, streamed = "".join(chunks), True
+            except LLMError as e:
+                error = e
+
+        if error is not None:
+            # LLM saturé ou indisponible : seule cette question est en échec
+            logger.error(f"Évaluation en flux impossible pour la question {index}: {str(error)}")
+            result = self._failed_result(question, answer, error)
+        else:
+            try:
+                result = self._question_result(question, answer, text)
+                if streamed and use_cache:
+                    await llm_cache.aset(self.db, key, payload, completion_response(text, self.model))
+            except ScoringError as e:
+                logger.warning(f"Question {index}: réponse en flux inexploitable ({str(e)}), nouvelle évaluation")
+                result = await self.score_question(semaphore, index, qa_pair)
+        emit("score", {"index": index, "question": question, "score": result["score"], "analyse": result["analyse"]})
+        return result
+
+    @staticmethod
+    def _evaluation(analyses, synthese):
+        questions_en_echec = [index for index, a in enumerate(analyses) if a.get("score") is None]
+        return {
+            "questions_analysees": list(analyses),
+            "score_global": synthese["score_global"],
+            "points_forts": synthese["points_forts"],
+            "conclusion": synthese["conclusion"],
+            "questions_en_echec": questions_en_echec
+        }
+
+    async def score_interview_async(self, qa_pairs):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        analyses = await asyncio.gather(*[
+            self.score_question(semaphore, index, qa_pair)
+            for index, qa_pair in enumerate(qa_pairs)
+        ])
+        synthese = await self.aggregate(analyses)
+        return self._evaluation(analyses, synthese)
+
+    async def stream_interview_async(self, qa_pairs, emit):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        analyses = await asyncio.gather(*[
+            self.stream_question(semaphore, index, qa_pair, emit)
+            for index, qa_pair in enumerate(qa_pairs)
+        ])
+        emit("synthese_en_cours", {"questions": len(analyses)})
+        synthese = await self.aggregate(analyses)
+        emit("synthese", synthese)
+        return self._evaluation(analyses, synthese)
+
+    def score_interview(self, qa_pairs):
+        """Point d'entrée synchrone, utilisable depuis une route ou un job.
+
+        La coroutine s'exécute sur la boucle du client LLM partagé, dont le
+        pool de connexions est conservé d'un rapport à l'autre.
+        """
+        return self.client.run(self.score_interview_async(qa_pairs))
+
+    def stream_interview(self, qa_pairs):
+        """Point d'entrée synchrone en flux : produit des couples (événement, données).
+
+        Les événements sont question, analyse (fragment de texte), score,
+        synthese_en_cours, synthese, et ping après STREAM_PING_SECONDS sans
+        activité. Le dernier couple est ("evaluation", résultat complet). Fermer
+        le générateur (client déconnecté) annule l'évaluation en cours.
+        """
+        events = queue.Queue()
+        finished = object()
+        future = self.client.submit(
+            self.stream_interview_async(qa_pairs, lambda event, data: events.put((event, data)))
+        )
+        future.add_done_callback(lambda f: events.put(finished))
+        try:
+            while True:
+                try:
+                    item = events.get(timeout=STREAM_PING_SECONDS)
+                except queue.Empty:
+                    yield "ping", {}
+                    continue
+                if item is finished:
+                    break
+                yield item
+            yield "evaluation", future.result()
+        finally:
+            if not future.done():
+                future.cancel()
@@ -0,0 +1,149 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from config.config import SINGLE_FLIGHT_LEASE_SECONDS, SINGLE_FLIGHT_WAIT_SECONDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEASES_COLLECTION = 'generation_leases'
+
+# Intervalle de vérification du résultat pendant l'attente d'un autre processus
+POLL_SECONDS = 0.5
+
+
+class SingleFlightTimeout(Exception):
+    """Le résultat d'une génération menée ailleurs n'est pas arrivé à temps."""
+
+    def __init__(self, key):
+        super().__init__(f"Génération déjà en cours pour {key}")
+        self.key = key
+
+
+class SingleFlight:
+    """Une seule exécution à la fois d'un calcul coûteux par clé.
+
+    Les threads d'un même processus se succèdent sur un verrou local ; entre
+    processus (API, workers), un bail stocké dans `generation_leases` désigne
+    celui qui calcule. Les autres attendent que le résultat soit visible via
+    `lookup` puis le réutilisent. Un bail expiré (processus arrêté en cours de
+    calcul) peut être repris.
+    """
+
+    def __init__(self, lease_seconds=None, wait_seconds=None):
+        self.lease_seconds = lease_seconds or SINGLE_FLIGHT_LEASE_SECONDS
+        self.wait_seconds = wait_seconds or SINGLE_FLIGHT_WAIT_SECONDS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._guard = threading.Lock()
+        # clé -> [verrou, nombre de threads qui l'utilisent]
+        self._locks = {}
+        self._counters = {"executions": 0, "partages": 0, "attentes": 0, "expirations": 0}
+
+    def _count(self, name):
+        with self._guard:
+            self._counters[name] += 1
+
+    @contextmanager
+    def _local_lock(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._locks.pop(key, None)
+
+    def _acquire_lease(self, db, key, token):
+        now = datetime.now(timezone.utc)
+        lease = {
+            "owner": self.owner,
+            "token": token,
+            "expires_at": now + timedelta(seconds=self.lease_seconds)
+        }
+        try:
+            db[LEASES_COLLECTION].insert_one(dict(lease, _id=key))
+            return True
+        except DuplicateKeyError:
+            pass
+        # Reprendre un bail expiré (le TTL Mongo ne le supprime qu'à la minute près)
+        taken = db[LEASES_COLLECTION].find_one_and_update(
+            {"_id": key, "expires_at": {"$lt": now}},
+            {"$set": lease}
+        )
+        if taken:
+            logger.warning(f"Bail expiré de {taken.get('owner')} repris pour {key}")
+            return True
+        return False
+
+    def _release_lease(self, db, key, token):
+        try:
+            db[LEASES_COLLECTION].delete_one({"_id": key, "token": token})
+        except Exception as e:
+            # Le bail expirera de lui-même
+            logger.error(f"Bail {key} non libéré: {str(e)}")
+
+    def do(self, db, key, lookup, compute):
+        """Retourne `lookup()` s'il est déjà disponible, sinon exécute `compute()`
+        une seule fois pour `key` entre tous les threads et processus.
+
+        `lookup` retourne None tant que le résultat n'est pas stocké ; `compute`
+        doit le stocker pour que les appelants en attente le retrouvent. Lève
+        SingleFlightTimeout si un autre processus calcule encore au bout de
+        `wait_seconds`.
+        """
+        with self._local_lock(key):
+            deadline = time.monotonic() + self.wait_seconds
+            waited = False
+            while True:
+                result = lookup()
+                if result is not None:
+                    self._count("partages")
+                    return result
+
+                token = uuid.uuid4().hex
+                if self._acquire_lease(db, key, token):
+                    try:
+                        # Le détenteur précédent a pu terminer entre lookup() et la prise du bail
+                        result = lookup()
+                        if result is not None:
+                            self._count("partages")
+                            return result
+                        self._count("executions")
+                        return compute()
+                    finally:
+                        self._release_lease(db, key, token)
+
+                if not waited:
+                    waited = True
+                    self._count("attentes")
+                    logger.info(f"{key} déjà en cours de génération ailleurs, attente du résultat")
+                if time.monotonic() >= deadline:
+                    self._count("expirations")
+                    raise SingleFlightTimeout(key)
+                time.sleep(POLL_SECONDS)
+
+    def stats(self):
+        with self._guard:
+            return dict(self._counters, cles_actives=len(self._locks))
+
+
+def ensure_indexes(db):
+    """Expiration automatique des baux abandonnés."""
+    db[LEASES_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+
+
+# Create a single instance of SingleFlight
+single_flight = SingleFlight()
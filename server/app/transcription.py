@@ -0,0 +1,380 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from flask import current_app
+from pymongo import ReturnDocument
+
+from config.config import (
+    TRANSCRIPTION_LANGUAGE, TRANSCRIPTION_CHUNK_SECONDS,
+    TRANSCRIPTION_VAD_MARGIN_DB, TRANSCRIPTION_MAX_SEGMENT_SECONDS
+)
+from audio_segments import SAMPLE_RATE, extract_audio, read_audio, plan_parts
+from jobs import enqueue, job_handler, heartbeat, is_last_attempt
+from transcription_cache import ANALYSE, PARTIE, file_sha256, transcription_cache
+from whisper_registry import whisper_registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENTRETIENS_COLLECTION = 'entretiens'
+
+# Transcription des entretiens par les workers
+TRANSCRIPTION_JOB_TYPE = 'transcribe_entretien'
+TRANSCRIPTION_PART_JOB_TYPE = 'transcribe_part'
+TRANSCRIPTION_EN_ATTENTE = 'en_attente'
+TRANSCRIPTION_EN_COURS = 'en_cours'
+TRANSCRIPTION_TERMINE = 'termine'
+TRANSCRIPTION_ECHEC = 'echec'
+
+# Fin de la transcription précédente transmise comme contexte au segment suivant
+PROMPT_TAIL_CHARS = 200
+
+
+def media_absolute_path(media_path):
+    """Chemin d'un média stocké relativement au dossier de l'application."""
+    if os.path.isabs(media_path):
+        return media_path
+    return os.path.join(current_app.root_path, media_path)
+
+
+def extracted_audio_path(entretien_id):
+    """Chemin relatif du WAV 16 kHz mono extrait de la vidéo d'un entretien."""
+    return f"Uploads/audio/entretien_{entretien_id}_16k.wav"
+
+
+def analysis_key(media_sha256, recordings):
+    """Clé de cache du découpage d'un média (réglages de détection et positions des réponses)."""
+    offsets = [
+        [position, recording.get("questionIndex"), recording.get("startOffset"), recording.get("endOffset")]
+        for position, recording in enumerate(recordings or [])
+        if isinstance(recording, dict) and recording.get("startOffset") is not None
+    ]
+    return transcription_cache.make_key(media_sha256, ANALYSE, options={
+        "vad_margin_db": TRANSCRIPTION_VAD_MARGIN_DB,
+        "max_segment_seconds": TRANSCRIPTION_MAX_SEGMENT_SECONDS,
+        "part_seconds": TRANSCRIPTION_CHUNK_SECONDS,
+        "offsets": offsets
+    })
+
+
+def part_key(media_sha256, part):
+    """Clé de cache de la transcription d'une partie (modèle, langue, segments, prompt)."""
+    return transcription_cache.make_key(media_sha256, PARTIE, whisper_registry.model_label(), {
+        "language": TRANSCRIPTION_LANGUAGE,
+        "regions": part["regions"],
+        "prompt": part.get("prompt")
+    })
+
+
+def question_prompt(recordings, position):
+    """La question oriente le vocabulaire de la transcription de la réponse."""
+    if position is None or position >= len(recordings or []) or not isinstance(recordings[position], dict):
+        return None
+    return recordings[position].get("question")
+
+
+def enqueue_transcription(db, entretien_id, media_path, completed_at=None, media_sha256=None):
+    """Met en file la transcription d'un entretien et retourne l'ID du job.
+
+    `media_sha256` est l'empreinte calculée à l'écriture du média : le fichier
+    n'est pas relu dans la requête. Si le découpage et toutes les parties du
+    même média sont déjà en cache, la transcription est écrite directement et
+    aucun job n'est créé (retourne None). Sans empreinte, le worker la calcule.
+    Les entretiens terminés le plus récemment sont transcrits en premier.
+    """
+    completed_at = completed_at or datetime.now(timezone.utc)
+    entretien_id = ObjectId(entretien_id)
+    if media_sha256 and complete_from_cache(db, entretien_id, media_sha256):
+        return None
+
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id},
+        {"$set": {
+            "transcription_statut": TRANSCRIPTION_EN_ATTENTE,
+            "transcription_progression": 0.0
+        }}
+    )
+    return enqueue(
+        db,
+        TRANSCRIPTION_JOB_TYPE,
+        {"entretien_id": str(entretien_id), "media_path": media_path, "media_sha256": media_sha256},
+        dedupe_key=f"transcription:{entretien_id}",
+        rank=completed_at.timestamp()
+    )
+
+
+def complete_from_cache(db, entretien_id, media_sha256):
+    """Termine la transcription depuis le cache si tout y est. Retourne True si c'est le cas."""
+    entretien = db[ENTRETIENS_COLLECTION].find_one({"_id": entretien_id}, {"recordings": 1})
+    if not entretien:
+        return False
+    recordings = entretien.get("recordings")
+    plan = transcription_cache.get(db, analysis_key(media_sha256, recordings))
+    if plan is None:
+        return False
+    results = []
+    for part in plan["parts"]:
+        part = {**part, "prompt": question_prompt(recordings, part.get("position"))}
+        result = transcription_cache.get(db, part_key(media_sha256, part))
+        if result is None:
+            return False
+        results.append((part, result))
+
+    start_transcription(db, entretien_id, media_sha256, plan)
+    for part, result in results:
+        record_part_result(db, entretien_id, part, result)
+    logger.info(f"Transcription de l'entretien {entretien_id} servie depuis le cache ({len(results)} partie(s))")
+    return True
+
+
+def start_transcription(db, entretien_id, media_sha256, plan, audio_path=None):
+    """Passe la transcription en cours pour les parties de `plan`."""
+    now = datetime.now(timezone.utc)
+    state = {
+        "transcription_statut": TRANSCRIPTION_EN_COURS,
+        "transcription_progression": 0.0,
+        "transcription_debut": now,
+        "transcription_media_sha256": media_sha256,
+        "transcription_audio_path": audio_path,
+        "transcription_duree_audio": plan["duration"],
+        "transcription_duree_parole": plan["speech_seconds"],
+        "transcription_parties_total": len(plan["parts"]),
+        "transcription_parties": {},
+        "transcription_parties_terminees": []
+    }
+    if not plan["parts"]:
+        # Aucune parole détectée
+        state.update({
+            "transcription": "",
+            "transcription_segments": [],
+            "transcription_statut": TRANSCRIPTION_TERMINE,
+            "transcription_progression": 1.0,
+            "transcription_fin": now
+        })
+    db[ENTRETIENS_COLLECTION].update_one({"_id": entretien_id}, {"$set": state})
+
+
+def transcribe_regions(audio_path, regions, model_name=None, prompt=None, on_region=None, reader=read_audio):
+    """Transcrit les segments de parole `regions` ([début, fin] en secondes)
+    d'un WAV 16 kHz (ou du fichier lu par `reader`) ; les horodatages restent
+    relatifs à tout l'enregistrement."""
+    texts = []
+    segments = []
+    for start, end in regions:
+        result = whisper_registry.transcribe(
+            reader(audio_path, start, end), model_name,
+            language=TRANSCRIPTION_LANGUAGE,
+            initial_prompt=prompt
+        )
+        for segment in result.get("segments", []):
+            segments.append({
+                "start": round(segment["start"] + start, 2),
+                "end": round(segment["end"] + start, 2),
+                "text": segment["text"].strip()
+            })
+        text = result.get("text", "").strip()
+        if text:
+            texts.append(text)
+            prompt = text[-PROMPT_TAIL_CHARS:]
+        if on_region:
+            on_region()
+    return {"text": " ".join(texts), "segments": segments}
+
+
+def _mark_failed(db, entretien_id, job):
+    # Avant la dernière tentative, le statut ne change pas : les autres
+    # parties en cours doivent encore pouvoir enregistrer leur résultat
+    if not is_last_attempt(job):
+        return
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id},
+        {"$set": {"transcription_statut": TRANSCRIPTION_ECHEC}}
+    )
+
+
+@job_handler(TRANSCRIPTION_JOB_TYPE)
+def transcribe_entretien_job(payload, job):
+    """Prépare la transcription d'un entretien : extraction de l'audio,
+    détection de la parole et découpage en parties transcrites en parallèle
+    par les workers (une partie par réponse quand les positions sont connues).
+    Le découpage et les parties déjà en cache ne sont pas recalculés.
+    """
+    db = current_app.mongo
+    entretien_id = ObjectId(payload["entretien_id"])
+    path = media_absolute_path(payload["media_path"])
+    if not os.path.isfile(path):
+        logger.error(f"Média introuvable pour la transcription de {entretien_id}: {path}")
+        db[ENTRETIENS_COLLECTION].update_one(
+            {"_id": entretien_id},
+            {"$set": {"transcription_statut": TRANSCRIPTION_ECHEC}}
+        )
+        return {"ignore": "média introuvable"}
+
+    entretien = db[ENTRETIENS_COLLECTION].find_one({"_id": entretien_id}, {"recordings": 1})
+    if not entretien:
+        return {"ignore": "entretien supprimé"}
+    recordings = entretien.get("recordings")
+
+    started = time.monotonic()
+    audio_path = extracted_audio_path(entretien_id)
+
+    def extract():
+        os.makedirs(os.path.dirname(media_absolute_path(audio_path)), exist_ok=True)
+        return extract_audio(path, media_absolute_path(audio_path))
+
+    try:
+        media_sha256 = payload.get("media_sha256") or file_sha256(path)
+        key = analysis_key(media_sha256, recordings)
+        plan = transcription_cache.get(db, key)
+        if plan is None:
+            audio = read_audio(extract())
+            parts, speech_seconds = plan_parts(audio, recordings, TRANSCRIPTION_CHUNK_SECONDS)
+            plan = {"parts": parts, "speech_seconds": speech_seconds,
+                    "duration": round(len(audio) / SAMPLE_RATE, 2)}
+            del audio
+            transcription_cache.set(db, key, media_sha256, ANALYSE, None, plan)
+
+        parts = [{**part, "prompt": question_prompt(recordings, part.get("position"))} for part in plan["parts"]]
+        cached = [transcription_cache.get(db, part_key(media_sha256, part)) for part in parts]
+        if None in cached:
+            extract()
+    except Exception:
+        _mark_failed(db, entretien_id, job)
+        raise
+
+    start_transcription(db, entretien_id, media_sha256, plan, audio_path)
+    queued = 0
+    for part, result in zip(parts, cached):
+        if result is not None:
+            record_part_result(db, entretien_id, part, result)
+            continue
+        enqueue(
+            db,
+            TRANSCRIPTION_PART_JOB_TYPE,
+            {"entretien_id": str(entretien_id), "audio_path": audio_path,
+             "media_sha256": media_sha256, **part},
+            priority=job.get("priority", 0),
+            dedupe_key=f"transcription:{entretien_id}:{part['index']}",
+            rank=job.get("rank")
+        )
+        queued += 1
+    if not queued:
+        # Tout venait du cache : l'audio extrait est inutile
+        remove_extracted_audio(audio_path)
+    logger.info(f"Entretien {entretien_id}: {plan['speech_seconds']:.0f}s de parole sur {plan['duration']:.0f}s, "
+                f"{queued} partie(s) en file sur {len(parts)} ({time.monotonic() - started:.1f}s de préparation)")
+    return {"parties": len(parts), "en_file": queued, "duree_audio": plan["duration"],
+            "duree_parole": plan["speech_seconds"]}
+
+
+@job_handler(TRANSCRIPTION_PART_JOB_TYPE)
+def transcribe_part_job(payload, job):
+    """Transcrit une partie d'entretien ; la dernière partie terminée assemble
+    la transcription complète."""
+    db = current_app.mongo
+    entretien_id = ObjectId(payload["entretien_id"])
+
+    started = time.monotonic()
+    try:
+        result = transcribe_regions(
+            media_absolute_path(payload["audio_path"]), payload["regions"],
+            prompt=payload.get("prompt"), on_region=lambda: heartbeat(db, job)
+        )
+    except Exception:
+        _mark_failed(db, entretien_id, job)
+        raise
+    elapsed = time.monotonic() - started
+
+    if payload.get("media_sha256"):
+        transcription_cache.set(db, part_key(payload["media_sha256"], payload), payload["media_sha256"],
+                                PARTIE, whisper_registry.model_label(), result)
+    if not record_part_result(db, entretien_id, payload, result):
+        # Entretien supprimé, ou transcription déjà assemblée (partie rejouée)
+        return {"ignore": "transcription inactive"}
+
+    speech = sum(end - start for start, end in payload["regions"])
+    return {"duree_parole": round(speech, 2), "secondes": round(elapsed, 2),
+            "rtf": round(elapsed / speech, 3) if speech else None}
+
+
+def record_part_result(db, entretien_id, part, result):
+    """Enregistre le résultat d'une partie ; la dernière enregistrée assemble
+    la transcription. Retourne False si la transcription n'est plus en cours."""
+    position = part.get("position")
+    if position is not None:
+        # Réponse transcrite rattachée à recordings[questionIndex]
+        db[ENTRETIENS_COLLECTION].update_one(
+            {"_id": entretien_id, f"recordings.{position}.questionIndex": part.get("questionIndex")},
+            {"$set": {
+                f"recordings.{position}.transcription": result["text"],
+                f"recordings.{position}.transcription_segments": result["segments"]
+            }}
+        )
+    entretien = db[ENTRETIENS_COLLECTION].find_one_and_update(
+        {"_id": entretien_id, "transcription_statut": TRANSCRIPTION_EN_COURS},
+        {
+            "$set": {f"transcription_parties.{part['index']}": {
+                "questionIndex": part.get("questionIndex"),
+                "text": result["text"],
+                "segments": result["segments"]
+            }},
+            "$addToSet": {"transcription_parties_terminees": part["index"]}
+        },
+        projection={"transcription_parties_total": 1, "transcription_parties_terminees": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not entretien:
+        return False
+
+    done = len(entretien.get("transcription_parties_terminees", []))
+    total = entretien.get("transcription_parties_total") or 1
+    db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "transcription_statut": TRANSCRIPTION_EN_COURS},
+        {"$max": {"transcription_progression": round(done / total, 3)}}
+    )
+    if done >= total:
+        assemble_transcription(db, entretien_id)
+    return True
+
+
+def remove_extracted_audio(audio_path):
+    if audio_path:
+        try:
+            os.remove(media_absolute_path(audio_path))
+        except OSError:
+            pass
+
+
+def assemble_transcription(db, entretien_id):
+    """Réunit les parties dans l'ordre de l'enregistrement et termine la transcription."""
+    entretien = db[ENTRETIENS_COLLECTION].find_one(
+        {"_id": entretien_id},
+        {"transcription_parties": 1, "transcription_audio_path": 1}
+    )
+    parties = entretien.get("transcription_parties") or {}
+    ordered = [parties[key] for key in sorted(parties, key=int)]
+    now = datetime.now(timezone.utc)
+    result = db[ENTRETIENS_COLLECTION].update_one(
+        {"_id": entretien_id, "transcription_statut": TRANSCRIPTION_EN_COURS},
+        {
+            "$set": {
+                "transcription": " ".join(part["text"] for part in ordered if part["text"]),
+                "transcription_segments": [segment for part in ordered for segment in part["segments"]],
+                "transcription_modele": whisper_registry.model_label(),
+                "transcription_statut": TRANSCRIPTION_TERMINE,
+                "transcription_progression": 1.0,
+                "transcription_fin": now,
+                "date_maj": now
+            },
+            "$unset": {"transcription_parties": ""}
+        }
+    )
+    if not result.modified_count:
+        return
+    # L'audio extrait n'est utile qu'aux parties
+    remove_extracted_audio(entretien.get("transcription_audio_path"))
+    logger.info(f"Transcription de l'entretien {entretien_id} terminée ({len(ordered)} partie(s))")
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING
+from pymongo.errors import PyMongoError
+
+from config.config import TRANSCRIPTION_CACHE_ENABLED, TRANSCRIPTION_CACHE_TTL_SECONDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_CACHE_COLLECTION = 'transcription_cache'
+
+# Portées des résultats en cache
+ANALYSE = "analyse"  # détection de parole et découpage en parties
+PARTIE = "partie"    # transcription d'une partie, avec les segments horodatés
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 d'un fichier lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Résultats de transcription et d'analyse audio adressés par le média.
+
+    La clé est le SHA-256 du contenu du média, de la portée, du modèle et des
+    options (langue, segments, prompt, réglages de la détection de parole) :
+    un même enregistrement renvoyé, rejoué ou retraité n'est pas retranscrit.
+    Les résultats sont stockés dans MongoDB avec expiration par index TTL.
+    """
+
+    def __init__(self, ttl_seconds=None, enabled=None):
+        self.ttl_seconds = ttl_seconds or TRANSCRIPTION_CACHE_TTL_SECONDS
+        self.enabled = TRANSCRIPTION_CACHE_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    @staticmethod
+    def make_key(media_sha256, scope, model=None, options=None):
+        material = json.dumps({
+            "media": media_sha256,
+            "scope": scope,
+            "model": model,
+            "options": options or {}
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, db, key):
+        if not self.enabled:
+            return None
+        try:
+            doc = db[TRANSCRIPTION_CACHE_COLLECTION].find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"result": 1}
+            )
+        except PyMongoError as e:
+            logger.error(f"Cache de transcription indisponible en lecture: {str(e)}")
+            return None
+        with self._lock:
+            if doc:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return doc["result"] if doc else None
+
+    def set(self, db, key, media_sha256, scope, model, result):
+        if not self.enabled:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            db[TRANSCRIPTION_CACHE_COLLECTION].update_one(
+                {"_id": key},
+                {"$set": {
+                    "media_sha256": media_sha256,
+                    "scope": scope,
+                    "model": model,
+                    "result": result,
+                    "date_creation": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds)
+                }},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.error(f"Cache de transcription indisponible en écriture: {str(e)}")
+            return
+        with self._lock:
+            self.stored += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stored": self.stored
+            }
+
+
+def ensure_indexes(db):
+    """Expiration automatique des résultats et recherche par média."""
+    db[TRANSCRIPTION_CACHE_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+    db[TRANSCRIPTION_CACHE_COLLECTION].create_index([("media_sha256", ASCENDING)])
+
+
+# Create a single instance of TranscriptionCache
+transcription_cache = TranscriptionCache()
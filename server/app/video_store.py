@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from config.config import INTERVIEW_CAPTURE_MODE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VIDEOS_COLLECTION = 'videos'
+ENTRETIENS_COLLECTION = 'entretiens'
+OFFRES_COLLECTION = 'offres'
+
+# Mode de capture d'un entretien, défini par offre (`capture_mode`)
+CAPTURE_VIDEO = "video"
+CAPTURE_AUDIO = "audio"
+CAPTURE_MODES = (CAPTURE_VIDEO, CAPTURE_AUDIO)
+# Extensions acceptées par mode ; .weba : webm audio seul (MediaRecorder
+# audio/webm;codecs=opus), .opus : Ogg Opus
+CAPTURE_EXTENSIONS = {
+    CAPTURE_VIDEO: (".webm",),
+    CAPTURE_AUDIO: (".weba", ".opus", ".ogg", ".webm")
+}
+
+# Les documents `videos` ne contiennent que des métadonnées ; les octets sont
+# sur disque (`video_path`, relatif au dossier de l'application)
+VIDEO_METADATA_PROJECTION = {
+    "entretien_id": 1,
+    "video_url": 1,
+    "video_path": 1,
+    "size": 1,
+    "sha256": 1,
+    "created_at": 1
+}
+
+# Caractères base64 décodés à la fois (multiple de 4) : la mémoire ajoutée
+# reste bornée à un bloc au lieu d'une copie décodée de toute la vidéo
+BASE64_CHUNK_CHARS = 4 * 256 * 1024
+# Octets copiés à la fois depuis un fichier reçu
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def ensure_indexes(db):
+    """Index de recherche des vidéos par entretien."""
+    db[VIDEOS_COLLECTION].create_index([("entretien_id", ASCENDING)])
+
+
+def write_base64_file(data, path, chunk_chars=BASE64_CHUNK_CHARS):
+    """Décode `data` (base64, str ou bytes) par blocs dans `path`.
+
+    Le fichier est écrit à côté de sa destination puis renommé : un lecteur
+    ne voit jamais de vidéo partielle. Retourne (taille, sha256).
+    """
+    if isinstance(data, bytes):
+        data = data.decode("ascii")
+    # Préfixe data URL éventuel (data:video/webm;base64,...)
+    if data.startswith("data:"):
+        data = data[data.index(",") + 1:]
+    # Les blocs doivent rester alignés sur 4 caractères
+    if any(c in data for c in " \r\n\t"):
+        data = "".join(data.split())
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for start in range(0, len(data), chunk_chars):
+                chunk = base64.b64decode(data[start:start + chunk_chars], validate=True)
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
+
+
+def write_stream_file(stream, path, chunk_size=STREAM_CHUNK_SIZE):
+    """Copie `stream` (fichier reçu) dans `path` en calculant son empreinte
+    au passage : le fichier n'a pas à être relu pour le cache des
+    transcriptions. Même écriture atomique que write_base64_file. Retourne
+    (taille, sha256).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        os.replace(temp_path, path)
+    except Exception:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
+
+
+def offer_capture_mode(offre):
+    """Mode de capture des entretiens d'une offre."""
+    mode = (offre or {}).get("capture_mode") or INTERVIEW_CAPTURE_MODE
+    return mode if mode in CAPTURE_MODES else CAPTURE_VIDEO
+
+
+def entretien_capture_mode(db, entretien):
+    """Mode de capture d'un entretien : celui fixé à sa création, sinon celui de son offre."""
+    if entretien.get("capture_mode") in CAPTURE_MODES:
+        return entretien["capture_mode"]
+    offre = None
+    if entretien.get("offre_id"):
+        offre = db[OFFRES_COLLECTION].find_one({"_id": ObjectId(entretien["offre_id"])}, {"capture_mode": 1})
+    return offer_capture_mode(offre)
+
+
+def capture_extension(mode, filename):
+    """Extension de stockage d'un média reçu, ou None s'il n'est pas accepté
+    dans ce mode. Un webm reçu en mode audio est stocké en .weba : sa piste
+    vidéo éventuelle est retirée à la finalisation (renditions.strip_video_track)."""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in CAPTURE_EXTENSIONS[mode]:
+        return None
+    if mode == CAPTURE_AUDIO:
+        return ".weba" if extension in (".webm", ".weba") else ".opus"
+    return extension
+
+
+def video_metadata(db, entretien_ids):
+    """Métadonnées des vidéos de plusieurs entretiens en une requête : {entretien_id: doc}."""
+    videos = db[VIDEOS_COLLECTION].find(
+        {"entretien_id": {"$in": list(entretien_ids)}},
+        VIDEO_METADATA_PROJECTION
+    )
+    return {video["entretien_id"]: video for video in videos}
+
+
+def migrate_inline_videos(db, root_path, video_dir, collections=(VIDEOS_COLLECTION,), dry_run=False):
+    """Déplace sur disque les vidéos stockées en base64 dans les documents.
+
+    Les documents sont lus un par un (seul le champ `video_data` du document
+    courant est en mémoire). La migration peut être relancée : un document
+    déjà migré n'a plus de `video_data`. Les documents des autres collections
+    (`collections`) sont déplacés dans `videos`. Retourne le nombre de vidéos
+    migrées.
+    """
+    os.makedirs(video_dir, exist_ok=True)
+    migrated = 0
+    for name in collections:
+        collection = db[name]
+        ids = [doc["_id"] for doc in collection.find({"video_data": {"$exists": True}}, {"_id": 1})]
+        logger.info(f"{len(ids)} vidéo(s) à migrer dans {name}")
+        for video_id in ids:
+            doc = collection.find_one({"_id": video_id}, {"video_data": 1, "entretien_id": 1, "video_path": 1})
+            if not doc or "video_data" not in doc:
+                continue
+            path = os.path.join(video_dir, f"video_{video_id}.mp4")
+            relative_path = os.path.relpath(path, root_path).replace('\\', '/')
+            if dry_run:
+                logger.info(f"[simulation] {name} {video_id} -> {relative_path}")
+                migrated += 1
+                continue
+            try:
+                size, sha256 = write_base64_file(doc["video_data"], path)
+            except Exception as e:
+                logger.error(f"Vidéo {video_id} non migrée: {str(e)}")
+                continue
+            collection.update_one(
+                {"_id": video_id},
+                {
+                    "$set": {
+                        "video_path": relative_path,
+                        "size": size,
+                        "sha256": sha256,
+                        "migrated_at": datetime.now(timezone.utc)
+                    },
+                    "$unset": {"video_data": ""}
+                }
+            )
+            if name != VIDEOS_COLLECTION:
+                # Métadonnées regroupées dans la collection lue par l'API
+                db[VIDEOS_COLLECTION].replace_one({"_id": video_id}, collection.find_one({"_id": video_id}), upsert=True)
+                collection.delete_one({"_id": video_id})
+            if doc.get("entretien_id"):
+                # Ne remplace pas une vidéo déjà enregistrée par le parcours candidat
+                db[ENTRETIENS_COLLECTION].update_one(
+                    {"_id": doc["entretien_id"], "video_path": {"$exists": False}},
+                    {"$set": {"video_path": relative_path}}
+                )
+            migrated += 1
+            logger.info(f"Vidéo {video_id} migrée vers {relative_path} ({size} octets)")
+    return migrated
@@ -0,0 +1,194 @@
+import logging
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import current_app, request
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Taille des blocs lus depuis le stockage : la mémoire par connexion reste
+# bornée à un bloc, quelle que soit la taille de la vidéo
+STREAM_CHUNK_SIZE = 256 * 1024
+# Nombre maximal de plages acceptées dans une requête multi-range
+MAX_RANGES = 16
+
+
+def parse_range_header(header, size):
+    """Analyse un en-tête Range (RFC 7233) pour un fichier de `size` octets.
+
+    Retourne None si l'en-tête est absent ou syntaxiquement invalide (la
+    requête est alors servie en entier), une liste vide si aucune plage
+    n'est satisfiable, sinon la liste triée et fusionnée des plages
+    (start, end) inclusives.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    ranges = []
+    for part in header[len("bytes="):].split(","):
+        part = part.strip()
+        if not part or "-" not in part:
+            return None
+        start_str, end_str = part.split("-", 1)
+        try:
+            if start_str == "":
+                # Suffixe : les N derniers octets
+                length = int(end_str)
+                if length <= 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(start_str)
+                end = int(end_str) if end_str else size - 1
+                if start > end and end_str:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size and start <= end:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        logger.warning(f"Trop de plages demandées ({len(ranges)}), réponse complète")
+        return None
+
+    # Fusionner les plages qui se chevauchent ou se touchent
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def make_etag(stat):
+    """ETag fort dérivé de la taille et de la date de modification."""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def read_blob(path, start, end, chunk_size=STREAM_CHUNK_SIZE):
+    """Lit les octets [start, end] d'un blob par blocs de taille fixe."""
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _multipart_body(path, ranges, size, mimetype, boundary, chunk_size):
+    for start, end in ranges:
+        yield (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("ascii")
+        yield from read_blob(path, start, end, chunk_size)
+    yield f"\r\n--{boundary}--\r\n".encode("ascii")
+
+
+def _multipart_length(ranges, size, mimetype, boundary):
+    length = 0
+    for start, end in ranges:
+        length += len((
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("ascii"))
+        length += end - start + 1
+    length += len(f"\r\n--{boundary}--\r\n".encode("ascii"))
+    return length
+
+
+def _not_modified(etag, stat):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(stat.st_mtime) <= int(since)
+    return False
+
+
+def _if_range_matches(etag, stat):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    try:
+        return int(parsedate_to_datetime(if_range).timestamp()) >= int(stat.st_mtime)
+    except (TypeError, ValueError):
+        return False
+
+
+def stream_media(path, mimetype, download_name=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Sert un fichier média avec gestion des requêtes conditionnelles et Range.
+
+    - 304 sur If-None-Match / If-Modified-Since
+    - 206 Partial Content pour une ou plusieurs plages (multipart/byteranges)
+    - 416 si aucune plage n'est satisfiable
+    - lecture par blocs : la mémoire par connexion est bornée par chunk_size
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+    def base_response(status, body=None, content_type=mimetype):
+        response = current_app.response_class(
+            body, status=status, content_type=content_type, direct_passthrough=True
+        )
+        response.headers["Accept-Ranges"] = "bytes"
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = last_modified
+        if download_name:
+            response.headers["Content-Disposition"] = f'inline; filename="{download_name}"'
+        return response
+
+    if _not_modified(etag, stat):
+        return base_response(304)
+
+    ranges = None
+    if request.method in ("GET", "HEAD") and _if_range_matches(etag, stat):
+        ranges = parse_range_header(request.headers.get("Range"), size)
+
+    if ranges is not None and not ranges:
+        response = base_response(416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response
+
+    head_only = request.method == "HEAD"
+
+    if not ranges:
+        body = None if head_only else read_blob(path, 0, size - 1, chunk_size)
+        response = base_response(200, body)
+        response.content_length = size
+        return response
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        body = None if head_only else read_blob(path, start, end, chunk_size)
+        response = base_response(206, body)
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response.content_length = end - start + 1
+        return response
+
+    boundary = uuid.uuid4().hex
+    body = None if head_only else _multipart_body(path, ranges, size, mimetype, boundary, chunk_size)
+    response = base_response(206, body, content_type=f"multipart/byteranges; boundary={boundary}")
+    response.content_length = _multipart_length(ranges, size, mimetype, boundary)
+    return response
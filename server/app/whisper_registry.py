@@ -0,0 +1,250 @@
+import gc
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+
+from config.config import (
+    WHISPER_MODEL, WHISPER_DEVICE, WHISPER_DOWNLOAD_ROOT, WHISPER_TORCH_THREADS,
+    WHISPER_ENGINE, WHISPER_COMPUTE_TYPE
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def memory_usage():
+    """Mémoire du processus en Mo : RSS, PSS (pages partagées réparties entre
+    les processus qui les utilisent) et pages partagées, d'après
+    /proc/self/smaps_rollup. Hors Linux, seul le pic de RSS est connu.
+    """
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb"}
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    key = fields[name]
+                    usage[key] = usage.get(key, 0) + int(value.split()[0]) / 1024
+    except OSError:
+        usage["rss_max_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {key: round(value, 1) for key, value in usage.items()}
+
+
+class OpenAIWhisperEngine:
+    """openai-whisper : modèle torch (fp32 sur CPU)."""
+
+    name = "openai-whisper"
+    # Le pool de threads torch n'est créé qu'au premier calcul : le modèle
+    # peut être chargé avant le fork des workers
+    fork_safe = True
+
+    def __init__(self, device, download_root, compute_type=None):
+        self.device = device
+        self.download_root = download_root
+        self.compute_type = "float16" if device != "cpu" else "float32"
+
+    def apply_threads(self, num_threads):
+        import torch
+        torch.set_num_threads(num_threads)
+        try:
+            # Possible une seule fois, avant tout calcul parallèle
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+
+    def load(self, name, num_threads):
+        import whisper
+        model = whisper.load_model(name, device=self.device, download_root=self.download_root)
+        model.eval()
+        return model
+
+    def transcribe(self, model, audio, **options):
+        options.setdefault("fp16", self.device != "cpu")
+        return model.transcribe(audio, **options)
+
+
+class FasterWhisperEngine:
+    """faster-whisper : implémentation CTranslate2, poids quantifiés (int8 sur CPU)."""
+
+    name = "faster-whisper"
+    # CTranslate2 démarre ses threads au chargement du modèle : chaque worker
+    # charge le sien après le fork
+    fork_safe = False
+
+    def __init__(self, device, download_root, compute_type=None):
+        self.device = device
+        self.download_root = download_root
+        self.compute_type = compute_type or WHISPER_COMPUTE_TYPE
+
+    def apply_threads(self, num_threads):
+        # Fixé au chargement du modèle (cpu_threads)
+        pass
+
+    def load(self, name, num_threads):
+        from faster_whisper import WhisperModel
+        return WhisperModel(
+            name,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=num_threads or 0,
+            download_root=self.download_root
+        )
+
+    def transcribe(self, model, audio, **options):
+        """Même format de résultat que openai-whisper (text, segments, language)."""
+        options.pop("fp16", None)
+        # Décodage glouton, comme openai-whisper par défaut
+        options.setdefault("beam_size", 1)
+        segments, info = model.transcribe(audio, **options)
+        segments = [{"start": segment.start, "end": segment.end, "text": segment.text} for segment in segments]
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language
+        }
+
+
+ENGINES = {engine.name: engine for engine in (OpenAIWhisperEngine, FasterWhisperEngine)}
+
+
+class WhisperRegistry:
+    """Modèles Whisper chargés une seule fois par processus.
+
+    `get()` charge le modèle à la première demande ; `preload_for_fork()` les
+    charge dans le processus parent avant de démarrer les workers : les poids
+    restent alors partagés entre processus (copie à l'écriture), puisque
+    l'inférence ne les modifie pas. Une transcription à la fois par modèle :
+    le décodage de whisper pose ses hooks de cache sur le modèle partagé.
+    Le moteur (WHISPER_ENGINE) charge et exécute les modèles ; les résultats
+    ont le format de openai-whisper quel que soit le moteur.
+    """
+
+    def __init__(self, default_model=None, device=None, download_root=None, engine=None, compute_type=None):
+        self.default_model = default_model or WHISPER_MODEL
+        self.device = device or WHISPER_DEVICE
+        self.download_root = download_root or WHISPER_DOWNLOAD_ROOT
+        engine = engine or WHISPER_ENGINE
+        if engine not in ENGINES:
+            raise ValueError(f"Moteur de transcription inconnu: {engine} (disponibles: {', '.join(ENGINES)})")
+        self.engine = ENGINES[engine](self.device, self.download_root, compute_type)
+        self.threads = WHISPER_TORCH_THREADS
+        self._threads_applied = False
+        self._guard = threading.Lock()
+        # nom -> verrou de chargement puis de transcription
+        self._locks = {}
+        self._models = {}
+        self._loads = {}
+
+    def _lock(self, name):
+        with self._guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def configure_threads(self, num_threads=None):
+        """Nombre de threads de calcul du processus (0 : valeur par défaut du moteur).
+
+        Appliqué tout de suite si torch est déjà chargé (modèles préchargés
+        avant le fork), sinon au chargement du premier modèle : un worker qui
+        ne transcrit pas n'importe pas torch. Avec faster-whisper, le nombre
+        de threads est passé au chargement du modèle.
+        """
+        self.threads = WHISPER_TORCH_THREADS if num_threads is None else num_threads
+        self._threads_applied = False
+        if "torch" in sys.modules:
+            self._apply_threads()
+
+    def _apply_threads(self):
+        if not self.threads or self._threads_applied:
+            return
+        self.engine.apply_threads(self.threads)
+        self._threads_applied = True
+        logger.info(f"Threads de calcul fixés à {self.threads} (processus {os.getpid()})")
+
+    def get(self, name=None):
+        """Modèle `name` (modèle par défaut sinon), chargé au premier appel."""
+        name = name or self.default_model
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock(name):
+            model = self._models.get(name)
+            if model is None:
+                model = self._load(name)
+        return model
+
+    def _load(self, name):
+        self._apply_threads()
+        rss_before = memory_usage()
+        started = time.monotonic()
+        model = self.engine.load(name, self.threads)
+        load_seconds = time.monotonic() - started
+        rss_after = memory_usage()
+        self._models[name] = model
+        self._loads[name] = {
+            "load_seconds": round(load_seconds, 2),
+            "loaded_at": time.time(),
+            "pid": os.getpid(),
+            "device": self.device,
+            "engine": self.engine.name,
+            "compute_type": self.engine.compute_type,
+            "rss_delta_mb": round(rss_after.get("rss_mb", 0) - rss_before.get("rss_mb", 0), 1)
+        }
+        logger.info(f"Modèle Whisper {name} ({self.engine.name}, {self.engine.compute_type}) chargé en {load_seconds:.2f}s "
+                    f"(+{self._loads[name]['rss_delta_mb']} Mo, processus {os.getpid()})")
+        return model
+
+    def preload(self, names=None):
+        """Charge les modèles `names` (modèle par défaut sinon)."""
+        for name in names or [self.default_model]:
+            self.get(name)
+
+    def preload_for_fork(self, names=None):
+        """Charge les modèles avant le fork des workers et gèle les objets
+        existants pour que le ramasse-miettes des enfants ne réécrive pas leurs
+        pages (ce qui annulerait le partage en copie à l'écriture).
+        """
+        if not self.engine.fork_safe:
+            logger.warning(f"Préchargement ignoré avec {self.engine.name} : "
+                           f"chaque worker charge son modèle")
+            return
+        self.preload(names)
+        gc.collect()
+        gc.freeze()
+        logger.info(f"Modèles Whisper préchargés avant fork: {sorted(self._models)} ({memory_usage()})")
+
+    def after_fork(self):
+        """Registre utilisable dans un processus issu d'un fork : un nouveau
+        registre (modèles rechargés) si le moteur ne supporte pas le fork."""
+        if self.engine.fork_safe:
+            return self
+        return WhisperRegistry(self.default_model, self.device, self.download_root,
+                               self.engine.name, self.engine.compute_type)
+
+    def transcribe(self, audio, name=None, **options):
+        """Transcrit `audio` (chemin ou tableau numpy 16 kHz) avec le modèle chaud."""
+        model = self.get(name)
+        with self._lock(name or self.default_model):
+            return self.engine.transcribe(model, audio, **options)
+
+    def model_label(self, name=None):
+        """Identifiant du modèle utilisé, enregistré avec les transcriptions."""
+        return f"{self.engine.name}:{name or self.default_model}:{self.engine.compute_type}"
+
+    def stats(self):
+        return {
+            "default_model": self.default_model,
+            "engine": self.engine.name,
+            "compute_type": self.engine.compute_type,
+            "device": self.device,
+            "torch_threads": self.threads,
+            "models": {name: dict(info) for name, info in self._loads.items()},
+            "memory": memory_usage()
+        }
+
+
+# Create a single instance of WhisperRegistry
+whisper_registry = WhisperRegistry()
@@ -0,0 +1,43 @@
+import argparse
+import functools
+import logging
+import os
+
+from app import create_app
+from config.config import WHISPER_PRELOAD_MODELS, WHISPER_TORCH_THREADS
+from jobs import run_workers
+from whisper_registry import whisper_registry
+
+# Importer les modules qui enregistrent des handlers de jobs
+import routes.entretiens  # noqa: F401
+import routes.recruteurv1.entretiens_questions  # noqa: F401
+import transcription  # noqa: F401
+import renditions  # noqa: F401
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Workers de la file de jobs en arrière-plan")
+    parser.add_argument("--concurrency", type=int, default=2, help="Nombre de processus workers")
+    parser.add_argument("--types", nargs="*", default=None, help="Types de jobs traités (tous par défaut)")
+    parser.add_argument("--preload-whisper", nargs="*", default=WHISPER_PRELOAD_MODELS,
+                        help="Modèles Whisper chargés avant le fork des workers (partagés entre eux)")
+    parser.add_argument("--torch-threads", type=int, default=WHISPER_TORCH_THREADS,
+                        help="Threads de calcul (torch ou CTranslate2) par worker (0 : cœurs disponibles / nombre de workers)")
+    args = parser.parse_args()
+
+    # Les workers se partagent les cœurs au lieu de lancer chacun un thread par cœur
+    torch_threads = args.torch_threads or max(1, (os.cpu_count() or 1) // args.concurrency)
+    preload = None
+    if args.preload_whisper:
+        preload = functools.partial(whisper_registry.preload_for_fork, args.preload_whisper)
+
+    logger.info(f"Démarrage de {args.concurrency} worker(s)")
+    run_workers(
+        create_app, args.concurrency, args.types,
+        preload=preload,
+        initializer=functools.partial(whisper_registry.configure_threads, torch_threads)
+    )
@@ -0,0 +1,225 @@
+"""Serveur LLM local compatible OpenAI (chat completions) pour les bancs d'essai.
+
+Répond à POST /v1/chat/completions avec des réponses JSON préparées selon
+le type de prompt reçu (génération de questions, évaluation d'une réponse,
+synthèse, rapport complet), après une latence configurable, éventuellement
+proportionnelle à la taille du prompt. Peut simuler des erreurs 5xx et des
+limitations 429 avec Retry-After, et le mode stream=True (Server-Sent Events,
+un fragment de texte par événement).
+
+Usage:
+    python bench/llm_stub_server.py --port 8089 --latency-ms 800 --error-rate 0.05
+
+Puis lancer l'API avec :
+    GROQ_API_URL=http://127.0.0.1:8089/v1/chat/completions GROQ_API_KEY=stub python app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CANNED = {
+    "questions": [
+        {"question": "Présentez-vous en quelques mots.", "type": "présentation", "objectif": "Connaître le candidat"},
+        {"question": "Décrivez votre expérience la plus proche de ce poste.", "type": "expérience", "objectif": "Évaluer l'expérience"},
+        {"question": "Qu'avez-vous compris des missions de ce rôle ?", "type": "rôle", "objectif": "Compréhension du poste"},
+        {"question": "Pourquoi ce poste vous intéresse-t-il ?", "type": "motivation", "objectif": "Évaluer la motivation"},
+        {"question": "Racontez un défi technique que vous avez résolu.", "type": "technique", "objectif": "Résolution de problèmes"},
+        {"question": "Comment vous adaptez-vous à un changement de priorités ?", "type": "adaptation", "objectif": "Adaptabilité"},
+        {"question": "Quel projet de votre CV vous rend le plus fier ?", "type": "cv", "objectif": "Approfondir le CV"},
+        {"question": "Comment travaillez-vous en équipe ?", "type": "comportement", "objectif": "Travail d'équipe"},
+        {"question": "Quelle compétence souhaitez-vous développer ?", "type": "développement", "objectif": "Progression"},
+        {"question": "Avez-vous des questions sur le poste ?", "type": "clôture", "objectif": "Intérêt du candidat"}
+    ],
+    "score": {"analyse": "Réponse structurée et pertinente, avec des exemples concrets.", "score": 7},
+    "synthese": {
+        "score_global": 7,
+        "points_forts": ["Communication claire", "Expérience pertinente"],
+        "conclusion": "Profil adapté au poste, à approfondir sur les aspects techniques."
+    },
+    "rapport": {
+        "questions_analysees": [
+            {"question": "Présentez-vous", "reponse": "...", "analyse": "Présentation claire", "score": 7}
+        ],
+        "score_global": 7,
+        "points_forts": ["Communication claire"],
+        "conclusion": "Profil adapté au poste."
+    }
+}
+
+
+class StubState:
+    def __init__(self, args, canned):
+        self.args = args
+        self.canned = canned
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+
+def classify(payload):
+    """Détermine le type de réponse attendu à partir du prompt utilisateur."""
+    prompt = " ".join(m.get("content", "") for m in payload.get("messages", []) if m.get("role") != "system")
+    if "questions pertinentes" in prompt:
+        return "questions"
+    if "évaluez la réponse du candidat" in prompt:
+        return "score"
+    if "synthèse" in prompt:
+        return "synthese"
+    return "rapport"
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                with state.lock:
+                    body = dict(state.counters, in_flight=state.in_flight, max_in_flight=state.max_in_flight)
+                return self._json(200, body)
+            return self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                return self._json(400, {"error": {"message": "invalid JSON"}})
+
+            state.count("requests")
+            with state.lock:
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                self._complete(payload)
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def _complete(self, payload):
+            args = state.args
+            roll = random.random()
+            if roll < args.rate_limit_rate:
+                state.count("rate_limited")
+                return self._json(429, {"error": {"message": "rate limited"}},
+                                  {"Retry-After": str(args.retry_after)})
+            if roll < args.rate_limit_rate + args.error_rate:
+                state.count("errors")
+                time.sleep(args.latency_ms / 1000 / 4)
+                return self._json(args.error_status, {"error": {"message": "stub failure"}})
+
+            kind = classify(payload)
+            content = json.dumps(state.canned[kind], ensure_ascii=False, indent=2)
+            created = int(time.time())
+            latency = max(0.0, random.gauss(args.latency_ms, args.jitter_ms)) / 1000
+            # Temps de traitement du prompt, proportionnel à sa taille (~4 caractères par token)
+            prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+            latency += prompt_chars / 4 / 1000 * args.prefill_ms_per_1k_tokens / 1000
+
+            if payload.get("stream"):
+                state.count("streams")
+                return self._stream(payload, content, created, latency)
+
+            time.sleep(latency)
+            self._json(200, {
+                "id": f"stub-{created}-{random.randrange(1 << 30)}",
+                "object": "chat.completion",
+                "created": created,
+                "model": payload.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4}
+            })
+
+        def _stream(self, payload, content, created, latency):
+            # Premier fragment après le temps de réflexion, puis débit constant
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            step = max(1, state.args.chunk_chars)
+            delay = step / max(1.0, state.args.chars_per_second)
+            time.sleep(min(latency, state.args.first_token_ms / 1000))
+            for start in range(0, len(content), step):
+                event = {
+                    "id": f"stub-{created}",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": payload.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=800, help="latence moyenne d'une réponse complète")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="écart type de la latence")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part des requêtes en erreur 5xx")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="part des requêtes en 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="valeur de Retry-After des 429 (s)")
+    parser.add_argument("--prefill-ms-per-1k-tokens", type=float, default=0,
+                        help="latence ajoutée par millier de tokens de prompt")
+    parser.add_argument("--first-token-ms", type=float, default=150, help="délai du premier fragment en stream")
+    parser.add_argument("--chars-per-second", type=float, default=400, help="débit du stream")
+    parser.add_argument("--chunk-chars", type=int, default=8, help="taille d'un fragment de stream")
+    parser.add_argument("--canned", help="fichier JSON remplaçant tout ou partie des réponses préparées")
+    args = parser.parse_args()
+
+    canned = dict(DEFAULT_CANNED)
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned.update(json.load(f))
+
+    state = StubState(args, canned)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"Serveur LLM local sur http://{args.host}:{args.port}/v1/chat/completions "
+          f"(latence {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, erreurs {args.error_rate:.0%}, "
+          f"429 {args.rate_limit_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
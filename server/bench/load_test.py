@@ -0,0 +1,253 @@
+"""Test de charge des parcours acceptation de candidature et sauvegarde d'entretien.
+
+Prépare des données de test dans MongoDB (recruteur, offre, candidatures,
+entretiens planifiés), puis envoie en parallèle :
+  - accept : PUT /api/candidates/<id> {"status": "Accepté"} (génération des questions)
+  - save   : POST /api/candidates/entretiens/<id>/save (vidéo + métadonnées)
+et affiche les latences p50/p95/p99 par scénario. Les documents créés sont
+supprimés à la fin (sauf --keep).
+
+Lancer l'API contre le serveur LLM local pour un test hors ligne :
+    python bench/llm_stub_server.py --latency-ms 800 &
+    cd app && GROQ_API_URL=http://127.0.0.1:8089/v1/chat/completions python app.py &
+    python bench/load_test.py --scenario both --requests 200 --concurrency 16
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+from pymongo import MongoClient
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+from config.config import MONGO_URI  # noqa: E402
+
+# Collections alimentées par le banc
+SEEDED_COLLECTIONS = ("utilisateurs", "recruteurs", "offres", "candidatures", "questions", "entretiens")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_token(secret, user_id, role):
+    now = datetime.now(timezone.utc)
+    return jwt.encode(
+        {"sub": str(user_id), "role": role, "iat": now, "exp": now + timedelta(hours=2)},
+        secret,
+        algorithm="HS256"
+    )
+
+
+class Fixtures:
+    """Données de test marquées par `bench_run` pour pouvoir les supprimer."""
+
+    def __init__(self, db, run_id):
+        self.db = db
+        self.run_id = run_id
+
+    def insert(self, collection, doc):
+        doc["bench_run"] = self.run_id
+        return self.db[collection].insert_one(doc).inserted_id
+
+    def recruiter(self):
+        user_id = self.insert("utilisateurs", {
+            "email": f"recruteur-{self.run_id}@bench.local",
+            "role": "recruteur",
+            "nom": "Banc", "prenom": "Recruteur"
+        })
+        recruteur_id = self.insert("recruteurs", {"utilisateur_id": user_id, "entreprise": "Banc"})
+        offre_id = self.insert("offres", {
+            "recruteur_id": recruteur_id,
+            "titre": "Développeur Python",
+            "description": "Conception d'API Flask et MongoDB, revue de code, mise en production.",
+            "competences_requises": ["Python", "Flask", "MongoDB"],
+            "date_creation": datetime.now(timezone.utc)
+        })
+        return user_id, recruteur_id, offre_id
+
+    def candidate(self, index):
+        return self.insert("utilisateurs", {
+            "email": f"candidat-{self.run_id}-{index}@bench.local",
+            "role": "candidat",
+            "nom": "Banc", "prenom": f"Candidat {index}"
+        })
+
+    def candidatures(self, offre_id, count):
+        ids = []
+        for index in range(count):
+            candidat_id = self.candidate(index)
+            ids.append(self.insert("candidatures", {
+                "offre_id": offre_id,
+                "user_id": candidat_id,
+                "statut": "En attente",
+                "date_candidature": datetime.now(timezone.utc)
+            }))
+        return ids
+
+    def entretiens(self, recruteur_id, offre_id, count, questions_count):
+        questions = [{"question": f"Question {i + 1}", "type": "banc"} for i in range(questions_count)]
+        entretiens = []
+        for index in range(count):
+            candidat_id = self.candidate(f"e{index}")
+            questions_id = self.insert("questions", {
+                "offre_id": offre_id,
+                "questions": questions,
+                "date_creation": datetime.now(timezone.utc)
+            })
+            entretien_id = self.insert("entretiens", {
+                "offre_id": offre_id,
+                "candidat_id": candidat_id,
+                "recruteur_id": recruteur_id,
+                "questions_id": questions_id,
+                "statut": "planifie",
+                "date_creation": datetime.now(timezone.utc)
+            })
+            entretiens.append((entretien_id, candidat_id))
+        return entretiens
+
+    def cleanup(self):
+        removed = 0
+        # Documents créés par l'API pendant le banc et rattachés aux données de test
+        offres = [d["_id"] for d in self.db["offres"].find({"bench_run": self.run_id}, {"_id": 1})]
+        if offres:
+            for entretien in self.db["entretiens"].find({"offre_id": {"$in": offres}, "video_path": {"$exists": True}},
+                                                        {"video_path": 1}):
+                video_path = os.path.join(APP_DIR, entretien["video_path"])
+                if os.path.isfile(video_path):
+                    os.remove(video_path)
+            removed += self.db["entretiens"].delete_many({"offre_id": {"$in": offres}}).deleted_count
+            removed += self.db["questions"].delete_many({"offre_id": {"$in": offres}}).deleted_count
+        for collection in SEEDED_COLLECTIONS:
+            removed += self.db[collection].delete_many({"bench_run": self.run_id}).deleted_count
+        return removed
+
+
+def run_scenario(name, count, concurrency, send):
+    latencies = []
+    statuses = Counter()
+    server_timings = []
+
+    def one(index):
+        started = time.perf_counter()
+        try:
+            response = send(index)
+            status = response.status_code
+            timing = response.headers.get("Server-Timing")
+        except httpx.HTTPError as e:
+            status, timing = type(e).__name__, None
+        return (time.perf_counter() - started) * 1000, status, timing
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, status, timing in pool.map(one, range(count)):
+            latencies.append(elapsed)
+            statuses[status] += 1
+            if timing:
+                server_timings.append(timing)
+    wall = time.perf_counter() - started
+
+    ok = sum(n for status, n in statuses.items() if isinstance(status, int) and status < 400)
+    print(f"\n== {name} : {count} requêtes, concurrence {concurrency}, {wall:.1f}s ({count / wall:.1f} req/s)")
+    print(f"Statuts: {dict(statuses)}  (succès: {ok}/{count})")
+    print("Latence (ms) p50={:.0f} p95={:.0f} p99={:.0f} max={:.0f} moyenne={:.0f}".format(
+        percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99),
+        max(latencies), statistics.mean(latencies)
+    ))
+    if server_timings:
+        print(f"Exemple Server-Timing: {server_timings[len(server_timings) // 2]}")
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--mongo-uri", default=MONGO_URI)
+    parser.add_argument("--database", default="Entretien_ai")
+    parser.add_argument("--jwt-secret", default=os.getenv("JWT_SECRET_KEY", "default_secret_key_for_development"),
+                        help="clé JWT de l'API (app.config['JWT_SECRET_KEY'])")
+    parser.add_argument("--scenario", choices=["accept", "save", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=100, help="requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=10, help="questions par entretien (save)")
+    parser.add_argument("--video-kb", type=int, default=512, help="taille de la vidéo envoyée (save)")
+    parser.add_argument("--llm-cache", choices=["use", "refresh", "bypass"], default="bypass",
+                        help="mode du cache LLM demandé à l'API (X-LLM-Cache)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--keep", action="store_true", help="conserver les données de test")
+    args = parser.parse_args()
+
+    db = MongoClient(args.mongo_uri).get_database(args.database)
+    run_id = uuid.uuid4().hex[:12]
+    fixtures = Fixtures(db, run_id)
+    recruiter_user_id, recruteur_id, offre_id = fixtures.recruiter()
+    recruiter_token = make_token(args.jwt_secret, recruiter_user_id, "recruteur")
+    print(f"Banc {run_id} sur {args.base_url}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    client = httpx.Client(base_url=args.base_url, timeout=args.timeout, limits=limits)
+    failed = False
+    try:
+        if args.scenario in ("accept", "both"):
+            candidatures = fixtures.candidatures(offre_id, args.requests)
+
+            def accept(index):
+                return client.put(
+                    f"/api/candidates/{candidatures[index]}",
+                    json={"status": "Accepté"},
+                    headers={"Authorization": f"Bearer {recruiter_token}", "X-LLM-Cache": args.llm_cache}
+                )
+
+            statuses = run_scenario("Acceptation (update_candidate_status)", args.requests, args.concurrency, accept)
+            failed |= any(not isinstance(s, int) or s >= 400 for s in statuses)
+
+        if args.scenario in ("save", "both"):
+            entretiens = fixtures.entretiens(recruteur_id, offre_id, args.requests, args.questions)
+            video = os.urandom(args.video_kb * 1024)
+            metadata = json.dumps({"transcriptions": [
+                {"questionIndex": i, "transcript": f"Réponse de test à la question {i + 1}."}
+                for i in range(args.questions)
+            ]})
+
+            def save(index):
+                entretien_id, candidat_id = entretiens[index]
+                return client.post(
+                    f"/api/candidates/entretiens/{entretien_id}/save",
+                    files={"video": ("interview.webm", video, "video/webm")},
+                    data={"metadata": metadata},
+                    headers={"Authorization": f"Bearer {make_token(args.jwt_secret, candidat_id, 'candidat')}"}
+                )
+
+            statuses = run_scenario("Sauvegarde d'entretien (save_entretien)", args.requests, args.concurrency, save)
+            failed |= any(not isinstance(s, int) or s >= 400 for s in statuses)
+
+        try:
+            metrics = client.get("/api/monitoring/llm", headers={"X-Monitoring-Token": os.getenv("MONITORING_TOKEN", "")})
+            if metrics.status_code == 200:
+                llm = metrics.json()
+                print(f"\nClient LLM: {json.dumps(llm.get('requests', {}), ensure_ascii=False)}")
+                print(f"Disjoncteur: {llm.get('circuit_breaker', {}).get('state')}, cache: {llm.get('cache', {})}")
+        except httpx.HTTPError:
+            pass
+    finally:
+        client.close()
+        if not args.keep:
+            print(f"\nDonnées de test supprimées: {fixtures.cleanup()} documents")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
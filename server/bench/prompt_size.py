@@ -0,0 +1,180 @@
+"""Taille et latence du prompt de génération des questions, avant et après compaction.
+
+Compare le prompt historique (CV coupé à 19000 caractères, offre interpolée
+telle quelle, liste des candidatures comprise) au prompt construit par
+prompt_builder (sections utiles du CV, champs utiles de l'offre, budgets de
+tokens). Sans --cv, un CV de test de trois pages (en-têtes et pieds de page
+répétés, coordonnées, loisirs) est utilisé.
+
+Avec --llm-url, chaque prompt est aussi envoyé --repeat fois à une API chat
+completions compatible OpenAI pour mesurer la latence, par exemple contre le
+serveur local dont la latence dépend de la taille du prompt :
+    python bench/llm_stub_server.py --prefill-ms-per-1k-tokens 120 &
+    python bench/prompt_size.py --llm-url http://127.0.0.1:8089/v1/chat/completions
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import httpx
+from bson import ObjectId
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+from prompt_builder import build_questions_prompt, token_counter  # noqa: E402
+
+SAMPLE_EXPERIENCES = [
+    ("Développeur backend senior", "Société Atlas", "2021 - aujourd'hui",
+     ["Conception d'API REST en Flask et FastAPI servant 2 millions de requêtes par jour",
+      "Migration d'une base PostgreSQL vers MongoDB avec reprise de 40 Go de données",
+      "Mise en place de files de jobs et de workers pour les traitements longs",
+      "Encadrement de trois développeurs juniors et revue de code quotidienne"]),
+    ("Développeur Python", "Startup Nuage", "2018 - 2021",
+     ["Développement d'un moteur de recommandation (scikit-learn, pandas)",
+      "Industrialisation des déploiements avec Docker et GitLab CI",
+      "Réduction de 60 % du temps de réponse des API par mise en cache Redis"]),
+    ("Ingénieur d'études", "ESN Horizon", "2016 - 2018",
+     ["Maintenance applicative d'un SI de gestion de stocks en Java et Python",
+      "Rédaction de spécifications techniques et accompagnement des utilisateurs"]),
+    ("Stage développeur", "Banque Régionale", "2015 (6 mois)",
+     ["Automatisation de rapports réglementaires en Python",
+      "Tests unitaires et documentation"]),
+]
+
+
+def sample_cv(pages=3):
+    """Texte d'un CV tel que l'extrait PyPDF2 : une ligne par élément, pied de page répété."""
+    lines = ["Jean Dupont", "Développeur backend Python", "jean.dupont@example.com | +33 6 12 34 56 78",
+             "https://www.linkedin.com/in/jean-dupont-exemple", "12 rue des Lilas, 69003 Lyon", "",
+             "PROFIL", "Développeur backend passionné par les architectures distribuées et la qualité logicielle. "
+             "Huit ans d'expérience sur des produits SaaS à fort trafic.", "",
+             "EXPÉRIENCES PROFESSIONNELLES"]
+    for index in range(pages):
+        for job, (poste, entreprise, periode, missions) in enumerate(SAMPLE_EXPERIENCES):
+            # Une mission par projet : les lignes ne se répètent pas d'une page à l'autre
+            projet = index * len(SAMPLE_EXPERIENCES) + job + 1
+            lines += [f"{poste} – {entreprise} (mission {projet})", periode]
+            lines += [f"•   {mission}, projet {projet}" for mission in missions]
+            lines.append("")
+        lines += ["Jean Dupont – Curriculum Vitae", f"Page {index + 1}/{pages}", ""]
+    lines += ["COMPÉTENCES TECHNIQUES", "Python, Flask, FastAPI, Django", "MongoDB, PostgreSQL, Redis",
+              "Docker, Kubernetes, GitLab CI, Terraform", "", "FORMATION",
+              "Diplôme d'ingénieur en informatique – INSA Lyon – 2016", "Baccalauréat S – 2011", "",
+              "LANGUES", "Anglais courant (TOEIC 945)", "Espagnol intermédiaire", "",
+              "CENTRES D'INTÉRÊT", "Course à pied, photographie, bénévolat associatif", "",
+              "RÉFÉRENCES", "Disponibles sur demande"]
+    return "\n".join(lines)
+
+
+def sample_offer(candidatures):
+    """Document offre tel que lu dans MongoDB et passé au prompt par les routes."""
+    return {
+        "_id": ObjectId(),
+        "titre": "Développeur backend Python confirmé",
+        "description": "Au sein de l'équipe plateforme, vous concevez et faites évoluer nos API Flask et nos "
+                       "traitements asynchrones.\n\nMissions :\n- Concevoir des API robustes\n"
+                       "- Améliorer la performance des services\n- Participer aux revues de code",
+        "localisation": "Lyon",
+        "departement": "Technique",
+        "recruteur_id": ObjectId(),
+        "entreprise": "Entretien AI",
+        "date_creation": datetime.utcnow(),
+        "date_maj": datetime.utcnow(),
+        "questions_ids": ["Python", "Flask", "MongoDB", "Docker"],
+        "candidature_ids": [ObjectId() for _ in range(candidatures)],
+        "pregeneration_questions": "top_n",
+        "pregeneration_top_n": 20
+    }
+
+
+def legacy_prompt(cv_text, job_offer):
+    """Prompt construit avant prompt_builder (même consigne, CV et offre bruts)."""
+    if len(cv_text) > 20000:
+        cv_text = cv_text[:19000]
+    return (
+        "En tant qu'expert en recrutement, analyse le CV du candidat et l'offre d'emploi pour générer "
+        f"10 questions pertinentes pour l'entretien.\n\nCV du candidat:\n{cv_text}\n\nOffre d'emploi:\n{job_offer}\n\n"
+        "Génère 10 questions qui:\n1. Présentez-vous\n2. Explorent l'expérience pertinente du candidat\n"
+        "3. Testent la compréhension du rôle\n4. Évaluent la motivation et l'adaptation\n"
+        "5. Incluent une question sur un défi technique\n6. Questions basées sur le CV du candidat\n\n\n"
+        "Format de réponse souhaité (en JSON):\n[\n    {\n        \"question\": \"Question 1\",\n"
+        "        \"type\": \"présentation\",\n        \"objectif\": \"Connaître le candidat\"\n    },\n    ...\n]"
+    )
+
+
+def read_cv(path):
+    if path.lower().endswith(".pdf"):
+        from routes.recruteurv1.entretiens_questions import extract_text_from_pdf
+        with open(path, "rb") as f:
+            return extract_text_from_pdf(f.read())
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def measure_llm(client, url, prompt, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.post(url, json={
+            "model": os.getenv("LLM_MODEL", "llama3-70b-8192"),
+            "messages": [
+                {"role": "system", "content": "Tu es un expert en recrutement qui crée des questions d'entretien pertinentes et ciblées."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.9,
+            "max_tokens": 1500
+        })
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cv", nargs="*", default=[], help="CV à mesurer (PDF ou texte)")
+    parser.add_argument("--pages", type=int, default=3, help="pages du CV de test")
+    parser.add_argument("--candidatures", type=int, default=300, help="candidatures rattachées à l'offre de test")
+    parser.add_argument("--llm-url", help="API chat completions pour mesurer la latence")
+    parser.add_argument("--api-key", default=os.getenv("GROQ_API_KEY", "stub"))
+    parser.add_argument("--repeat", type=int, default=5, help="envois par prompt (médiane)")
+    args = parser.parse_args()
+
+    cvs = [(path, read_cv(path)) for path in args.cv] or [("CV de test", sample_cv(args.pages))]
+    offer = sample_offer(args.candidatures)
+    client = httpx.Client(timeout=120, headers={"Authorization": f"Bearer {args.api_key}"}) if args.llm_url else None
+
+    try:
+        for name, cv_text in cvs:
+            print(f"\n== {name} ({len(cv_text)} caractères extraits)")
+            rows = []
+            for label, build in (("avant", legacy_prompt), ("après", build_questions_prompt)):
+                started = time.perf_counter()
+                prompt = build(cv_text, offer)
+                build_ms = (time.perf_counter() - started) * 1000
+                row = [label, len(prompt), token_counter.count(prompt), build_ms]
+                if client:
+                    row.append(measure_llm(client, args.llm_url, prompt, args.repeat))
+                rows.append(row)
+
+            header = f"{'prompt':<8}{'caractères':>12}{'tokens':>10}{'construction':>15}"
+            print(header + (f"{'latence LLM p50':>18}" if client else ""))
+            for row in rows:
+                line = f"{row[0]:<8}{row[1]:>12}{row[2]:>10}{row[3]:>12.1f} ms"
+                if client:
+                    line += f"{row[4]:>15.0f} ms"
+                print(line)
+            before, after = rows
+            print(f"Réduction : {1 - after[2] / before[2]:.0%} des tokens"
+                  + (f", {1 - after[4] / before[4]:.0%} de la latence" if client else ""))
+    finally:
+        if client:
+            client.close()
+    print(f"\nComptage des tokens : {token_counter.backend}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Simulation d'une lecture vidéo avec de nombreux déplacements (seek).
+
+Reproduit le comportement d'un élément <video> : requête initiale ouverte
+(bytes=0-), puis, à chaque déplacement, une nouvelle requête Range ouverte
+dont le lecteur ne consomme que quelques blocs avant d'abandonner la
+connexion. Vérifie les octets reçus, les codes 206/304/416, et mesure la
+latence par requête ainsi que le pic mémoire côté serveur.
+
+Usage:
+    python bench/seek_playback.py --size-mb 200 --seeks 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from flask import Flask  # noqa: E402
+
+from video_streaming import STREAM_CHUNK_SIZE, stream_media  # noqa: E402
+
+
+def build_app(video_path):
+    app = Flask(__name__)
+
+    @app.route("/video", methods=["GET", "HEAD"])
+    def video():
+        return stream_media(video_path, "video/webm", download_name="sample.webm")
+
+    return app
+
+
+def make_sample(size_mb):
+    fd, path = tempfile.mkstemp(suffix=".webm")
+    block = os.urandom(1024 * 1024)
+    with os.fdopen(fd, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def read_partial(response, max_bytes):
+    """Consomme au plus max_bytes du corps, comme un lecteur qui abandonne."""
+    received = bytearray()
+    for chunk in response.response:
+        received.extend(chunk)
+        if len(received) >= max_bytes:
+            break
+    response.close()
+    return bytes(received[:max_bytes])
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(size_mb, seeks, window, seed):
+    random.seed(seed)
+    path = make_sample(size_mb)
+    size = os.path.getsize(path)
+    client = build_app(path).test_client()
+    latencies = []
+    errors = 0
+
+    try:
+        with open(path, "rb") as f:
+            def expected(start, length):
+                f.seek(start)
+                return f.read(length)
+
+            tracemalloc.start()
+
+            # Requête initiale du lecteur
+            response = client.get("/video", headers={"Range": "bytes=0-"}, buffered=False)
+            assert response.status_code == 206, response.status_code
+            assert response.headers["Accept-Ranges"] == "bytes"
+            etag = response.headers["ETag"]
+            last_modified = response.headers["Last-Modified"]
+            assert read_partial(response, window) == expected(0, window)
+
+            for _ in range(seeks):
+                start = random.randrange(0, size)
+                begin = time.perf_counter()
+                response = client.get(
+                    "/video",
+                    headers={"Range": f"bytes={start}-", "If-Range": etag},
+                    buffered=False,
+                )
+                data = read_partial(response, window)
+                latencies.append((time.perf_counter() - begin) * 1000)
+                if response.status_code != 206 or data != expected(start, min(window, size - start)):
+                    errors += 1
+                if response.headers["Content-Range"] != f"bytes {start}-{size - 1}/{size}":
+                    errors += 1
+
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Multi-range : deux plages disjointes en multipart/byteranges
+            response = client.get("/video", headers={"Range": "bytes=0-99,1000-1099"})
+            assert response.status_code == 206
+            assert response.headers["Content-Type"].startswith("multipart/byteranges")
+            assert len(response.data) == int(response.headers["Content-Length"])
+            assert expected(1000, 100) in response.data
+
+            # Suffixe, requêtes conditionnelles et plage non satisfiable
+            response = client.get("/video", headers={"Range": "bytes=-500"})
+            assert response.status_code == 206 and response.data == expected(size - 500, 500)
+            assert client.get("/video", headers={"If-None-Match": etag}).status_code == 304
+            assert client.get("/video", headers={"If-Modified-Since": last_modified}).status_code == 304
+            response = client.get("/video", headers={"Range": f"bytes={size}-"})
+            assert response.status_code == 416
+            assert response.headers["Content-Range"] == f"bytes */{size}"
+            response = client.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"stale"'}, buffered=False)
+            assert response.status_code == 200
+            response.close()
+    finally:
+        os.remove(path)
+
+    print(f"Fichier: {size_mb} Mo, seeks: {seeks}, fenêtre lue: {window // 1024} Ko")
+    print(f"Erreurs: {errors}")
+    print(
+        "Latence (ms) p50={:.2f} p95={:.2f} p99={:.2f} moyenne={:.2f}".format(
+            percentile(latencies, 50),
+            percentile(latencies, 95),
+            percentile(latencies, 99),
+            statistics.mean(latencies),
+        )
+    )
+    print(f"Pic mémoire Python: {peak / 1024:.0f} Ko (bloc de lecture: {STREAM_CHUNK_SIZE // 1024} Ko)")
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--seeks", type=int, default=500)
+    parser.add_argument("--window-kb", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    sys.exit(1 if run(args.size_mb, args.seeks, args.window_kb * 1024, args.seed) else 0)
@@ -0,0 +1,133 @@
+"""Facteur temps réel et taux d'erreur mots (WER) des moteurs de transcription sur CPU.
+
+Chaque fichier audio ou vidéo de --samples est accompagné de sa
+transcription de référence (même nom, extension .txt) :
+    samples/entretien_01.webm  samples/entretien_01.txt
+Les fichiers sont décodés une fois en 16 kHz mono (hors mesure), puis
+transcrits par chaque combinaison moteur × modèle. Sans référence, seul le
+facteur temps réel (RTF : temps de calcul / durée audio) est affiché.
+
+Usage:
+    pip install faster-whisper
+    python bench/transcription_engines.py --samples samples/ --models base small --threads 4
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import unicodedata
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+from audio_segments import SAMPLE_RATE, extract_audio, read_audio  # noqa: E402
+from whisper_registry import ENGINES, WhisperRegistry, memory_usage  # noqa: E402
+
+MEDIA_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".opus", ".webm", ".mp4")
+
+
+def normalize_words(text):
+    """Minuscules, ponctuation retirée, élisions séparées (l'équipe -> l équipe)."""
+    text = unicodedata.normalize("NFC", text.lower())
+    text = re.sub(r"[’']", " ", text)
+    text = re.sub(r"[^\w\s-]", " ", text)
+    return text.replace("-", " ").split()
+
+
+def word_errors(reference, hypothesis):
+    """Distance d'édition en mots (substitutions + suppressions + insertions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def load_samples(directory):
+    """[(nom, audio 16 kHz, mots de référence ou None)]."""
+    samples = []
+    temp_dir = tempfile.mkdtemp()
+    for filename in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(filename)
+        if extension.lower() not in MEDIA_EXTENSIONS:
+            continue
+        audio_path = extract_audio(os.path.join(directory, filename), os.path.join(temp_dir, f"{stem}.wav"))
+        reference_path = os.path.join(directory, f"{stem}.txt")
+        reference = None
+        if os.path.isfile(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                reference = normalize_words(f.read())
+        samples.append((filename, read_audio(audio_path), reference))
+        os.remove(audio_path)
+    os.rmdir(temp_dir)
+    return samples
+
+
+def evaluate(engine, model, samples, threads, compute_type, language):
+    registry = WhisperRegistry(default_model=model, device="cpu", engine=engine, compute_type=compute_type)
+    registry.configure_threads(threads)
+    started = time.monotonic()
+    registry.get()
+    load_seconds = time.monotonic() - started
+    # Première inférence (allocations, caches) hors mesure
+    registry.transcribe(samples[0][1][:SAMPLE_RATE * 5], language=language)
+
+    compute = audio = errors = words = 0
+    for name, samples_audio, reference in samples:
+        started = time.monotonic()
+        result = registry.transcribe(samples_audio, language=language)
+        elapsed = time.monotonic() - started
+        compute += elapsed
+        audio += len(samples_audio) / SAMPLE_RATE
+        if reference is not None:
+            errors += word_errors(reference, normalize_words(result["text"]))
+            words += len(reference)
+        print(f"  {engine:<15}{model:<10}{name:<30}RTF {elapsed / (len(samples_audio) / SAMPLE_RATE):.3f}")
+    return {
+        "load_seconds": load_seconds,
+        "rtf": compute / audio,
+        "wer": errors / words if words else None,
+        "rss_mb": memory_usage().get("rss_mb", 0),
+        "label": registry.model_label()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", required=True, help="dossier des enregistrements et références .txt")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--models", nargs="+", default=["base"])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--compute-type", default="int8", help="quantification faster-whisper")
+    parser.add_argument("--language", default="fr")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    if not samples:
+        parser.error(f"aucun enregistrement dans {args.samples}")
+    total = sum(len(audio) for _, audio, _ in samples) / SAMPLE_RATE
+    print(f"{len(samples)} enregistrement(s), {total:.0f}s d'audio, {args.threads} threads")
+
+    results = []
+    for engine in args.engines:
+        for model in args.models:
+            results.append(evaluate(engine, model, samples, args.threads, args.compute_type, args.language))
+
+    # Mémoire cumulée : les moteurs sont évalués dans le même processus
+    print(f"\n{'moteur:modèle:calcul':<36}{'chargement s':>14}{'RTF':>8}{'WER':>8}{'RSS Mo':>9}")
+    for result in results:
+        wer = f"{result['wer']:.1%}" if result["wer"] is not None else "-"
+        print(f"{result['label']:<36}{result['load_seconds']:>14.2f}{result['rtf']:>8.3f}{wer:>8}"
+              f"{result['rss_mb']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Gain de temps du pipeline de transcription : audio extrait, silences retirés, parties en parallèle.
+
+Compare, pour un même enregistrement :
+  - l'ancien traitement : le fichier entier transcrit d'un bloc ;
+  - la détection de parole seule : segments de parole transcrits à la suite ;
+  - la détection de parole et les parties réparties sur --workers processus
+    (comme les jobs transcribe_part sur le pool de workers).
+Le modèle est préchargé puis partagé par fork, chaque worker utilisant
+--torch-threads threads. Sans --media, un enregistrement synthétique alterne
+des tons (réponses) et des silences (--silence-ratio).
+
+Usage:
+    python bench/transcription_pipeline.py --media entretien.webm --model base --workers 4 --torch-threads 2
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+from audio_segments import SAMPLE_RATE, extract_audio, plan_parts, read_audio  # noqa: E402
+from whisper_registry import ENGINES, WhisperRegistry  # noqa: E402
+
+
+def synthetic_recording(seconds, silence_ratio, path):
+    """Réponses (tons modulés) séparées par des silences, écrites en WAV 16 kHz."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    period = 20.0
+    voiced = (t % period) >= period * silence_ratio
+    signal = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t)) * voiced
+    signal += 0.002 * rng.standard_normal(t.shape)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def transcribe_parts(registry, name, audio_path, parts):
+    for part in parts:
+        for start, end in part["regions"]:
+            registry.transcribe(read_audio(audio_path, start, end), name, language="fr")
+
+
+def child(registry, name, audio_path, threads, parts, ready, queue):
+    registry = registry.after_fork()
+    registry.configure_threads(threads)
+    registry.get(name)
+    ready.wait()
+    started = time.monotonic()
+    transcribe_parts(registry, name, audio_path, parts)
+    queue.put(time.monotonic() - started)
+
+
+def run_parallel(registry, name, audio_path, parts, workers, threads):
+    """Répartit les parties sur les workers (la plus longue d'abord, au moins chargé)."""
+    loads = [[0.0, []] for _ in range(workers)]
+    for part in sorted(parts, key=lambda p: -sum(e - s for s, e in p["regions"])):
+        target = min(loads, key=lambda load: load[0])
+        target[0] += sum(e - s for s, e in part["regions"])
+        target[1].append(part)
+    assignments = [assigned for _, assigned in loads if assigned]
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    # Mesure à partir du moment où tous les workers ont leur modèle
+    ready = context.Barrier(len(assignments) + 1)
+    processes = [context.Process(target=child, args=(registry, name, audio_path, threads, assigned, ready, queue))
+                 for assigned in assignments]
+    for process in processes:
+        process.start()
+    ready.wait()
+    started = time.monotonic()
+    for _ in processes:
+        queue.get()
+    for process in processes:
+        process.join()
+    return time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--media", help="vidéo ou audio d'entretien (enregistrement synthétique sinon)")
+    parser.add_argument("--seconds", type=float, default=600, help="durée de l'enregistrement synthétique")
+    parser.add_argument("--silence-ratio", type=float, default=0.4, help="part de silence synthétique")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--engine", default="openai-whisper", choices=list(ENGINES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--torch-threads", type=int, default=1)
+    parser.add_argument("--part-seconds", type=float, default=60, help="secondes de parole par partie")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    audio_path = os.path.join(temp_dir, "audio_16k.wav")
+    started = time.monotonic()
+    if args.media:
+        extract_audio(args.media, audio_path)
+    else:
+        synthetic_recording(args.seconds, args.silence_ratio, audio_path)
+    extraction = time.monotonic() - started
+
+    audio = read_audio(audio_path)
+    duration = len(audio) / SAMPLE_RATE
+    started = time.monotonic()
+    parts, speech = plan_parts(audio, None, args.part_seconds)
+    vad = time.monotonic() - started
+    print(f"{duration:.0f}s d'enregistrement, {speech:.0f}s de parole ({speech / duration:.0%}), "
+          f"{len(parts)} partie(s) ; extraction {extraction:.2f}s, détection {vad:.2f}s")
+
+    registry = WhisperRegistry(default_model=args.model, device="cpu", engine=args.engine)
+    registry.configure_threads(args.workers * args.torch_threads)
+
+    started = time.monotonic()
+    registry.transcribe(audio, args.model, language="fr")
+    full = time.monotonic() - started
+    del audio
+
+    started = time.monotonic()
+    transcribe_parts(registry, args.model, audio_path, parts)
+    sequential = time.monotonic() - started
+
+    registry.preload_for_fork([args.model])
+    parallel = run_parallel(registry, args.model, audio_path, parts, args.workers, args.torch_threads)
+
+    print(f"{'traitement':<44}{'durée s':>10}{'gain':>8}")
+    print(f"{'fichier entier, 1 processus':<44}{full:>10.1f}{1:>8.2f}")
+    print(f"{'parole seule, 1 processus':<44}{sequential:>10.1f}{full / sequential:>8.2f}")
+    label = f"parole seule, {args.workers} workers x {args.torch_threads} threads"
+    print(f"{label:<44}{parallel:>10.1f}{full / parallel:>8.2f}")
+    os.remove(audio_path)
+    os.rmdir(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
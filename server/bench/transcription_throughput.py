@@ -0,0 +1,108 @@
+"""Débit de transcription sur CPU selon le nombre de workers et de threads torch.
+
+Pour chaque combinaison (processus, threads par processus), le modèle est
+préchargé dans le parent puis partagé par fork, comme avec
+`worker.py --preload-whisper`. Chaque worker transcrit --jobs/processus
+extraits de --audio (ou un signal synthétique de --seconds secondes).
+Affiche les secondes d'audio traitées par seconde écoulée et le facteur
+temps réel moyen (RTF : temps de calcul / durée audio, < 1 = plus rapide
+que le temps réel).
+
+Usage:
+    python bench/transcription_throughput.py --model base --audio entretien.wav \\
+        --grid 1x8 2x4 4x2 8x1 --jobs 8
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+from audio_segments import SAMPLE_RATE, extract_audio, read_audio  # noqa: E402
+from whisper_registry import ENGINES, WhisperRegistry  # noqa: E402
+
+
+def synthetic_audio(seconds):
+    """Bruit et tons modulés : suffisant pour mesurer le coût de l'encodeur."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.2 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    return (tone + 0.02 * rng.standard_normal(t.shape)).astype(np.float32)
+
+
+def child(registry, name, audio, threads, jobs, ready, queue):
+    registry = registry.after_fork()
+    registry.configure_threads(threads)
+    registry.get(name)
+    ready.wait()
+    timings = []
+    for _ in range(jobs):
+        started = time.monotonic()
+        registry.transcribe(audio, name, language="fr")
+        timings.append(time.monotonic() - started)
+    queue.put(timings)
+
+
+def run(registry, name, audio, processes, threads, jobs):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    per_process = [jobs // processes + (1 if i < jobs % processes else 0) for i in range(processes)]
+    per_process = [count for count in per_process if count]
+    # Mesure à partir du moment où tous les workers ont leur modèle
+    ready = context.Barrier(len(per_process) + 1)
+    workers = [context.Process(target=child, args=(registry, name, audio, threads, count, ready, queue))
+               for count in per_process]
+    for worker in workers:
+        worker.start()
+    ready.wait()
+    started = time.monotonic()
+    timings = [t for _ in workers for t in queue.get()]
+    for worker in workers:
+        worker.join()
+    return time.monotonic() - started, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--engine", default="openai-whisper", choices=list(ENGINES))
+    parser.add_argument("--audio", help="fichier transcrit (signal synthétique sinon)")
+    parser.add_argument("--seconds", type=float, default=60, help="durée du signal synthétique")
+    parser.add_argument("--jobs", type=int, default=8, help="transcriptions par combinaison")
+    parser.add_argument("--grid", nargs="+", default=None,
+                        help="combinaisons PROCESSUSxTHREADS (défaut : répartitions des cœurs)")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    grid = args.grid or [f"{p}x{max(1, cpus // p)}" for p in (1, 2, 4, 8) if p <= cpus]
+
+    if args.audio:
+        audio_path = os.path.join(tempfile.mkdtemp(), "audio_16k.wav")
+        audio = read_audio(extract_audio(args.audio, audio_path))
+        os.remove(audio_path)
+    else:
+        audio = synthetic_audio(args.seconds)
+    duration = len(audio) / SAMPLE_RATE
+
+    registry = WhisperRegistry(default_model=args.model, device="cpu", engine=args.engine)
+    registry.preload_for_fork([args.model])
+
+    print(f"Modèle {registry.model_label()}, {duration:.0f}s d'audio, {args.jobs} transcriptions, {cpus} cœurs")
+    print(f"{'workers':>8}{'threads':>9}{'durée s':>10}{'audio s/s':>11}{'RTF moyen':>11}{'RTF max':>9}")
+    for combination in grid:
+        processes, threads = (int(v) for v in combination.lower().split("x"))
+        wall, timings = run(registry, args.model, audio, processes, threads, args.jobs)
+        rtfs = [t / duration for t in timings]
+        print(f"{processes:>8}{threads:>9}{wall:>10.1f}{duration * len(timings) / wall:>11.2f}"
+              f"{statistics.mean(rtfs):>11.3f}{max(rtfs):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Temps de chargement et mémoire des modèles Whisper, chargement par requête ou registre chaud.
+
+Mesure, dans ce processus :
+  - le chargement à froid d'un modèle (temps, RSS ajouté) ;
+  - le coût d'un rechargement par requête (ancien comportement de
+    store_video_and_transcribe : whisper.load_model à chaque appel) ;
+  - l'accès au modèle chaud du registre.
+Puis démarre --workers processus après préchargement (fork) : chacun rapporte
+sa mémoire RSS, PSS et partagée, et transcrit --audio s'il est fourni. La
+somme des PSS montre la mémoire réellement occupée par l'ensemble.
+
+Usage:
+    python bench/whisper_models.py --model base --workers 4 --audio sample.wav --torch-threads 1
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+from whisper_registry import WhisperRegistry, memory_usage  # noqa: E402
+
+
+def child(registry, name, audio, threads, queue):
+    registry.configure_threads(threads)
+    transcribe_seconds = None
+    if audio:
+        started = time.monotonic()
+        registry.transcribe(audio, name)
+        transcribe_seconds = time.monotonic() - started
+    # Mémoire relevée après l'inférence : les poids sont toujours partagés
+    queue.put((os.getpid(), memory_usage(), transcribe_seconds))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--reloads", type=int, default=3, help="rechargements mesurés (ancien comportement)")
+    parser.add_argument("--workers", type=int, default=2, help="processus démarrés après préchargement")
+    parser.add_argument("--torch-threads", type=int, default=1, help="threads torch par worker")
+    parser.add_argument("--audio", help="fichier transcrit par chaque worker")
+    args = parser.parse_args()
+
+    import whisper
+
+    baseline = memory_usage()
+    print(f"Processus {os.getpid()} avant chargement: {baseline}")
+
+    registry = WhisperRegistry(default_model=args.model, device=args.device)
+    started = time.monotonic()
+    registry.get()
+    cold = time.monotonic() - started
+    loaded = memory_usage()
+    print(f"\nChargement à froid de {args.model}: {cold:.2f}s, RSS +{loaded.get('rss_mb', 0) - baseline.get('rss_mb', 0):.0f} Mo")
+
+    reloads = []
+    for _ in range(args.reloads):
+        started = time.monotonic()
+        model = whisper.load_model(args.model, device=args.device)
+        reloads.append(time.monotonic() - started)
+        del model
+    if reloads:
+        print(f"Rechargement par requête: {statistics.mean(reloads):.2f}s en moyenne sur {len(reloads)}")
+
+    started = time.monotonic()
+    for _ in range(1000):
+        registry.get()
+    print(f"Modèle chaud du registre: {(time.monotonic() - started) * 1000:.3f} µs par accès")
+
+    registry.preload_for_fork([args.model])
+    parent = memory_usage()
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=child, args=(registry, args.model, args.audio, args.torch_threads, queue))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    print(f"\n{args.workers} workers après préchargement (threads torch: {args.torch_threads})")
+    print(f"{'pid':>8}{'RSS Mo':>10}{'PSS Mo':>10}{'partagé Mo':>12}{'transcription':>15}")
+    for pid, usage, seconds in results:
+        duration = f"{seconds:.2f}s" if seconds is not None else "-"
+        print(f"{pid:>8}{usage.get('rss_mb', 0):>10.0f}{usage.get('pss_mb', 0):>10.0f}"
+              f"{usage.get('shared_mb', 0):>12.0f}{duration:>15}")
+    total_pss = parent.get("pss_mb", 0) + sum(usage.get("pss_mb", 0) for _, usage, _ in results)
+    separate = (args.workers + 1) * loaded.get("rss_mb", 0)
+    print(f"Mémoire totale (PSS parent + workers): {total_pss:.0f} Mo, "
+          f"contre ~{separate:.0f} Mo avec un chargement par processus")
+
+
+if __name__ == "__main__":
+    main()